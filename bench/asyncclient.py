@@ -0,0 +1,104 @@
+"""
+Measure the asynchronous client sending many requests at the same time to a
+local server. The server runs in its own process, on a single thread, and
+parses the requests with RequestParser; it waits *latency* milliseconds
+before answering, as a remote server would.
+
+    $ python bench/asyncclient.py [number of requests] [connections] [latency]
+"""
+import sys
+sys.path.append('.')
+
+import heapq
+import os
+import select
+import signal
+import socket
+import time
+
+from http import AsyncClient, Client, Request, RequestParser
+
+RESPONSE = ('HTTP/1.1 200 OK\r\n'
+            'Content-Type: text/plain\r\n'
+            'Content-Length: 11\r\n'
+            '\r\n'
+            'hello world')
+
+
+def serve(listener, latency):
+    poller = select.epoll()
+    poller.register(listener.fileno(), select.EPOLLIN)
+    connections = {}
+    delayed = []    # heap of (time, fd, responses)
+    while True:
+        now = time.time()
+        while delayed and delayed[0][0] <= now:
+            when, fd, data = heapq.heappop(delayed)
+            if fd in connections:
+                connections[fd][0].sendall(data)
+        timeout = max(delayed[0][0] - now, 0) if delayed else -1
+        for fd, event in poller.poll(timeout):
+            if fd == listener.fileno():
+                sock, address = listener.accept()
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                connections[sock.fileno()] = (sock, RequestParser())
+                poller.register(sock.fileno(), select.EPOLLIN)
+                continue
+            sock, parser = connections[fd]
+            data = sock.recv(65536)
+            if not data:
+                poller.unregister(fd)
+                sock.close()
+                del connections[fd]
+                continue
+            requests = parser.feed(data)
+            if requests:
+                heapq.heappush(delayed, (time.time() + latency, fd,
+                                         RESPONSE * len(requests)))
+
+
+def run(label, send, count):
+    start = time.time()
+    send(count)
+    elapsed = time.time() - start
+    print "{0:>24} {1:>10.0f} requests/s".format(label, count / elapsed)
+
+
+def main(count=10000, connections=100, latency=10):
+    listener = socket.socket()
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(1024)
+    pid = os.fork()
+    if not pid:
+        serve(listener, latency / 1000.0)
+    url = 'http://127.0.0.1:{0}/'.format(listener.getsockname()[1])
+    listener.close()
+
+    def sync(count):
+        client = Client()
+        for i in range(count):
+            assert client.request(Request('GET', url)).content == \
+                'hello world'
+        client.close()
+
+    def async(count):
+        client = AsyncClient(max_connections_per_host=connections,
+                             max_connections=connections)
+        futures = [client.request(Request('GET', url))
+                   for i in range(count)]
+        client.run()
+        for future in futures:
+            assert future.result().content == 'hello world'
+        client.close()
+
+    try:
+        # one request at a time: a sample is enough
+        run('Client', sync, min(count, 200))
+        run('AsyncClient, {0} conns'.format(connections), async, count)
+    finally:
+        os.kill(pid, signal.SIGTERM)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,63 @@
+"""
+Measure the client against a local server, with and without keeping the
+connections alive.
+
+    $ python bench/client.py [number of requests]
+"""
+import sys
+sys.path.append('.')
+
+import threading
+import time
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+from http import Client, Request
+
+
+class Handler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    # a response is sent in one piece when the handler returns
+    wbufsize = -1
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', '11')
+        self.end_headers()
+        self.wfile.write('hello world')
+
+
+class Server(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+
+
+def run(label, client, url, count):
+    start = time.time()
+    for i in range(count):
+        response = client.request(Request('GET', url))
+        assert response.content == 'hello world'
+    elapsed = time.time() - start
+    client.close()
+    print "{0:>12} {1:>10.0f} requests/s".format(label, count / elapsed)
+
+
+def main(count=2000):
+    server = Server(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    url = 'http://127.0.0.1:{0}/'.format(server.server_address[1])
+
+    run('pooled', Client(), url, count)
+    run('not pooled', Client(keep_alive=False), url, count)
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
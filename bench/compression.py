@@ -0,0 +1,70 @@
+"""
+Measure the throughput of Response.compressed, streaming a large text and a
+large JSON content through each coding at several compression levels.
+
+    $ python bench/compression.py [size in MB]
+"""
+import sys
+sys.path.append('.')
+
+import json
+import random
+import time
+
+from http import Request, Response
+
+CHUNK = 65536
+
+
+def payloads(size):
+    # random, so that the contents don't compress better than real ones
+    rand = random.Random(42)
+    words = ('lorem ipsum dolor sit amet consectetur adipiscing elit sed do '
+             'eiusmod tempor incididunt ut labore et dolore magna aliqua '
+             'enim ad minim veniam quis nostrud exercitation ullamco').split()
+    text = []
+    length = 0
+    while length < size:
+        word = rand.choice(words)
+        text.append(word)
+        length += len(word) + 1
+    records = []
+    length = 0
+    while length < size:
+        record = json.dumps({'id': rand.randint(0, 10 ** 9),
+                             'name': rand.choice(words),
+                             'price': round(rand.random() * 100, 2),
+                             'tags': rand.sample(words, 3),
+                             'in_stock': rand.random() > 0.5})
+        records.append(record)
+        length += len(record) + 1
+    return [('text/plain', ' '.join(text)[:size]),
+            ('application/json', '\n'.join(records)[:size])]
+
+
+def run(media_type, data, coding, level):
+    chunks = [data[i:i + CHUNK] for i in range(0, len(data), CHUNK)]
+    request = Request('GET', 'http://example.com/',
+                      headers=[('Accept-Encoding', coding)])
+    response = Response(200, [('Content-Type', media_type)], iter(chunks))
+    start = time.time()
+    compressed = response.compressed(request, level=level)
+    size = sum(len(chunk) for chunk in compressed.iter_content(None))
+    elapsed = time.time() - start
+    return len(data) / elapsed / 1e6, float(size) / len(data)
+
+
+def main(size=16):
+    size *= 1000000
+    print "{0:>18} {1:>8} {2:>6} {3:>10} {4:>8}".format(
+        'content', 'coding', 'level', 'MB/s', 'ratio')
+    for media_type, data in payloads(size):
+        for coding in ('gzip', 'deflate'):
+            for level in (1, 6, 9):
+                throughput, ratio = run(media_type, data, coding, level)
+                print "{0:>18} {1:>8} {2:>6} {3:>10.1f} {4:>8.3f}".format(
+                    media_type, coding, level, throughput, ratio)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,75 @@
+"""
+Compare the HTTP-date parser and formatter with the email.utils based ones
+they replace.
+
+    $ python bench/date.py
+"""
+import sys
+sys.path.append('.')
+
+import email.utils
+import time
+import timeit
+from calendar import timegm
+from datetime import datetime
+
+from http import Date
+
+
+def old_str2epoch(date):
+    return int(timegm(email.utils.parsedate_tz(date)))
+
+
+def old_time2str(dt):
+    weekday = [
+        "Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"
+    ][dt.weekday()]
+    month = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep",
+             "Oct", "Nov", "Dec"][dt.month - 1]
+    return "{0}, {1:02d} {2} {3} {4:02d}:{5:02d}:{6:02d} GMT".format(
+        weekday, dt.day, month, dt.year, dt.hour, dt.minute, dt.second)
+
+
+def old_now():
+    return old_time2str(datetime.utcfromtimestamp(int(time.time())))
+
+
+def measure(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number * 1e6
+
+
+def main(number=100000):
+    formats = [
+        ('IMF-fixdate', 'Sun, 06 Nov 1994 08:49:37 GMT',
+         'Mon, 12 Dec 2011 12:00:00 GMT'),
+        ('RFC 850', 'Sunday, 06-Nov-94 08:49:37 GMT',
+         'Monday, 12-Dec-11 12:00:00 GMT'),
+        ('asctime', 'Sun Nov  6 08:49:37 1994', 'Mon Dec 12 12:00:00 2011'),
+    ]
+    dt = datetime(2011, 12, 12, 12, 0, 0)
+    cases = []
+    for label, a, b in formats:
+        # two dates, one after the other, so that the last parsed one is
+        # never the same
+        cases.append(('str2epoch ' + label,
+                      lambda a=a, b=b: old_str2epoch(a) + old_str2epoch(b),
+                      lambda a=a, b=b: Date.str2epoch(a) + Date.str2epoch(b)))
+    date = formats[0][1]
+    cases += [
+        ('str2epoch same date',
+         lambda: old_str2epoch(date), lambda: Date.str2epoch(date)),
+        ('time2str', lambda: old_time2str(dt), lambda: Date.time2str(dt)),
+        ('Date header', old_now, Date.now),
+    ]
+    print "{0:>24} {1:>10} {2:>10} {3:>8}".format(
+        '', 'old (us)', 'new (us)', 'speedup')
+    for label, old, new in cases:
+        assert old() == new()
+        before = measure(old, number)
+        after = measure(new, number)
+        print "{0:>24} {1:>10.2f} {2:>10.2f} {3:>7.1f}x".format(
+            label, before, after, before / after)
+
+
+if __name__ == '__main__':
+    main()
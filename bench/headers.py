@@ -0,0 +1,124 @@
+"""
+Compare the indexed ``Headers`` store with the previous list-scanning one.
+
+    $ python bench/headers.py
+"""
+import sys
+sys.path.append('.')
+
+import timeit
+
+from http import Headers
+from http.headers import CONTENT_TYPE, LAST_MODIFIED
+
+
+class ListHeaders(object):
+    """The previous store: a list of tuples scanned on every lookup."""
+
+    def __init__(self, headers):
+        self._headers = list(headers)
+
+    def add(self, key, value):
+        self._headers.append((key, value))
+
+    def get(self, key):
+        for k, v in self._headers:
+            if k.lower() == key.lower():
+                return v
+        return None
+
+    def get_all(self, key):
+        return [v for k, v in self._headers if k.lower() == key.lower()]
+
+    def set(self, key, value):
+        lkey = key.lower()
+        for idx, (k, v) in enumerate(self._headers):
+            if k.lower() == lkey:
+                self._headers[idx] = (key, value)
+                return
+        self._headers.append((key, value))
+
+    def remove(self, key):
+        key = key.lower()
+        self._headers[:] = [(k, v) for k, v in self._headers
+                            if k.lower() != key]
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+
+def make_headers(count):
+    headers = [
+        ('Date', 'Mon, 12 Dec 2011 12:00:00 GMT'),
+        ('Server', 'nginx'),
+        ('Cache-Control', 'max-age=0, private'),
+        ('Set-Cookie', 'a=b'),
+        ('Set-Cookie', 'c=d'),
+    ]
+    for i in range(count - len(headers) - 2):
+        headers.append(('X-Custom-%d' % i, str(i)))
+    headers.append(('Last-Modified', 'Sat, 02 Jul 2011 07:53:00 GMT'))
+    headers.append(('Content-Type', 'text/html; charset=UTF-8'))
+    return headers
+
+
+def workload(h):
+    h.get('Content-Type')
+    h.get('content-type')
+    h.get('Last-Modified')
+    h.get('X-Missing')
+    h.get_all('Set-Cookie')
+    'Content-Length' in h
+    h.set('Content-Type', 'application/json')
+    h.add('Via', '1.1 proxy')
+    h.remove('Via')
+
+
+def main(number=20000):
+    print "{0:>8} {1:>12} {2:>12} {3:>8}".format(
+        'headers', 'list (us)', 'indexed (us)', 'speedup')
+    for count in (10, 20, 40, 80):
+        raw = make_headers(count)
+        results = []
+        for cls in (ListHeaders, Headers):
+            h = cls(raw)
+            t = min(timeit.repeat(lambda: workload(h), number=number,
+                                  repeat=3))
+            results.append(t / number * 1e6)
+        print "{0:>8} {1:>12.2f} {2:>12.2f} {3:>7.1f}x".format(
+            count, results[0], results[1], results[0] / results[1])
+
+    print
+    print "{0:>24} {1:>8}".format('lookup', 'us')
+    h = Headers(make_headers(40))
+    for label, name in (('plain string', 'Content-Type'),
+                        ('lowercase string', 'last-modified'),
+                        ('HeaderName constant', CONTENT_TYPE),
+                        ('HeaderName constant', LAST_MODIFIED)):
+        t = min(timeit.repeat(lambda: h.get(name), number=number * 10,
+                              repeat=3))
+        print "{0:>24} {1:>8.3f}".format(label, t / number / 10 * 1e6)
+
+    print
+    print "{0:>24} {1:>10} {2:>10}".format('typed accessors', 'parsed',
+                                           'cached')
+    h = Headers(make_headers(20))
+
+    def accessors():
+        h.content_is_text
+        h.content_is_xml
+        h.content_type_params
+        h.content_length
+        h.last_modified
+
+    def uncached():
+        h._parsed.clear()
+        accessors()
+    t1 = min(timeit.repeat(uncached, number=number, repeat=3))
+    t2 = min(timeit.repeat(accessors, number=number, repeat=3))
+    print "{0:>24} {1:>10.2f} {2:>10.2f}".format(
+        'us per workload', t1 / number * 1e6, t2 / number * 1e6)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Measure the JSON helpers: Response.json on a large document, called once
+and then again, and Response.iter_json over a newline-delimited content
+streamed in chunks.
+
+    $ python bench/jsonbody.py [number of records]
+"""
+import sys
+sys.path.append('.')
+
+import json
+import random
+import time
+
+from http import Response
+from http.jsoncodec import FAST_BACKENDS, _default_backend
+
+CHUNK = 65536
+
+
+def records(count):
+    rand = random.Random(42)
+    return [{'id': rand.randint(0, 10 ** 9), 'name': 'item %d' % i,
+             'price': round(rand.random() * 100, 2),
+             'tags': ['a', 'b', 'c'][:rand.randint(0, 3)]}
+            for i in xrange(count)]
+
+
+def chunks(data):
+    return iter([data[i:i + CHUNK] for i in xrange(0, len(data), CHUNK)])
+
+
+def timed(function):
+    start = time.time()
+    result = function()
+    return result, time.time() - start
+
+
+def main(count=100000):
+    values = records(count)
+    document = json.dumps(values)
+    ndjson = '\n'.join(json.dumps(value) for value in values)
+    print "backend: {0}".format(_default_backend().__name__)
+    print "(tried: {0})".format(', '.join(FAST_BACKENDS))
+
+    response = Response(200, [('Content-Type', 'application/json')],
+                        chunks(document))
+    value, first = timed(response.json)
+    assert len(value) == count
+    value, second = timed(response.json)
+    print "json(): {0:.1f} MB/s, then {1:.2f} us".format(
+        len(document) / first / 1e6, second * 1e6)
+
+    response = Response(200, [('Content-Type', 'application/x-ndjson')],
+                        chunks(ndjson))
+    n, elapsed = timed(lambda: sum(1 for _ in response.iter_json(None)))
+    assert n == count
+    print "iter_json(): {0:.1f} MB/s, {1:.0f} records/s".format(
+        len(ndjson) / elapsed / 1e6, n / elapsed)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
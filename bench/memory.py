@@ -0,0 +1,71 @@
+"""
+Measure the memory used by ``Request``, ``Response`` and ``Url`` objects,
+in bytes per object, against the same attributes kept in a ``__dict__``, as
+they were before the classes got ``__slots__``.
+
+Python 2 has no tracemalloc: the size of the objects is the growth of the
+resident memory of the process (Linux only) while many of them are alive.
+
+    $ python bench/memory.py [number of objects]
+"""
+import sys
+sys.path.append('.')
+
+import gc
+import os
+
+from http import Headers, Request, Response, Url
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+
+class DictLayout(object):
+    """
+    An object keeping the attributes of another one in a ``__dict__``. The
+    values are shared with that object: only the layout is measured.
+    """
+
+    def __init__(self, obj):
+        for cls in type(obj).__mro__:
+            for name in getattr(cls, '__slots__', ()):
+                setattr(self, name, getattr(obj, name))
+
+
+def resident():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * PAGE_SIZE
+
+
+def measure(make, count):
+    gc.collect()
+    before = resident()
+    objects = [make() for i in xrange(count)]
+    used = resident() - before
+    # the list holding them
+    used -= sys.getsizeof(objects)
+    del objects
+    return used / float(count)
+
+
+def main(count=200000):
+    headers = Headers([('Content-Type', 'text/plain')])
+    url = Url('http://example.com/foo?bar=baz')
+    makers = [
+        ('Url', lambda: Url(scheme='http', host='example.com', path=[],
+                            query=[])),
+        ('Request', lambda: Request('GET', url, headers)),
+        ('Response', lambda: Response(200, headers, 'hello', 'OK')),
+    ]
+    print "{0:>10} {1:>14} {2:>14} {3:>8}".format(
+        'object', '__dict__ (B)', '__slots__ (B)', 'saved')
+    for label, make in makers:
+        sample = make()
+        dict_size = measure(lambda: DictLayout(sample), count)
+        slots_size = measure(make, count)
+        print "{0:>10} {1:>14.0f} {2:>14.0f} {3:>7.0f}%".format(
+            label, dict_size, slots_size,
+            100 * (1 - slots_size / dict_size))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
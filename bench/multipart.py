@@ -0,0 +1,57 @@
+"""
+Measure the throughput of the multipart encoder and parser, with a form of
+a few fields and a large file, fed to the parser in chunks of several
+sizes.
+
+    $ python bench/multipart.py [size in MB]
+"""
+import sys
+sys.path.append('.')
+
+import os
+import time
+from StringIO import StringIO
+
+from http import MultipartEncoder, MultipartParser
+
+
+def form(data):
+    return MultipartEncoder([('title', 'holidays'), ('tags', 'beach sea'),
+                             ('photo', ('beach.jpg', StringIO(data)))])
+
+
+def encode(data):
+    start = time.time()
+    size = sum(len(chunk) for chunk in form(data))
+    return size / (time.time() - start) / 1e6
+
+
+def parse(content, boundary, chunk_size):
+    view = memoryview(content)
+    start = time.time()
+    parser = MultipartParser(boundary)
+    parts = []
+    for i in xrange(0, len(content), chunk_size):
+        parts.extend(parser.feed(view[i:i + chunk_size]))
+    parser.feed_eof()
+    elapsed = time.time() - start
+    assert len(parts) == 3
+    for part in parts:
+        part.close()
+    return len(content) / elapsed / 1e6
+
+
+def main(size=32):
+    # random, so that the data is full of partial delimiters: '\r', '\r\n'
+    data = os.urandom(size * 1000000)
+    print "encode: {0:.1f} MB/s".format(encode(data))
+    encoder = form(data)
+    content = ''.join(encoder)
+    print "{0:>12} {1:>10}".format('chunk size', 'MB/s')
+    for chunk_size in (1024, 8192, 65536, 1048576):
+        print "{0:>12} {1:>10.1f}".format(
+            chunk_size, parse(content, encoder.boundary, chunk_size))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,67 @@
+"""
+Measure the response parser on a large body fed in socket-sized reads.
+
+    $ python bench/parser.py [size in MB]
+"""
+import sys
+sys.path.append('.')
+
+import resource
+import time
+
+from http import ResponseParser
+
+READ_SIZE = 65536
+
+
+def content_length(total):
+    yield 'HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n' % total
+    block = 'x' * READ_SIZE
+    for i in range(total / READ_SIZE):
+        yield block
+
+
+def chunked(total):
+    yield 'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n'
+    frame = '%x\r\n%s\r\n' % (READ_SIZE, 'x' * READ_SIZE)
+    # split the frames so that reads don't line up with chunks
+    cut = len(frame) / 3
+    for i in range(total / READ_SIZE):
+        yield frame[:cut]
+        yield frame[cut:]
+    yield '0\r\n\r\n'
+
+
+def until_close(total):
+    yield 'HTTP/1.0 200 OK\r\n\r\n'
+    block = 'x' * READ_SIZE
+    for i in range(total / READ_SIZE):
+        yield block
+    yield ''
+
+
+def run(label, reads, total):
+    # the body reads from the connection as it is iterated over
+    parser = ResponseParser(read=reads(total).next)
+    received = 0
+    start = time.time()
+    response = parser.next_message()
+    for chunk in response.iter_content(None):
+        received += len(chunk)
+    elapsed = time.time() - start
+    assert parser.idle and received == total
+    print "{0:>16} {1:>10.1f} MB/s".format(label, total / elapsed / 2 ** 20)
+
+
+def main(megabytes=100):
+    total = megabytes * 2 ** 20
+    for label, reads in (('content-length', content_length),
+                         ('chunked', chunked),
+                         ('until-close', until_close)):
+        run(label, reads, total)
+    print "max RSS: {0:.1f} MB".format(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,50 @@
+"""
+Measure how many small pipelined requests the request parser handles.
+
+    $ python bench/requests.py [number of requests]
+"""
+import sys
+sys.path.append('.')
+
+import time
+
+from http import RequestParser
+
+REQUEST = ('GET /api/v1/items/42?fields=name,price HTTP/1.1\r\n'
+           'Host: api.example.com\r\n'
+           'User-Agent: bench/1.0\r\n'
+           'Accept: application/json\r\n'
+           'Accept-Encoding: gzip, deflate\r\n'
+           'Connection: keep-alive\r\n'
+           '\r\n')
+
+POST = ('POST /api/v1/items HTTP/1.1\r\n'
+        'Host: api.example.com\r\n'
+        'Content-Type: application/json\r\n'
+        'Content-Length: 13\r\n'
+        '\r\n'
+        '{"name": "x"}')
+
+
+def run(label, data, count, batch=16, read_size=4096):
+    # pipelined requests, read from the socket in read_size pieces
+    wire = data * batch
+    reads = [wire[i:i + read_size] for i in range(0, len(wire), read_size)]
+    parser = RequestParser()
+    parsed = 0
+    start = time.time()
+    for i in range(count / batch):
+        for read in reads:
+            parsed += len(parser.feed(read))
+    elapsed = time.time() - start
+    assert parsed == count / batch * batch
+    print "{0:>8} {1:>10.0f} requests/s".format(label, parsed / elapsed)
+
+
+def main(count=200000):
+    run('GET', REQUEST, count)
+    run('POST', POST, count)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,43 @@
+"""
+Measure how many ``Response`` objects can be created per second, from raw
+header tuples, from ``Headers`` copied, or from already-parsed parts.
+
+    $ python bench/response.py
+"""
+import sys
+sys.path.append('.')
+
+import timeit
+
+from http import Headers, Response
+
+ITEMS = [('Content-Type', 'text/html; charset=UTF-8'),
+         ('Content-Length', '1024'),
+         ('Cache-Control', 'max-age=60'),
+         ('Date', 'Mon, 12 Dec 2011 12:00:00 GMT'),
+         ('Server', 'nginx'),
+         ('ETag', '"5e15153d-120f"')]
+
+
+def main(number=50000):
+    headers = Headers(ITEMS)
+    cases = [
+        ('Response(status)', lambda: Response(200)),
+        ('Response(list)', lambda: Response(200, ITEMS, 'hello', 'OK')),
+        ('Response(Headers(list))',
+         lambda: Response(200, Headers(ITEMS), 'hello', 'OK')),
+        ('Response(headers.copy())',
+         lambda: Response(200, headers.copy(), 'hello', 'OK')),
+        ('from_parts(headers)',
+         lambda: Response.from_parts(200, 'OK', headers, 'hello')),
+        ('from_parts(headers.copy())',
+         lambda: Response.from_parts(200, 'OK', headers.copy(), 'hello')),
+    ]
+    print "{0:>28} {1:>14}".format('construction', 'responses/s')
+    for label, make in cases:
+        t = min(timeit.repeat(make, number=number, repeat=3))
+        print "{0:>28} {1:>14.0f}".format(label, number / t)
+
+
+if __name__ == '__main__':
+    main()
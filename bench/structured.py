@@ -0,0 +1,71 @@
+"""
+Measure the parsers of the structured headers, against a budget in
+microseconds per header. *cold* parses a value never seen before, *warm* a
+value another ``Headers`` already parsed, *cached* reads the value again
+from the same ``Headers``.
+
+    $ python bench/structured.py [budget in us]
+"""
+import sys
+sys.path.append('.')
+
+import timeit
+
+from http import Headers
+from http import headers as module
+
+HEADERS = [
+    ('content_type', 'Content-Type', module._parse_content_type,
+     'multipart/form-data; boundary="----=_Part_0;x"; charset=UTF-8'),
+    ('cache_control', 'Cache-Control', module._parse_cache_control,
+     'public, max-age=3600, s-maxage=600, no-cache="Set-Cookie"'),
+    ('accept', 'Accept', module._parse_accept,
+     'text/html,application/xhtml+xml,application/xml;q=0.9,'
+     'image/webp,*/*;q=0.8'),
+    ('accept_encoding', 'Accept-Encoding', module._parse_accept_encoding,
+     'gzip, deflate, br;q=0.9, identity;q=0.1'),
+    ('vary', 'Vary', module._parse_tokens,
+     'Accept-Encoding, Accept-Language, Origin'),
+    ('connection', 'Connection', module._parse_tokens, 'keep-alive, Upgrade'),
+    ('etag', 'ETag', module._parse_etag, 'W/"5e15153d-120f"'),
+    ('if_none_match', 'If-None-Match', module._parse_etags,
+     '"5e15153d-120f", W/"5e15153d-1210"'),
+    ('range', 'Range', module._parse_range, 'bytes=0-499, 1000-, -200'),
+]
+
+
+def measure(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number * 1e6
+
+
+def main(budget=25, number=20000):
+    print "{0:>16} {1:>10} {2:>10} {3:>10}".format('header', 'cold (us)',
+                                                   'warm (us)', 'cached')
+    over = []
+    for attribute, name, parse, value in HEADERS:
+        h = Headers([(name, value)])
+        get = getattr(Headers, attribute).fget
+
+        def cold():
+            parse.cache.clear()
+            h._parsed.clear()
+            get(h)
+
+        def warm():
+            h._parsed.clear()
+            get(h)
+
+        results = [measure(cold, number), measure(warm, number),
+                   measure(lambda: get(h), number)]
+        print "{0:>16} {1:>10.2f} {2:>10.2f} {3:>10.2f}{4}".format(
+            name, results[0], results[1], results[2],
+            '  over budget' if results[0] > budget else '')
+        if results[0] > budget:
+            over.append(name)
+    print
+    print "budget: {0} us per header, {1} over".format(budget, len(over))
+    return 1 if over else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*[float(arg) for arg in sys.argv[1:]]))
@@ -5,3 +5,10 @@ from http import *
 
 client = Client()
 response = client.mirror('http://lumberjaph.net', '/tmp/lj.txt')
+
+if response.status == 304:
+    print "/tmp/lj.txt is up to date"
+elif response.is_success:
+    print "/tmp/lj.txt updated"
+else:
+    print "oups! {status_line}".format(status_line=response.status_line)
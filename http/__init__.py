@@ -12,11 +12,22 @@ __author__ = 'Franck Cuny'
 __license__ = 'MIT'
 __copyright__ = 'Copyright 2012 Franck Cuny'
 
-__all__ = ['Request', 'Response', 'HTTPException', 'Headers', 'Date', 'Url']
+__all__ = ['Request', 'Response', 'HTTPException', 'Headers', 'HeaderName',
+           'register_header', 'Date', 'Url', 'ParseError', 'DecodingError',
+           'RequestParser', 'ResponseParser', 'Client', 'AsyncClient',
+           'CachingClient', 'register_coding', 'MultipartEncoder',
+           'MultipartParser', 'set_json_backend']
 
 from request import Request
 from response import Response
-from headers import Headers
+from headers import Headers, HeaderName, register_header
 from date import Date
 from url import Url
-from exception import HTTPException
+from exception import HTTPException, ParseError, DecodingError
+from parser import RequestParser, ResponseParser
+from client import Client
+from asyncclient import AsyncClient
+from cache import CachingClient
+from coding import register_coding
+from multipart import MultipartEncoder, MultipartParser
+from jsoncodec import set_json_backend
@@ -0,0 +1,560 @@
+import errno
+import heapq
+import select
+import socket
+import ssl
+import time
+from collections import deque
+
+from client import Client, DEFAULT_AGENT, IDEMPOTENT_METHODS
+from exception import ParseError
+from message import CHUNK_SIZE
+from parser import ResponseParser
+
+READ = select.POLLIN
+WRITE = select.POLLOUT
+ERROR = select.POLLERR | select.POLLHUP
+
+# a streamed body stops being read from the connection when that many bytes
+# are waiting to be consumed
+HIGH_WATER = 1024 * 1024
+
+# states of a connection
+CONNECTING, HANDSHAKING, OPEN = range(3)
+
+
+class Future(object):
+    """
+    Result of a request sent with :class:`AsyncClient`, available once the
+    client has received the response
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._result = None
+        self._exception = None
+        self._callbacks = []
+        self.done = False
+
+    def result(self):
+        """
+        Returns the response, running the client until it is received
+
+        :rtype: class:`Response`
+        """
+        while not self.done:
+            self._client.poll()
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def exception(self):
+        """
+        Returns the exception raised by the request, running the client
+        until the request is finished
+
+        :rtype: exception or ``None``
+        """
+        while not self.done:
+            self._client.poll()
+        return self._exception
+
+    def add_done_callback(self, callback):
+        """
+        Calls *callback* with the future once it is done
+
+        :param callback: a function
+        """
+        if self.done:
+            callback(self)
+        else:
+            self._callbacks.append(callback)
+
+    def set_result(self, result):
+        self._result = result
+        self._done()
+
+    def set_exception(self, exception):
+        self._exception = exception
+        self._done()
+
+    def _done(self):
+        self.done = True
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+
+class _Task(object):
+    """A request, with its state while it is being sent"""
+
+    def __init__(self, request, key, stream, timeout):
+        self.request = request
+        self.key = key
+        self.stream = stream
+        self.timeout = timeout
+        self.future = None
+        self.response = None
+        self.connection = None
+        self.finished = False
+        self.retried = False
+
+
+class _Connection(object):
+    """A non-blocking connection"""
+
+    def __init__(self, key, address):
+        family, type, proto, name, address = address
+        self.key = key
+        self.sock = socket.socket(family, type, proto)
+        self.sock.setblocking(0)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.fd = self.sock.fileno()
+        self.state = CONNECTING
+        err = self.sock.connect_ex(address)
+        if err not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+            self.sock.close()
+            raise socket.error(err, errno.errorcode.get(err, ''))
+        self.parser = ResponseParser()
+        self.task = None
+        self.chunks = None
+        self.pending = None
+        self.paused = False
+        self.requests = 0
+        self.last_used = time.time()
+
+    def close(self):
+        try:
+            self.sock.close()
+        except socket.error:
+            pass
+
+
+class _Poller(object):
+    """``epoll`` when available, ``poll`` otherwise"""
+
+    def __init__(self):
+        if hasattr(select, 'epoll'):
+            self._poller = select.epoll()
+            self._scale = 1
+        else:
+            self._poller = select.poll()
+            self._scale = 1000
+        self.register = self._poller.register
+        self.modify = self._poller.modify
+        self.unregister = self._poller.unregister
+
+    def poll(self, timeout):
+        if timeout is None:
+            timeout = -1
+        else:
+            timeout *= self._scale
+        return self._poller.poll(timeout)
+
+
+class AsyncClient(Client):
+    """
+    HTTP client sending many requests at the same time, from a single
+    thread.
+
+    :meth:`request` returns a :class:`Future` right away. The requests
+    are sent and the responses are read when the client is run, either
+    with :meth:`run`, or while waiting for a result with
+    :meth:`Future.result`. Connections are non-blocking, and multiplexed
+    with ``epoll`` (or ``poll``).
+
+    A streamed content is read from the connections as it is iterated
+    over; the other requests keep being processed in the meantime.
+    Closing a streamed response before its content is read to the end
+    closes its connection.
+    """
+
+    def __init__(self, agent=None, timeout=60, keep_alive=True,
+                 max_connections_per_host=10, max_connections=100,
+                 idle_timeout=60):
+        """
+        Construct a new ``AsyncClient`` object
+
+        :param agent: value of the *User-Agent* header
+        :type agent: string
+        :param timeout: default time to get a response, in seconds
+        :type timeout: float
+        :param keep_alive: if ``False``, a connection is used for a single
+            request
+        :type keep_alive: boolean
+        :param max_connections_per_host: maximum number of connections to
+            a host, and so of requests sent to it at the same time
+        :type max_connections_per_host: int
+        :param max_connections: maximum number of connections, and so of
+            requests sent at the same time
+        :type max_connections: int
+        :param idle_timeout: seconds after which idle connections are closed
+        :type idle_timeout: float
+        """
+        self.agent = agent or DEFAULT_AGENT
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self.max_connections_per_host = max_connections_per_host
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout if keep_alive else 0
+        self._poller = _Poller()
+        self._connections = {}  # fd -> connection with a task
+        self._idle = {}         # key -> list of idle connections
+        self._opened = {}       # key -> number of open connections
+        self._total = 0
+        self._queues = {}       # key -> deque of tasks waiting
+        self._deadlines = []    # heap of (deadline, sequence, task)
+        self._sequence = 0
+        self._paused = set()
+        self._addresses = {}    # key -> address info, see request()
+
+    def request(self, request, stream=False, timeout=None):
+        """
+        Queues a request, and returns a :class:`Future` for its response
+
+        :param request: the request to send
+        :type request: class:`Request`
+        :param stream: if ``True``, the future is done once the head of the
+            response is received, and the content is read as it is
+            iterated over
+        :type stream: boolean
+        :param timeout: time to get the response, in seconds, from the
+            moment the request is sent
+        :type timeout: float
+        :rtype: class:`Future`
+
+        The address of a host is resolved when the first request to it is
+        queued, and kept until the client is closed: that call blocks,
+        but the event loop never does.
+        """
+        key = self._prepare(request)
+        task = _Task(request, key, stream,
+                     self.timeout if timeout is None else timeout)
+        task.future = Future(self)
+        if key not in self._addresses:
+            try:
+                self._addresses[key] = socket.getaddrinfo(
+                    key[1], key[2], 0, socket.SOCK_STREAM)[0]
+            except socket.error as e:
+                task.finished = True
+                task.future.set_exception(e)
+                return task.future
+        self._queues.setdefault(key, deque()).append(task)
+        self._dispatch()
+        return task.future
+
+    @property
+    def pending(self):
+        """
+        Returns the number of requests queued or being sent
+
+        :rtype: int
+        """
+        return len(self._connections) + \
+            sum(len(queue) for queue in self._queues.values())
+
+    def run(self):
+        """Runs the client until all the requests are done"""
+        while self._connections or self._queues:
+            self.poll()
+
+    def close(self):
+        """Closes the idle connections"""
+        for idle in self._idle.values():
+            for connection in idle:
+                connection.close()
+                self._forget(connection)
+        self._idle.clear()
+        self._addresses.clear()
+
+    def poll(self, timeout=None):
+        """
+        Waits for events on the connections and processes them
+
+        :param timeout: maximum time to wait, in seconds
+        :type timeout: float
+        """
+        for connection in list(self._paused):
+            if connection.task.response._content.buffered < HIGH_WATER:
+                self._paused.discard(connection)
+                self._poller.modify(connection.fd, READ)
+
+        if not self._connections:
+            self._dispatch()
+            return
+        if self._deadlines:
+            wait = max(self._deadlines[0][0] - time.time(), 0)
+            if timeout is None or wait < timeout:
+                timeout = wait
+
+        try:
+            events = self._poller.poll(timeout)
+        except (IOError, OSError, select.error) as e:
+            if e.args[0] == errno.EINTR:
+                return
+            raise
+
+        for fd, event in events:
+            connection = self._connections.get(fd)
+            if connection is None:
+                continue
+            try:
+                if event & (WRITE | ERROR) and connection.state != OPEN:
+                    self._connect(connection)
+                elif event & WRITE:
+                    self._send(connection)
+                if event & (READ | ERROR) and connection.state == OPEN:
+                    self._receive(connection)
+            except (socket.error, ssl.SSLError, ParseError) as e:
+                self._fail(connection, e)
+            except Exception as e:
+                if connection.task is None:
+                    # raised once the request was done, ie. by a callback
+                    raise
+                # ie. the content of the request raised: not worth a retry
+                connection.task.retried = True
+                self._fail(connection, e)
+
+        self._expire(time.time())
+        self._dispatch()
+
+    def _dispatch(self):
+        # starts the queued tasks, as far as the limits allow
+        for key in self._queues.keys():
+            queue = self._queues[key]
+            while queue:
+                try:
+                    connection = self._acquire(key)
+                except socket.error as e:
+                    task = queue.popleft()
+                    task.finished = True
+                    task.future.set_exception(e)
+                    continue
+                if connection is None:
+                    break
+                self._start(connection, queue.popleft())
+            if not queue:
+                del self._queues[key]
+
+    def _acquire(self, key):
+        now = time.time()
+        idle = self._idle.get(key)
+        while idle:
+            connection = idle.pop()
+            if now - connection.last_used < self.idle_timeout:
+                return connection
+            connection.close()
+            self._forget(connection)
+        if self._opened.get(key, 0) >= self.max_connections_per_host:
+            return None
+        if self._total >= self.max_connections and not self._close_idle():
+            return None
+        connection = _Connection(key, self._addresses[key])
+        self._opened[key] = self._opened.get(key, 0) + 1
+        self._total += 1
+        return connection
+
+    def _close_idle(self):
+        # closes the idle connection used the longest time ago
+        oldest = None
+        for idle in self._idle.values():
+            if idle and (oldest is None or
+                         idle[0].last_used < oldest.last_used):
+                oldest = idle[0]
+        if oldest is None:
+            return False
+        self._idle[oldest.key].pop(0)
+        oldest.close()
+        self._forget(oldest)
+        return True
+
+    def _forget(self, connection):
+        self._opened[connection.key] -= 1
+        self._total -= 1
+
+    def _start(self, connection, task):
+        task.connection = connection
+        connection.task = task
+        connection.chunks = task.request.iter_chunks()
+        connection.pending = None
+        connection.parser.request_method = task.request.method
+        connection.requests += 1
+        self._connections[connection.fd] = connection
+        self._poller.register(connection.fd, WRITE)
+        if task.timeout is not None:
+            self._sequence += 1
+            heapq.heappush(self._deadlines, (time.time() + task.timeout,
+                                             self._sequence, task))
+
+    def _connect(self, connection):
+        sock = connection.sock
+        if connection.state == CONNECTING:
+            err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            if err:
+                raise socket.error(err, errno.errorcode.get(err, ''))
+            if connection.key[0] != 'https':
+                connection.state = OPEN
+                self._send(connection)
+                return
+            context = ssl.create_default_context()
+            connection.sock = sock = context.wrap_socket(
+                sock, server_hostname=connection.key[1],
+                do_handshake_on_connect=False)
+            connection.state = HANDSHAKING
+        try:
+            sock.do_handshake()
+        except ssl.SSLWantReadError:
+            self._poller.modify(connection.fd, READ)
+            return
+        except ssl.SSLWantWriteError:
+            self._poller.modify(connection.fd, WRITE)
+            return
+        connection.state = OPEN
+        self._poller.modify(connection.fd, WRITE)
+
+    def _send(self, connection):
+        sock = connection.sock
+        while True:
+            pending = connection.pending
+            if pending is None:
+                chunk = next(connection.chunks, None)
+                if chunk is None:
+                    self._poller.modify(connection.fd, READ)
+                    return
+                pending = memoryview(chunk)
+            try:
+                sent = sock.send(pending)
+            except (socket.error, ssl.SSLError) as e:
+                if e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK,
+                                 ssl.SSL_ERROR_WANT_WRITE):
+                    connection.pending = pending
+                    return
+                raise
+            connection.pending = pending[sent:] if sent < len(pending) \
+                else None
+            if connection.pending is not None:
+                return
+
+    def _receive(self, connection):
+        task = connection.task
+        parser = connection.parser
+        sock = connection.sock
+        try:
+            data = sock.recv(CHUNK_SIZE)
+        except (socket.error, ssl.SSLError) as e:
+            if e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK,
+                             ssl.SSL_ERROR_WANT_READ):
+                return
+            raise
+        if data and connection.state == OPEN and \
+                isinstance(sock, ssl.SSLSocket):
+            # decrypted data can be waiting without the socket being
+            # readable
+            while sock.pending():
+                data += sock.recv(sock.pending())
+
+        if not data:
+            if task.response is None and parser.idle:
+                self._fail(connection,
+                           socket.error("connection closed by the server"))
+                return
+            parser.feed_eof()
+            if parser.idle:
+                self._finish(connection, reuse=False)
+                return
+            raise socket.error("connection closed by the server")
+
+        for message in parser.feed(data):
+            if task.response is None and not message.is_info:
+                message._request = task.request
+                task.response = message
+                if task.stream:
+                    body = message._content
+                    body.fill = lambda: self._fill(task)
+                    body.on_finish = lambda: self._end_stream(task, True)
+                    body.on_close = lambda: self._end_stream(task, False)
+                    task.future.set_result(message)
+
+        if task.response is not None and parser.idle:
+            self._finish(connection, reuse=parser.keep_alive)
+        elif task.stream and task.response is not None \
+                and task.response._content.buffered >= HIGH_WATER:
+            self._paused.add(connection)
+            self._poller.modify(connection.fd, 0)
+
+    def _fill(self, task):
+        # reads more of a streamed body
+        if task.finished is False:
+            self.poll()
+        if isinstance(task.finished, Exception):
+            raise task.finished
+
+    def _end_stream(self, task, complete):
+        # the content of a streamed response was read to the end, or closed
+        # before. The connection is usually released as soon as the whole
+        # response is received; otherwise it is given up here
+        if task.finished is not False:
+            return
+        connection = task.connection
+        parser = connection.parser
+        if complete and parser.idle:
+            task.finished = True
+            self._release(connection, reuse=parser.keep_alive)
+        else:
+            task.finished = socket.error('the response was closed')
+            self._release(connection, reuse=False)
+        self._dispatch()
+
+    def _finish(self, connection, reuse):
+        task = connection.task
+        task.finished = True
+        self._release(connection, reuse)
+        if not task.stream:
+            task.future.set_result(task.response)
+
+    def _release(self, connection, reuse):
+        del self._connections[connection.fd]
+        self._paused.discard(connection)
+        self._poller.unregister(connection.fd)
+        connection.task = None
+        connection.chunks = None
+        if reuse and self.idle_timeout:
+            connection.last_used = time.time()
+            self._idle.setdefault(connection.key, []).append(connection)
+        else:
+            connection.close()
+            self._forget(connection)
+
+    def _retry(self, connection):
+        task = connection.task
+        task.retried = True
+        task.connection = None
+        self._release(connection, reuse=False)
+        self._queues.setdefault(task.key, deque()).appendleft(task)
+
+    def _fail(self, connection, exception):
+        task = connection.task
+        if task.response is None and connection.requests > 1 \
+                and not task.retried \
+                and task.request.method in IDEMPOTENT_METHODS:
+            # a reused connection was closed by the server
+            self._retry(connection)
+            return
+        self._release(connection, reuse=False)
+        if task.future.done:
+            # the head of a streamed response was received: the error is
+            # raised when the content is read
+            task.finished = exception
+        else:
+            task.finished = True
+            task.future.set_exception(exception)
+
+    def _expire(self, now):
+        deadlines = self._deadlines
+        while deadlines and deadlines[0][0] <= now:
+            deadline, sequence, task = heapq.heappop(deadlines)
+            if task.finished or task.connection is None:
+                continue
+            task.retried = True
+            self._fail(task.connection,
+                       socket.timeout("request timed out"))
@@ -0,0 +1,729 @@
+import errno
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from client import Client
+from date import Date
+from headers import Headers, AGE, AUTHORIZATION, CONNECTION, \
+    CONTENT_LENGTH, DATE, ETAG, EXPIRES, IF_MODIFIED_SINCE, IF_NONE_MATCH, \
+    KEEP_ALIVE, LAST_MODIFIED, PRAGMA, RANGE, TRANSFER_ENCODING
+from message import Body
+from request import Request
+from response import Response
+
+# methods whose responses are stored
+CACHEABLE_METHODS = frozenset(['GET', 'HEAD'])
+
+# status codes cacheable without explicit freshness (RFC 7231, 6.1)
+HEURISTIC_STATUSES = frozenset(
+    [200, 203, 204, 300, 301, 404, 405, 410, 414, 501])
+
+# status codes the cache knows how to store
+STORABLE_STATUSES = HEURISTIC_STATUSES | frozenset([302, 307, 308])
+
+# methods invalidating the stored responses of their URL
+UNSAFE_METHODS = frozenset(['POST', 'PUT', 'DELETE', 'PATCH'])
+
+# headers of a 304 response that don't apply to the stored response
+_NOT_UPDATED = frozenset(
+    [h.lower_name for h in (CONNECTION, CONTENT_LENGTH, KEEP_ALIVE,
+                            TRANSFER_ENCODING)])
+
+
+class CacheEntry(object):
+    """
+    A response kept by the cache, with what is needed to tell whether it
+    is fresh
+    """
+
+    def __init__(self, status, message, headers, content, request_time,
+                 response_time, vary=()):
+        """
+        Construct a new ``CacheEntry`` object
+
+        :param status: HTTP status
+        :type status: int
+        :param message: reason phrase
+        :type message: string
+        :param headers: headers of the response
+        :type headers: list of tuples
+        :param content: content of the response
+        :type content: string or ``memoryview``
+        :param request_time: when the request was sent, in seconds since
+            the epoch
+        :type request_time: float
+        :param response_time: when the response was received
+        :type response_time: float
+        :param vary: ``(name, value)`` of the request headers listed in the
+            *Vary* header of the response
+        :type vary: tuple
+        """
+        self.status = status
+        self.message = message
+        self.headers = headers
+        self.content = content
+        self.request_time = request_time
+        self.response_time = response_time
+        self.vary = vary
+
+    @property
+    def size(self):
+        """
+        Returns the approximate number of bytes used by the entry
+
+        :rtype: int
+        """
+        return len(self.content) + sum(len(k) + len(v) + 4
+                                       for k, v in self.headers)
+
+    @property
+    def current_age(self):
+        """
+        Returns the age of the response, in seconds (RFC 7234, 4.2.3)
+
+        :rtype: float
+        """
+        headers = Headers(self.headers)
+        date = _epoch(headers[DATE])
+        apparent_age = 0
+        if date is not None:
+            apparent_age = max(0, self.response_time - date)
+        try:
+            age = int(headers[AGE] or 0)
+        except ValueError:
+            age = 0
+        response_delay = self.response_time - self.request_time
+        corrected_age = max(apparent_age, age + response_delay)
+        return corrected_age + time.time() - self.response_time
+
+    @property
+    def freshness_lifetime(self):
+        """
+        Returns how long the response stays fresh, in seconds (RFC 7234,
+        4.2.1), or 0 when it must be revalidated
+
+        :rtype: float
+        """
+        headers = Headers(self.headers)
+        directives = headers.cache_control
+        if 'no-cache' in directives:
+            return 0
+        if 'max-age' in directives:
+            return _seconds(directives['max-age'])
+        expires = headers[EXPIRES]
+        if expires is not None:
+            expires = _epoch(expires)
+            date = _epoch(headers[DATE])
+            if expires is None:
+                # an invalid date means already expired
+                return 0
+            return max(0, expires - (date or self.response_time))
+        last_modified = _epoch(headers[LAST_MODIFIED])
+        if last_modified is not None and self.status in HEURISTIC_STATUSES:
+            date = _epoch(headers[DATE]) or self.response_time
+            return max(0, (date - last_modified) / 10.0)
+        return 0
+
+    def to_response(self):
+        """
+        Returns a new :class:`Response` built from the entry, with an
+        *Age* header
+
+        :rtype: class:`Response`
+        """
+        headers = Headers(self.headers)
+        headers.set(AGE, str(int(self.current_age)))
+        content = self.content
+        if not isinstance(content, str):
+            # a view on a file: streamed, so that it is sent without being
+            # copied
+            body = Body()
+            body.push(content)
+            body.finish()
+            content = body
+        return Response.from_parts(self.status, self.message, headers,
+                                   content)
+
+
+class LRUStore(object):
+    """
+    Store of the cache keeping the entries in memory. The entries used the
+    least recently are dropped when there are more than *max_entries* of
+    them, or when they take more than *max_size* bytes.
+
+    A store maps a key to the list of the entries stored for it, one per
+    variant of the response. Any object with the same :meth:`get`,
+    :meth:`set` and :meth:`delete` methods can be used instead.
+    """
+
+    def __init__(self, max_entries=1024, max_size=64 * 1024 * 1024):
+        """
+        Construct a new ``LRUStore`` object
+
+        :param max_entries: maximum number of entries
+        :type max_entries: int
+        :param max_size: maximum number of bytes used by the entries
+        :type max_size: int
+        """
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.size = 0
+        # key -> (entries, size), least recently used first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Returns the entries stored for a key
+
+        :param key: key of the entries
+        :type key: tuple
+        :rtype: list of class:`CacheEntry` or ``None``
+        """
+        with self._lock:
+            item = self._entries.pop(key, None)
+            if item is None:
+                return None
+            self._entries[key] = item
+            return item[0]
+
+    def set(self, key, entries):
+        """
+        Stores the entries for a key
+
+        :param key: key of the entries
+        :type key: tuple
+        :param entries: the entries
+        :type entries: list of class:`CacheEntry`
+        """
+        size = sum(entry.size for entry in entries)
+        with self._lock:
+            self._pop(key)
+            if size > self.max_size:
+                return
+            self._entries[key] = (entries, size)
+            self.size += size
+            while len(self._entries) > self.max_entries or \
+                    self.size > self.max_size:
+                self._pop(next(iter(self._entries)))
+
+    def delete(self, key):
+        """
+        Removes the entries of a key
+
+        :param key: key of the entries
+        :type key: tuple
+        """
+        with self._lock:
+            self._pop(key)
+
+    def _pop(self, key):
+        item = self._entries.pop(key, None)
+        if item is not None:
+            self.size -= item[1]
+
+
+class DiskStore(object):
+    """
+    Store of the cache keeping the entries in a directory, that several
+    processes can share.
+
+    The content of each entry is written once, to a file of its own, and
+    given back as a ``memoryview`` over a memory map of that file: a hit
+    doesn't read the content in memory, and the view is sent as is.
+
+    The URL, the headers, the validators and the expiry of the entries are
+    kept in an index file, where every change is appended as a line. Each
+    process reads the lines appended by the others as it goes, and the
+    file is rewritten when most of its lines are outdated. Writers take a
+    lock on the directory; readers don't.
+
+    When the contents take more than *max_size* bytes, the entries that
+    can't be used anymore, being stale without a validator, are dropped
+    first, then the oldest ones.
+    """
+
+    def __init__(self, directory, max_size=1024 * 1024 * 1024):
+        """
+        Construct a new ``DiskStore`` object
+
+        :param directory: where the entries are kept, created if needed
+        :type directory: string
+        :param max_size: maximum number of bytes of content
+        :type max_size: int
+        """
+        self.directory = directory
+        self.max_size = max_size
+        _makedirs(os.path.join(directory, 'data'))
+        self._index_path = os.path.join(directory, 'index')
+        self._lock_path = os.path.join(directory, 'lock')
+        self._records = {}  # key -> list of records of the entries
+        self._size = 0      # sum of the lengths of the records
+        self._lines = 0
+        self._offset = 0
+        self._inode = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            self._refresh()
+            return len(self._records)
+
+    @property
+    def size(self):
+        """
+        Returns the number of bytes of content stored
+
+        :rtype: int
+        """
+        with self._lock:
+            self._refresh()
+            return self._size
+
+    def get(self, key):
+        """
+        Returns the entries stored for a key
+
+        :param key: key of the entries
+        :type key: tuple
+        :rtype: list of class:`CacheEntry` or ``None``
+        """
+        with self._lock:
+            self._refresh()
+            records = self._records.get(_index_key(key))
+        if not records:
+            return None
+        entries = []
+        for record in records:
+            try:
+                content = self._map(record['data'], record['length'])
+            except EnvironmentError:
+                # dropped by another process
+                return None
+            entry = CacheEntry(record['status'], _str(record['message']),
+                               [(_str(k), _str(v))
+                                for k, v in record['headers']],
+                               content, record['request_time'],
+                               record['response_time'],
+                               tuple((_str(k), _str(v))
+                                     for k, v in record['vary']))
+            entry.data = record['data']
+            entries.append(entry)
+        return entries
+
+    def set(self, key, entries):
+        """
+        Stores the entries for a key. The content of an entry is written
+        unless it comes from this store
+
+        :param key: key of the entries
+        :type key: tuple
+        :param entries: the entries
+        :type entries: list of class:`CacheEntry`
+        """
+        records = []
+        for entry in entries:
+            data = getattr(entry, 'data', None)
+            if data is None or not os.path.exists(
+                    os.path.join(self.directory, 'data', data)):
+                data = entry.data = self._write(key, entry.content)
+            records.append(_record(entry, data))
+        with self._lock:
+            with _FileLock(self._lock_path):
+                self._refresh()
+                self._update(_index_key(key), records)
+                self._evict()
+                if self._lines > 2 * len(self._records) + 64:
+                    self._compact()
+
+    def delete(self, key):
+        """
+        Removes the entries of a key
+
+        :param key: key of the entries
+        :type key: tuple
+        """
+        with self._lock:
+            with _FileLock(self._lock_path):
+                self._refresh()
+                if _index_key(key) in self._records:
+                    self._update(_index_key(key), [])
+
+    def _map(self, data, length):
+        # returns a view over the content of an entry
+        if not length:
+            return ''
+        with open(os.path.join(self.directory, 'data', data), 'rb') as f:
+            m = mmap.mmap(f.fileno(), length, access=mmap.ACCESS_READ)
+        return memoryview(buffer(m))
+
+    def _write(self, key, content):
+        # writes the content of an entry to a new file, and returns its name
+        digest = hashlib.sha1(repr((key, time.time(), os.getpid(),
+                                    threading.current_thread().ident)))
+        data = digest.hexdigest()
+        path = os.path.join(self.directory, 'data', data)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(content)
+        os.rename(path + '.tmp', path)
+        return data
+
+    def _refresh(self):
+        # reads the lines appended to the index by the other processes.
+        # Must hold the lock
+        try:
+            stat = os.stat(self._index_path)
+        except OSError:
+            return
+        if stat.st_ino != self._inode:
+            # rewritten
+            self._records = {}
+            self._size = 0
+            self._lines = 0
+            self._offset = 0
+            self._inode = stat.st_ino
+        if stat.st_size <= self._offset:
+            return
+        with open(self._index_path, 'rb') as f:
+            f.seek(self._offset)
+            data = f.read()
+        # a line being written is read next time
+        end = data.rfind('\n') + 1
+        self._offset += end
+        for line in data[:end].splitlines():
+            key, records = json.loads(line)
+            key = _str(key)
+            self._lines += 1
+            self._put(key, records)
+
+    def _update(self, key, records):
+        # appends a change to the index. Must hold both locks
+        previous = self._put(key, records)
+        self._append([_dumps([key, records])])
+        kept = set(record['data'] for record in records)
+        self._unlink(r['data'] for r in previous if r['data'] not in kept)
+
+    def _put(self, key, records):
+        # sets the records of a key, or removes them, keeping the total
+        # size. Returns the previous records. Must hold the lock
+        previous = self._records.pop(key, ())
+        self._size -= sum(record['length'] for record in previous)
+        if records:
+            self._records[key] = records
+            self._size += sum(record['length'] for record in records)
+        return previous
+
+    def _append(self, lines):
+        data = ''.join(line + '\n' for line in lines)
+        fd = os.open(self._index_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+                     0644)
+        try:
+            os.write(fd, data)
+            stat = os.fstat(fd)
+        finally:
+            os.close(fd)
+        if self._inode is None:
+            self._inode = stat.st_ino
+        if self._inode == stat.st_ino and \
+                self._offset + len(data) == stat.st_size:
+            self._offset = stat.st_size
+        self._lines += len(lines)
+
+    def _evict(self):
+        # drops entries until the contents fit. Must hold both locks
+        if self._size <= self.max_size:
+            return
+        now = time.time()
+        candidates = []
+        for key, records in self._records.iteritems():
+            usable = any(r['expires'] > now or r['etag'] is not None or
+                         r['last_modified'] is not None for r in records)
+            candidates.append((usable, max(r['response_time']
+                                           for r in records), key))
+        candidates.sort()
+        lines = []
+        for usable, response_time, key in candidates:
+            if self._size <= self.max_size:
+                break
+            records = self._put(key, [])
+            lines.append(_dumps([key, []]))
+            self._unlink(record['data'] for record in records)
+        self._append(lines)
+
+    def _compact(self):
+        # rewrites the index with only the current entries. Must hold both
+        # locks
+        path = self._index_path + '.tmp'
+        with open(path, 'wb') as f:
+            for key, records in self._records.iteritems():
+                f.write(_dumps([key, records]) + '\n')
+        os.rename(path, self._index_path)
+        stat = os.stat(self._index_path)
+        self._inode = stat.st_ino
+        self._offset = stat.st_size
+        self._lines = len(self._records)
+
+    def _unlink(self, names):
+        for name in names:
+            try:
+                os.remove(os.path.join(self.directory, 'data', name))
+            except OSError:
+                pass
+
+
+class _FileLock(object):
+    """Exclusive lock on a file, between processes"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0644)
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+
+    def __exit__(self, *args):
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+        os.close(self.fd)
+
+
+class CachingClient(object):
+    """
+    HTTP client keeping responses in a cache, as a private cache does (RFC
+    7234).
+
+    A fresh response is served from the cache, without touching the
+    network. A stale one is revalidated with a conditional request, and a
+    *304 Not Modified* response refreshes the stored one. The
+    *Cache-Control* directives *max-age*, *no-cache* and *no-store* of the
+    requests and of the responses are honored.
+    """
+
+    def __init__(self, client=None, store=None):
+        """
+        Construct a new ``CachingClient`` object
+
+        :param client: client sending the requests the cache can't answer
+        :type client: class:`Client`
+        :param store: where the responses are kept, a :class:`LRUStore`
+            by default
+        """
+        self.client = client if client is not None else Client()
+        self.store = store if store is not None else LRUStore()
+        #: number of requests answered from the cache
+        self.hits = 0
+        #: number of requests answered after a revalidation
+        self.revalidations = 0
+        #: number of requests sent without a usable response in the cache
+        self.misses = 0
+
+    def request(self, request):
+        """
+        Returns the response to a request, from the cache if possible
+
+        :param request: the request
+        :type request: class:`Request`
+        :rtype: class:`Response`
+        """
+        method = request.method
+        key = (method, str(request.url))
+        if method not in CACHEABLE_METHODS:
+            response = self.client.request(request)
+            if method in UNSAFE_METHODS and not response.is_error:
+                for method in CACHEABLE_METHODS:
+                    self.store.delete((method, key[1]))
+            return response
+
+        headers = request.headers
+        if RANGE in headers or IF_NONE_MATCH in headers or \
+                IF_MODIFIED_SINCE in headers:
+            # the caller handles it
+            self.misses += 1
+            return self.client.request(request)
+
+        directives = headers.cache_control
+        if headers.get(PRAGMA) == 'no-cache':
+            directives['no-cache'] = None
+        entries = self.store.get(key) or []
+        entry = _select(entries, headers)
+        if entry is not None and 'no-cache' not in directives:
+            age = entry.current_age
+            lifetime = entry.freshness_lifetime
+            if 'max-age' in directives:
+                lifetime = min(lifetime, _seconds(directives['max-age']))
+            if age < lifetime:
+                self.hits += 1
+                response = entry.to_response()
+                response._request = request
+                return response
+
+        request_time = time.time()
+        if entry is not None:
+            response = self.client.request(_conditional(request, entry))
+            response._request = request
+        else:
+            response = self.client.request(request)
+        response_time = time.time()
+
+        if entry is not None and response.status == 304:
+            self.revalidations += 1
+            merged = Headers(entry.headers)
+            updated = set()
+            for name, value in response.headers.to_list():
+                lname = name.lower()
+                if lname in _NOT_UPDATED:
+                    continue
+                if lname not in updated:
+                    merged.remove(name)
+                    updated.add(lname)
+                merged.add(name, value)
+            entry.headers = merged.to_list()
+            entry.request_time = request_time
+            entry.response_time = response_time
+            self._store(key, entries, entry, directives)
+            response = entry.to_response()
+            response._request = request
+            return response
+
+        self.misses += 1
+        if entry is not None:
+            entries.remove(entry)
+        entry = self._entry(request, response, request_time, response_time,
+                            directives)
+        if entry is not None:
+            self._store(key, entries, entry, directives)
+        elif entries:
+            self.store.set(key, entries)
+        else:
+            self.store.delete(key)
+        return response
+
+    def close(self):
+        """Closes the connections of the client"""
+        self.client.close()
+
+    def _entry(self, request, response, request_time, response_time,
+               directives):
+        # returns the entry to store for a response, or None if it can't
+        # be stored
+        if 'no-store' in directives:
+            return None
+        if response.status not in STORABLE_STATUSES:
+            return None
+        headers = response.headers
+        response_directives = headers.cache_control
+        if 'no-store' in response_directives:
+            return None
+        if AUTHORIZATION in request.headers and \
+                'public' not in response_directives:
+            return None
+        names = headers.vary
+        if '*' in names:
+            return None
+        vary = tuple((name, _request_value(request.headers, name))
+                     for name in names)
+        entry = CacheEntry(response.status, response.message,
+                           headers.to_list(), response.content or '',
+                           request_time, response_time, vary)
+        if entry.freshness_lifetime <= 0 and ETAG not in headers and \
+                LAST_MODIFIED not in headers:
+            # would never be used
+            return None
+        return entry
+
+    def _store(self, key, entries, entry, directives):
+        entries = [e for e in entries if e.vary != entry.vary and
+                   e is not entry]
+        entries.append(entry)
+        self.store.set(key, entries)
+
+
+def _select(entries, headers):
+    # returns the entry matching the headers of a request
+    for entry in entries:
+        for name, value in entry.vary:
+            if _request_value(headers, name) != value:
+                break
+        else:
+            return entry
+    return None
+
+
+def _request_value(headers, name):
+    return ', '.join(str(v) for v in headers.get_list(name))
+
+
+def _conditional(request, entry):
+    # returns a copy of the request, validating the stored entry
+    headers = request.headers.copy()
+    stored = Headers(entry.headers)
+    etag = stored[ETAG]
+    if etag is not None:
+        headers.set(IF_NONE_MATCH, etag)
+    last_modified = stored[LAST_MODIFIED]
+    if last_modified is not None:
+        headers.set(IF_MODIFIED_SINCE, last_modified)
+    return Request(request.method, request.url, headers=headers,
+                   content=request._content)
+
+
+def _index_key(key):
+    return ' '.join(key)
+
+
+def _dumps(value):
+    # the strings of the index are bytes, whatever their encoding
+    return json.dumps(value, encoding='latin-1')
+
+
+def _str(value):
+    if isinstance(value, unicode):
+        return value.encode('latin-1')
+    return value
+
+
+def _record(entry, data):
+    # returns what the index keeps about an entry
+    headers = Headers(entry.headers)
+    lifetime = entry.freshness_lifetime
+    return {'status': entry.status, 'message': entry.message,
+            'headers': entry.headers, 'data': data,
+            'length': len(entry.content),
+            'request_time': entry.request_time,
+            'response_time': entry.response_time, 'vary': entry.vary,
+            'etag': headers[ETAG],
+            'last_modified': headers[LAST_MODIFIED],
+            'expires': time.time() + lifetime - entry.current_age}
+
+
+def _makedirs(path):
+    try:
+        os.makedirs(path)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+
+
+def _epoch(value):
+    # returns an HTTP date as seconds since the epoch, or None if invalid
+    if value is None:
+        return None
+    try:
+        return Date.str2epoch(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def _seconds(value):
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return 0
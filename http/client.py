@@ -0,0 +1,653 @@
+import os
+import socket
+import ssl
+import threading
+import time
+from calendar import timegm
+from collections import deque, namedtuple
+from Queue import Queue
+
+from date import Date
+from exception import ParseError
+from headers import CONNECTION, CONTENT_LENGTH, CONTENT_RANGE, ETAG, HOST, \
+    IF_NONE_MATCH, IF_RANGE, RANGE, TRANSFER_ENCODING, USER_AGENT
+from message import CHUNK_SIZE
+from parser import ResponseParser
+from request import Request
+from url import Url
+
+DEFAULT_AGENT = 'http/python'
+
+# methods that can be sent again when a reused connection turns out to be
+# closed by the server
+IDEMPOTENT_METHODS = frozenset(
+    ['GET', 'HEAD', 'OPTIONS', 'TRACE', 'PUT', 'DELETE'])
+
+#: outcome of mirroring one URL with :meth:`Client.mirror_many`: the HTTP
+#: status (``None`` on error), the number of bytes written, ``True`` if the
+#: local copy was up to date, and the exception raised if any
+MirrorResult = namedtuple('MirrorResult',
+                          'url path status bytes not_modified error')
+
+
+class Connection(object):
+    """
+    A connection to a host, with the parser reading responses from it
+    """
+
+    def __init__(self, key, timeout=None):
+        """
+        Construct a new ``Connection`` object, and connect to the host
+
+        :param key: (scheme, host, port) of the connection
+        :type key: tuple
+        :param timeout: timeout of the socket operations, in seconds
+        :type timeout: float
+        """
+        scheme, host, port = key
+        self.key = key
+        self.sock = socket.create_connection((host, port), timeout)
+        # the head and the body are sent separately
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if scheme == 'https':
+            context = ssl.create_default_context()
+            self.sock = context.wrap_socket(self.sock, server_hostname=host)
+        self.parser = ResponseParser(read=self._read)
+        self.last_used = time.time()
+        self.requests = 0
+
+    def _read(self):
+        return self.sock.recv(CHUNK_SIZE)
+
+    def send(self, request):
+        """
+        Sends a request on the connection
+
+        :param request: the request to send
+        :type request: class:`Request`
+        """
+        sendall = self.sock.sendall
+        for chunk in request.iter_chunks():
+            sendall(chunk)
+        self.parser.request_method = request.method
+        self.requests += 1
+
+    def close(self):
+        """Closes the connection"""
+        try:
+            self.sock.close()
+        except socket.error:
+            pass
+
+
+class ConnectionPool(object):
+    """
+    Pool of connections, kept open between requests.
+
+    The number of connections is capped per host and in total; when the
+    cap is reached, :meth:`acquire` waits for a connection to be released,
+    at most *timeout* seconds.
+    Idle connections are closed after *idle_timeout* seconds.
+    """
+
+    def __init__(self, max_per_host=10, max_total=100, idle_timeout=60,
+                 timeout=None):
+        """
+        Construct a new ``ConnectionPool`` object
+
+        :param max_per_host: maximum number of connections to a host
+        :type max_per_host: int
+        :param max_total: maximum number of connections
+        :type max_total: int
+        :param idle_timeout: seconds after which idle connections are closed
+        :type idle_timeout: float
+        :param timeout: timeout of the socket operations, in seconds
+        :type timeout: float
+        """
+        self.max_per_host = max_per_host
+        self.max_total = max_total
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._idle = {}     # key -> list of idle connections, last used last
+        self._opened = {}   # key -> number of open connections
+        self._total = 0
+        self._cond = threading.Condition(threading.Lock())
+
+    def acquire(self, key):
+        """
+        Returns a connection to a host: an idle one if there is one, or a
+        new one
+
+        :param key: (scheme, host, port) of the connection
+        :type key: tuple
+        :raises: ``socket.timeout`` if no connection was released in time
+        :rtype: class:`Connection`
+        """
+        deadline = None
+        if self.timeout is not None:
+            deadline = time.time() + self.timeout
+        with self._cond:
+            while True:
+                self._evict(time.time())
+                idle = self._idle.get(key)
+                if idle:
+                    return idle.pop()
+                if self._opened.get(key, 0) < self.max_per_host:
+                    if self._total >= self.max_total:
+                        self._close_oldest()
+                    if self._total < self.max_total:
+                        self._opened[key] = self._opened.get(key, 0) + 1
+                        self._total += 1
+                        break
+                if deadline is None:
+                    self._cond.wait()
+                    continue
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise socket.timeout('no connection available')
+                self._cond.wait(remaining)
+
+        try:
+            return Connection(key, self.timeout)
+        except:
+            self._forget(key)
+            raise
+
+    def release(self, connection, reuse=True):
+        """
+        Gives a connection back to the pool
+
+        :param connection: the connection
+        :type connection: class:`Connection`
+        :param reuse: if ``False`` the connection is closed
+        :type reuse: boolean
+        """
+        if not reuse or not self.idle_timeout:
+            connection.close()
+            self._forget(connection.key)
+            return
+        connection.last_used = time.time()
+        with self._cond:
+            self._idle.setdefault(connection.key, []).append(connection)
+            self._cond.notify()
+
+    def close(self):
+        """Closes all the idle connections"""
+        with self._cond:
+            for idle in self._idle.values():
+                for connection in idle:
+                    connection.close()
+                    self._opened[connection.key] -= 1
+                    self._total -= 1
+            self._idle.clear()
+            self._cond.notify_all()
+
+    @property
+    def idle(self):
+        """
+        Returns the number of idle connections
+
+        :rtype: int
+        """
+        with self._cond:
+            return sum(len(idle) for idle in self._idle.values())
+
+    def _forget(self, key):
+        with self._cond:
+            self._opened[key] -= 1
+            self._total -= 1
+            self._cond.notify()
+
+    def _evict(self, now):
+        # closes the connections idle for too long. Must hold the lock
+        limit = now - self.idle_timeout
+        for key, idle in self._idle.items():
+            while idle and idle[0].last_used < limit:
+                idle.pop(0).close()
+                self._opened[key] -= 1
+                self._total -= 1
+            if not idle:
+                del self._idle[key]
+
+    def _close_oldest(self):
+        # closes the idle connection used the longest time ago, to make
+        # room for a new one. Must hold the lock
+        oldest = None
+        for idle in self._idle.values():
+            if idle and (oldest is None or
+                         idle[0].last_used < oldest.last_used):
+                oldest = idle[0]
+        if oldest is None:
+            return
+        idle = self._idle[oldest.key]
+        idle.pop(0).close()
+        if not idle:
+            del self._idle[oldest.key]
+        self._opened[oldest.key] -= 1
+        self._total -= 1
+
+
+class Client(object):
+    """
+    HTTP client sending class:`Request` objects and returning
+    class:`Response` objects. Connections are kept alive and reused
+    between requests to the same host.
+    """
+
+    def __init__(self, agent=None, timeout=60, keep_alive=True,
+                 max_connections_per_host=10, max_connections=100,
+                 idle_timeout=60):
+        """
+        Construct a new ``Client`` object
+
+        :param agent: value of the *User-Agent* header
+        :type agent: string
+        :param timeout: timeout of the socket operations, in seconds
+        :type timeout: float
+        :param keep_alive: if ``False``, a connection is used for a single
+            request
+        :type keep_alive: boolean
+        :param max_connections_per_host: maximum number of connections to
+            a host
+        :type max_connections_per_host: int
+        :param max_connections: maximum number of connections
+        :type max_connections: int
+        :param idle_timeout: seconds after which idle connections are closed
+        :type idle_timeout: float
+        """
+        self.agent = agent or DEFAULT_AGENT
+        self.keep_alive = keep_alive
+        self.pool = ConnectionPool(max_connections_per_host, max_connections,
+                                   idle_timeout if keep_alive else 0, timeout)
+
+    def request(self, request, stream=False):
+        """
+        Sends a request and returns the response
+
+        :param request: the request to send
+        :type request: class:`Request`
+        :param stream: if ``True``, the content of the response is read
+            from the connection as it is iterated over, and the connection
+            goes back to the pool once it has been read
+        :type stream: boolean
+        :rtype: class:`Response`
+        """
+        key = self._prepare(request)
+        while True:
+            connection = self.pool.acquire(key)
+            reused = connection.requests > 0
+            try:
+                connection.send(request)
+                response = self._read_response(connection)
+            except socket.timeout:
+                # the server is slow, not gone: sending the request again
+                # would only wait as long again
+                self.pool.release(connection, reuse=False)
+                raise
+            except (socket.error, ParseError):
+                self.pool.release(connection, reuse=False)
+                if reused and request.method in IDEMPOTENT_METHODS:
+                    continue
+                raise
+            except:
+                # ie. the content of the request raised: the connection is
+                # in an unknown state
+                self.pool.release(connection, reuse=False)
+                raise
+            if response is None:
+                # the server closed an idle connection
+                self.pool.release(connection, reuse=False)
+                if reused and request.method in IDEMPOTENT_METHODS:
+                    continue
+                raise socket.error("connection closed by the server")
+            break
+
+        response._request = request
+        body = response._content
+        if body.complete:
+            self._release(connection)
+        elif stream:
+            body.on_finish = lambda: self._release(connection)
+            body.on_close = lambda: self.pool.release(connection,
+                                                      reuse=False)
+        else:
+            try:
+                response.content
+            except:
+                self.pool.release(connection, reuse=False)
+                raise
+            self._release(connection)
+        return response
+
+    def mirror(self, url, path):
+        """
+        Keeps the file at *path* a copy of the document at *url*.
+
+        The document is requested only if it changed since the last time:
+        the request carries the modification time of the file as
+        *If-Modified-Since*, and the *ETag* of the document, kept in
+        ``<path>.etag``, as *If-None-Match*. On a *304 Not Modified*
+        response nothing is transferred.
+
+        Otherwise the content is streamed to ``<path>.part``, which then
+        replaces the file, and the modification time of the file is set to
+        the *Last-Modified* date of the document. If the download is
+        interrupted, the next call resumes it with a *Range* request, as
+        long as the document has a strong *ETag*.
+
+        :param url: URL of the document
+        :type url: string or class:`Url`
+        :param path: path of the local copy
+        :type path: string
+        :rtype: class:`Response`
+        """
+        return self._mirror(url, path)[0]
+
+    def mirror_many(self, pairs, concurrency=10):
+        """
+        Mirrors many documents at the same time, as :meth:`mirror` does.
+
+        *concurrency* threads share the pool of connections. The pairs are
+        read as they are needed, and the URLs waiting to be mirrored are
+        grouped by host, so that a thread mirrors URLs of the same host one
+        after the other on the same connection. At most ``16 *
+        concurrency`` URLs are held at a time, however long *pairs* is.
+
+        A :class:`MirrorResult` is yielded for each URL once it is
+        mirrored, in the order they complete. Errors are reported in the
+        results instead of being raised.
+
+        :param pairs: ``(url, path)`` pairs
+        :type pairs: iterable
+        :param concurrency: number of URLs mirrored at the same time
+        :type concurrency: int
+        :rtype: iterator
+        """
+        scheduler = _MirrorScheduler(self.pool.max_per_host)
+        results = Queue()
+        threads = []
+        for i in range(concurrency):
+            thread = threading.Thread(target=self._mirror_worker,
+                                      args=(scheduler, results))
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+
+        pairs = iter(pairs)
+        window = 16 * concurrency
+        submitted = done = 0
+        try:
+            while True:
+                while pairs is not None and submitted - done < window:
+                    pair = next(pairs, None)
+                    if pair is None:
+                        pairs = None
+                        scheduler.close()
+                        break
+                    scheduler.add(*pair)
+                    submitted += 1
+                if pairs is None and done == submitted:
+                    return
+                result = results.get()
+                done += 1
+                yield result
+        finally:
+            scheduler.close(cancel=True)
+            for thread in threads:
+                thread.join()
+
+    def _mirror(self, url, path):
+        # mirrors a document, and returns the response with the number of
+        # bytes written
+        request = _mirror_request(url, path)
+        response = self.request(request, stream=True)
+        try:
+            if response.status == 416 and RANGE in request.headers:
+                # the partial download doesn't match the document anymore
+                response.content
+                _remove(path + '.part', path + '.part.etag')
+                request = _mirror_request(url, path)
+                response = self.request(request, stream=True)
+            return response, _mirror_response(response, path)
+        except:
+            # the content may not have been read to the end: the
+            # connection can't be reused
+            response.close()
+            raise
+
+    def _mirror_worker(self, scheduler, results):
+        while True:
+            task = scheduler.next()
+            if task is None:
+                return
+            key, url, path = task
+            try:
+                response, written = self._mirror(url, path)
+            except Exception as e:
+                result = MirrorResult(url, path, None, 0, False, e)
+            else:
+                result = MirrorResult(url, path, response.status, written,
+                                      response.status == 304, None)
+            scheduler.done(key)
+            results.put(result)
+
+    def close(self):
+        """Closes the idle connections"""
+        self.pool.close()
+
+    def _prepare(self, request):
+        # fills in the missing headers, and returns the key of the
+        # connections the request can be sent on
+        if not isinstance(request, Request):
+            raise TypeError("request is not a Request object")
+        key = _key(request.url)
+
+        headers = request.headers
+        if HOST not in headers:
+            host = request.url.host
+            if request.url.port:
+                host += ':' + str(request.url.port)
+            headers.set(HOST, host)
+        if USER_AGENT not in headers:
+            headers.set(USER_AGENT, self.agent)
+        if not self.keep_alive:
+            headers.set(CONNECTION, 'close')
+
+        content = request._content
+        if isinstance(content, unicode):
+            # sent in the charset of the Content-Type, or in UTF-8
+            charset = headers.content_type_params.get('charset') or 'utf-8'
+            content = request.content = content.encode(charset)
+        if CONTENT_LENGTH not in headers and TRANSFER_ENCODING not in headers:
+            if isinstance(content, str):
+                headers.set(CONTENT_LENGTH, len(content))
+            elif content is not None:
+                headers.set(TRANSFER_ENCODING, 'chunked')
+            elif request.method in ('POST', 'PUT', 'PATCH'):
+                headers.set(CONTENT_LENGTH, 0)
+        return key
+
+    def _read_response(self, connection):
+        parser = connection.parser
+        response = parser.next_message()
+        # skip the informational responses, ie. "100 Continue"
+        while response is not None and response.is_info:
+            response = parser.next_message()
+        return response
+
+    def _release(self, connection):
+        parser = connection.parser
+        self.pool.release(connection, reuse=parser.keep_alive and parser.idle)
+
+
+class _MirrorScheduler(object):
+    """
+    URLs waiting to be mirrored by :meth:`Client.mirror_many`, grouped by
+    host, and handed out to the threads
+    """
+
+    def __init__(self, max_per_host):
+        self.max_per_host = max_per_host
+        self._pending = {}  # key -> deque of (url, path)
+        self._busy = {}     # key -> number of threads on the host
+        self._closed = False
+        self._cond = threading.Condition(threading.Lock())
+
+    def add(self, url, path):
+        try:
+            key = _key(url if isinstance(url, Url) else Url(url))
+        except ValueError:
+            # reported by the thread mirroring it
+            key = None
+        with self._cond:
+            self._pending.setdefault(key, deque()).append((url, path))
+            self._cond.notify()
+
+    def close(self, cancel=False):
+        # no more URLs will be added; with *cancel*, the waiting ones are
+        # dropped
+        with self._cond:
+            self._closed = True
+            if cancel:
+                self._pending.clear()
+            self._cond.notify_all()
+
+    def next(self):
+        # returns the next (key, url, path) to mirror, or None once closed
+        # and empty. A host already being mirrored is preferred, as it has
+        # connections open
+        with self._cond:
+            while True:
+                best = None
+                for key, queue in self._pending.iteritems():
+                    busy = self._busy.get(key, 0)
+                    if busy >= self.max_per_host:
+                        continue
+                    if best is None or busy > best[0]:
+                        best = (busy, key)
+                if best is not None:
+                    key = best[1]
+                    queue = self._pending[key]
+                    url, path = queue.popleft()
+                    if not queue:
+                        del self._pending[key]
+                    self._busy[key] = best[0] + 1
+                    return key, url, path
+                if self._closed and not self._pending:
+                    return None
+                self._cond.wait()
+
+    def done(self, key):
+        with self._cond:
+            self._busy[key] -= 1
+            if not self._busy[key]:
+                del self._busy[key]
+            self._cond.notify_all()
+
+
+def _key(url):
+    # returns the (scheme, host, port) key of the connections to a host
+    if not url.host:
+        raise ValueError("url {0} is not absolute".format(url))
+    scheme = url.scheme.lower()
+    port = url.port or (443 if scheme == 'https' else 80)
+    return (scheme, url.host, int(port))
+
+
+def _mirror_request(url, path):
+    # builds the request of Client.mirror, conditional on the local copy
+    request = Request('GET', url)
+    headers = request.headers
+    part = path + '.part'
+    etag = _read(part + '.etag')
+    if etag is not None and not etag.startswith('W/') and \
+            os.path.exists(part):
+        size = os.path.getsize(part)
+        if size:
+            headers.set(RANGE, 'bytes={0}-'.format(size))
+            headers.set(IF_RANGE, etag)
+    if os.path.exists(path):
+        mtime = int(os.path.getmtime(path))
+        request.if_modified_since = Date.epoch2time(mtime)
+        etag = _read(path + '.etag')
+        if etag is not None:
+            headers.set(IF_NONE_MATCH, etag)
+    return request
+
+
+def _mirror_response(response, path):
+    # writes the content of a response to Client.mirror to the local copy.
+    # Returns the number of bytes written
+    part = path + '.part'
+    status = response.status
+    if status == 206:
+        start = _range_start(response.headers[CONTENT_RANGE])
+        if start is None or start > os.path.getsize(part):
+            response.content
+            _remove(part, part + '.etag')
+            raise ValueError("unexpected Content-Range: {0}".format(
+                response.headers[CONTENT_RANGE]))
+        mode = 'r+b'
+    elif status == 200:
+        start = 0
+        mode = 'wb'
+        etag = response.headers[ETAG]
+        if etag is None:
+            _remove(part + '.etag')
+        else:
+            # saved first, so that an interrupted download can be resumed
+            _write(part + '.etag', etag)
+    else:
+        response.content
+        if status == 304:
+            _remove(part, part + '.etag')
+        return 0
+
+    written = 0
+    with open(part, mode) as f:
+        if start:
+            f.seek(start)
+            f.truncate()
+        for chunk in response.iter_content(None):
+            f.write(chunk)
+            written += len(chunk)
+
+    os.rename(part, path)
+    if os.path.exists(part + '.etag'):
+        os.rename(part + '.etag', path + '.etag')
+    else:
+        _remove(path + '.etag')
+    last_modified = response.last_modified
+    if last_modified is not None:
+        mtime = timegm(last_modified.utctimetuple())
+        os.utime(path, (time.time(), mtime))
+    return written
+
+
+def _range_start(content_range):
+    # returns the first byte position of a Content-Range header
+    if not content_range or not content_range.startswith('bytes '):
+        return None
+    start = content_range[6:].split('-', 1)[0].strip()
+    return int(start) if start.isdigit() else None
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip() or None
+    except IOError:
+        return None
+
+
+def _write(path, data):
+    with open(path, 'w') as f:
+        f.write(data)
+
+
+def _remove(*paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
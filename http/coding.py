@@ -0,0 +1,276 @@
+import zlib
+
+from exception import DecodingError
+
+#: media types not worth compressing: they are compressed already
+INCOMPRESSIBLE_TYPES = ('image/', 'audio/', 'video/', 'font/woff',
+                        'application/zip', 'application/gzip',
+                        'application/x-gzip', 'application/x-bzip2',
+                        'application/x-xz', 'application/x-7z-compressed',
+                        'application/x-rar-compressed', 'application/pdf')
+
+#: media types compressed even though they match INCOMPRESSIBLE_TYPES
+COMPRESSIBLE_TYPES = ('image/svg+xml', 'image/x-icon', 'image/bmp')
+
+# coding -> factory of decoders, and of encoders, see register_coding
+_DECODERS = {}
+_ENCODERS = {}
+
+
+def register_coding(name, decoder, encoder=None):
+    """
+    Registers a content coding, as found in the *Content-Encoding* header.
+    A decoder is an object with two methods: ``decode(data, size)``,
+    returning an iterable of the strings decoded from *data*, of at most
+    *size* bytes if possible, and ``flush()``, returning an iterable of the
+    strings left once all the data has been given. An encoder has the same
+    methods, ``encode(data)`` and ``flush()``, returning strings.
+
+    :param name: name of the coding, ie. 'gzip'
+    :type name: string
+    :param decoder: called without argument to get a new decoder
+    :type decoder: callable
+    :param encoder: called with a compression level from 1 to 9 to get a
+        new encoder, if the coding can be used to compress responses
+    :type encoder: callable
+    """
+    _DECODERS[name.lower()] = decoder
+    if encoder is not None:
+        _ENCODERS[name.lower()] = encoder
+
+
+class ZlibDecoder(object):
+    """
+    Decoder for the *gzip* and *deflate* codings. The output of
+    ``zlib`` is bounded, so a small compressed chunk never inflates to
+    more than *size* bytes at once. As with gzip(1), zeros after the last
+    member of a *gzip* content are ignored.
+    """
+
+    def __init__(self, wbits):
+        """
+        :param wbits: window size, as given to ``zlib.decompressobj``
+        """
+        self._wbits = wbits
+        self._decompressor = zlib.decompressobj(wbits)
+        # nothing decoded yet: a deflate stream can still turn out to be
+        # raw, without the zlib header
+        self._started = False
+        # the last gzip member is followed by zeros
+        self._padding = False
+
+    def decode(self, data, size):
+        if self._padding:
+            self._check_padding(data)
+            return
+        while data:
+            decompressor = self._decompressor
+            try:
+                chunk = decompressor.decompress(data, size)
+            except zlib.error as e:
+                if self._started or self._wbits != zlib.MAX_WBITS:
+                    raise DecodingError(str(e))
+                # 'deflate' sent as a raw deflate stream, as some servers do
+                self._wbits = -zlib.MAX_WBITS
+                self._decompressor = zlib.decompressobj(self._wbits)
+                continue
+            self._started = True
+            data = decompressor.unconsumed_tail
+            if not data and decompressor.unused_data and \
+                    self._wbits > zlib.MAX_WBITS:
+                # gzip: a new member, or zeros
+                data = decompressor.unused_data
+                if data[0] == '\0':
+                    self._padding = True
+                    self._check_padding(data)
+                    data = ''
+                else:
+                    self._decompressor = zlib.decompressobj(self._wbits)
+            if chunk:
+                yield chunk
+
+    def _check_padding(self, data):
+        if data.strip('\0'):
+            raise DecodingError('unexpected data after the gzip content')
+
+    def flush(self):
+        try:
+            chunk = self._decompressor.flush()
+        except zlib.error as e:
+            raise DecodingError(str(e))
+        return [chunk] if chunk else []
+
+
+class ZlibEncoder(object):
+    """Encoder for the *gzip* and *deflate* codings"""
+
+    def __init__(self, wbits, level):
+        """
+        :param wbits: window size, as given to ``zlib.compressobj``
+        :param level: compression level, from 1 to 9
+        """
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, wbits)
+
+    def encode(self, data):
+        chunk = self._compressor.compress(data)
+        return [chunk] if chunk else []
+
+    def flush(self):
+        return [self._compressor.flush()]
+
+
+register_coding('gzip', lambda: ZlibDecoder(16 + zlib.MAX_WBITS),
+                lambda level: ZlibEncoder(16 + zlib.MAX_WBITS, level))
+register_coding('x-gzip', lambda: ZlibDecoder(16 + zlib.MAX_WBITS))
+register_coding('deflate', lambda: ZlibDecoder(zlib.MAX_WBITS),
+                lambda level: ZlibEncoder(zlib.MAX_WBITS, level))
+
+try:
+    import brotli
+except ImportError:
+    pass
+else:
+    class BrotliDecoder(object):
+        """
+        Decoder for the *br* coding, when ``brotli`` is installed. Like
+        ``zlib``, its output is bounded to *size* bytes at once: this
+        needs a version of ``brotli`` whose decompressor takes an
+        *output_buffer_limit*. With older versions, the coding is only
+        used to compress responses, never decoded.
+        """
+
+        def __init__(self):
+            self._decompressor = brotli.Decompressor()
+
+        def decode(self, data, size):
+            decompressor = self._decompressor
+            while True:
+                try:
+                    chunk = decompressor.process(data,
+                                                 output_buffer_limit=size)
+                except brotli.error as e:
+                    raise DecodingError(str(e))
+                if chunk:
+                    yield chunk
+                # the rest of the input is kept by the decompressor
+                data = ''
+                if decompressor.is_finished() or \
+                        decompressor.can_accept_more_data():
+                    return
+
+        def flush(self):
+            return []
+
+    class BrotliEncoder(object):
+        """Encoder for the *br* coding, when ``brotli`` is installed"""
+
+        def __init__(self, level):
+            # brotli goes from 0 to 11
+            self._compressor = brotli.Compressor(quality=level)
+
+        def encode(self, data):
+            chunk = self._compressor.process(data)
+            return [chunk] if chunk else []
+
+        def flush(self):
+            return [self._compressor.finish()]
+
+    if hasattr(brotli.Decompressor, 'can_accept_more_data'):
+        register_coding('br', BrotliDecoder, BrotliEncoder)
+    else:
+        _ENCODERS['br'] = BrotliEncoder
+
+
+def decode(chunks, codings, size):
+    """
+    Returns an iterator over the chunks of a content, decoded. The codings
+    are undone from the last one applied to the first one
+
+    :param chunks: the chunks of the content, as strings or buffers
+    :type chunks: iterable
+    :param codings: codings, as in the *Content-Encoding* header
+    :type codings: list
+    :param size: maximum size of the decoded chunks
+    :type size: int
+    :rtype: iterator
+    """
+    for coding in reversed(codings):
+        if coding == 'identity':
+            continue
+        factory = _DECODERS.get(coding)
+        if factory is None:
+            raise DecodingError('unknown coding: {0!r}'.format(coding))
+        chunks = _decode(chunks, factory(), size)
+    return chunks
+
+
+def _decode(chunks, decoder, size):
+    for chunk in chunks:
+        if isinstance(chunk, memoryview):
+            chunk = chunk.tobytes()
+        for decoded in decoder.decode(chunk, size):
+            yield decoded
+    for decoded in decoder.flush():
+        yield decoded
+
+
+def negotiate(accept_encoding):
+    """
+    Returns the coding to compress a content with, among the ones that
+    have an encoder, for the codings the client accepts, or ``None``. The
+    client's preference wins, then its order; ``*`` stands for *gzip*, or
+    *deflate*, unless they are refused
+
+    :param accept_encoding: codings the client accepts, as
+        :attr:`Headers.accept_encoding` gives them
+    :type accept_encoding: tuple
+    :rtype: string
+    """
+    refused = set(coding for coding, q in accept_encoding if not q)
+    for coding, q in accept_encoding:
+        if not q:
+            break
+        if coding == '*':
+            for coding in ('gzip', 'deflate'):
+                if coding not in refused:
+                    return coding
+        elif coding in _ENCODERS and coding not in refused:
+            return coding
+    return None
+
+
+def is_compressible(media_type):
+    """
+    Returns whether a content of a media type is worth compressing
+
+    :param media_type: media type, ie. 'text/html', or ``None``
+    :type media_type: string
+    :rtype: boolean
+    """
+    if not media_type:
+        return True
+    media_type = media_type.lower()
+    return media_type.startswith(COMPRESSIBLE_TYPES) or \
+        not media_type.startswith(INCOMPRESSIBLE_TYPES)
+
+
+def encode(chunks, coding, level=6):
+    """
+    Returns an iterator over the chunks of a content, encoded
+
+    :param chunks: the chunks of the content, as strings or buffers
+    :type chunks: iterable
+    :param coding: coding, one of the registered ones with an encoder
+    :type coding: string
+    :param level: compression level, from 1 to 9
+    :type level: int
+    :rtype: iterator
+    """
+    encoder = _ENCODERS[coding](level)
+    for chunk in chunks:
+        if isinstance(chunk, memoryview):
+            chunk = chunk.tobytes()
+        for encoded in encoder.encode(chunk):
+            yield encoded
+    for encoded in encoder.flush():
+        yield encoded
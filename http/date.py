@@ -3,31 +3,159 @@ import time
 from calendar import timegm
 from datetime import datetime
 
+_WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+_MONTHS = (None, 'Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug',
+           'Sep', 'Oct', 'Nov', 'Dec')
+
+_MONTH_NUMBERS = dict((name, i) for i, name in enumerate(_MONTHS) if name)
+
+# '00' to '99', and back; a lookup is faster than int() or '%02d'
+_TWO_DIGITS = tuple('%02d' % i for i in range(100))
+_NUMBERS = dict((digits, i) for i, digits in enumerate(_TWO_DIGITS))
+
+# days before the first day of each month, in a non-leap year
+_DAYS_BEFORE_MONTH = (0, 0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304,
+                      334)
+
+_FORMAT = '%s, %s %s %d %s:%s:%s GMT'
+
+
+def _parse(date):
+    # returns (year, month, day, hour, minute, second) for the three formats
+    # of RFC 7231 (7.1.1.1), or None
+    if len(date) == 29 and date[26:] == 'GMT':
+        # IMF-fixdate: Sun, 06 Nov 1994 08:49:37 GMT
+        n = _NUMBERS
+        try:
+            fields = (n[date[12:14]] * 100 + n[date[14:16]],
+                      _MONTH_NUMBERS[date[8:11]], n[date[5:7]],
+                      n[date[17:19]], n[date[20:22]], n[date[23:25]])
+        except KeyError:
+            fields = None
+    else:
+        fields = _fields(date)
+    if fields is not None and 1 <= fields[2] <= 31 and fields[3] < 24 and \
+            fields[4] < 60 and fields[5] <= 60:
+        return fields
+    return None
+
+
+def _fields(date):
+    # the other formats
+    n = _NUMBERS
+    try:
+        if date.endswith(' GMT'):
+            # RFC 850: Sunday, 06-Nov-94 08:49:37 GMT
+            date = date[date.index(', ') + 2:]
+            if len(date) != 22 or date[2] != '-' or date[6] != '-':
+                return None
+            year = n[date[7:9]]
+            # two-digit years more than 50 years in the future are in the
+            # past (RFC 7231, 7.1.1.1)
+            year += 2000 if year + 2000 <= time.gmtime().tm_year + 50 \
+                else 1900
+            return (year, _MONTH_NUMBERS[date[3:6]], n[date[0:2]],
+                    n[date[10:12]], n[date[13:15]], n[date[16:18]])
+        if len(date) == 24:
+            # asctime: Sun Nov  6 08:49:37 1994
+            return (n[date[20:22]] * 100 + n[date[22:24]],
+                    _MONTH_NUMBERS[date[4:7]], n[date[8:10].replace(' ', '0')],
+                    n[date[11:13]], n[date[14:16]], n[date[17:19]])
+    except (KeyError, ValueError):
+        pass
+    return None
+
+
+def _epoch(year, month, day, hour, minute, second):
+    # same as calendar.timegm, without the checks
+    y = year - 1
+    days = y * 365 + y // 4 - y // 100 + y // 400 - 719162 + \
+        _DAYS_BEFORE_MONTH[month] + day - 1
+    if month > 2 and year % 4 == 0 and \
+            (year % 100 != 0 or year % 400 == 0):
+        days += 1
+    return ((days * 24 + hour) * 60 + minute) * 60 + second
+
+
+# 'Nov 1994' -> seconds from the epoch to the first day of the month
+_MONTH_STARTS = {}
+
+# the fields of an IMF-fixdate, in seconds
+_DAY_SECONDS = dict((_TWO_DIGITS[i], (i - 1) * 86400) for i in range(1, 32))
+_HOUR_SECONDS = dict((_TWO_DIGITS[i], i * 3600) for i in range(24))
+_MINUTE_SECONDS = dict((_TWO_DIGITS[i], i * 60) for i in range(60))
+_SECONDS = dict((_TWO_DIGITS[i], i) for i in range(61))
+
+
+def _fixdate_epoch(date):
+    # returns the epoch of an IMF-fixdate, or None
+    if len(date) != 29 or date[26:] != 'GMT':
+        return None
+    try:
+        start = _MONTH_STARTS[date[8:16]]
+    except KeyError:
+        month = _MONTH_NUMBERS.get(date[8:11])
+        year = date[12:16]
+        if month is None or not year.isdigit() or date[11] != ' ':
+            return None
+        start = _MONTH_STARTS[date[8:16]] = _epoch(int(year), month, 1,
+                                                   0, 0, 0)
+    try:
+        return start + _DAY_SECONDS[date[5:7]] + \
+            _HOUR_SECONDS[date[17:19]] + _MINUTE_SECONDS[date[20:22]] + \
+            _SECONDS[date[23:25]]
+    except KeyError:
+        return None
+
 
 class Date:
 
+    # last date formatted by epoch2str, as (epoch, string)
+    _formatted = (None, None)
+
+    # current second formatted by now, as (epoch, string)
+    _now = (None, None)
+
+    # last date parsed by str2epoch, as (string, epoch)
+    _parsed = (None, None)
+
     @classmethod
     def str2time(cls, date):
+        parsed = _parse(date)
+        if parsed is not None:
+            try:
+                return datetime(*parsed)
+            except ValueError:
+                # a leap second, or a day past the end of the month:
+                # normalized through the epoch, as timegm does
+                return Date.epoch2time(_epoch(*parsed))
         return Date.epoch2time(Date.str2epoch(date))
 
     @classmethod
     def str2epoch(cls, date):
-        return int(timegm(email.utils.parsedate_tz(date)))
+        parsed = cls._parsed
+        if parsed[0] == date:
+            return parsed[1]
+        epoch = _fixdate_epoch(date)
+        if epoch is None:
+            fields = _parse(date)
+            if fields is not None:
+                epoch = _epoch(*fields)
+            else:
+                epoch = int(timegm(email.utils.parsedate_tz(date)))
+        cls._parsed = (date, epoch)
+        return epoch
 
     @classmethod
     def time2str(cls, dt):
         if isinstance(dt, datetime) is False:
             raise Exception("date is not a datetime object")
 
-        weekday = [
-            "Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"
-        ][dt.weekday()]
-
-        month = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep",
-             "Oct", "Nov", "Dec"][dt.month - 1]
-
-        return "{0}, {1:02d} {2} {3} {4}:{5:02d}:{6:02d} GMT".format(
-            weekday, dt.day, month, dt.year, dt.hour, dt.minute, dt.second)
+        digits = _TWO_DIGITS
+        return _FORMAT % (_WEEKDAYS[dt.weekday()], digits[dt.day],
+                          _MONTHS[dt.month], dt.year, digits[dt.hour],
+                          digits[dt.minute], digits[dt.second])
 
     @classmethod
     def time2epoch(cls, date):
@@ -39,4 +167,30 @@ class Date:
 
     @classmethod
     def epoch2str(cls, epoch):
-        return Date.time2str(Date.epoch2time(epoch))
+        formatted = cls._formatted
+        if formatted[0] == epoch:
+            return formatted[1]
+        year, month, day, hour, minute, second, weekday = \
+            time.gmtime(epoch)[:7]
+        digits = _TWO_DIGITS
+        string = _FORMAT % (_WEEKDAYS[weekday], digits[day], _MONTHS[month],
+                            year, digits[hour], digits[minute],
+                            digits[second])
+        cls._formatted = (epoch, string)
+        return string
+
+    @classmethod
+    def now(cls):
+        """
+        Returns the current date, as an HTTP date string. The string is
+        built once per second, for the value of a *Date* header
+
+        :rtype: string
+        """
+        now = int(time.time())
+        cached = cls._now
+        if cached[0] == now:
+            return cached[1]
+        string = Date.epoch2str(now)
+        cls._now = (now, string)
+        return string
@@ -21,3 +21,11 @@ class HTTPException(Exception):
     @property
     def is_server_error(self):
         return self._response.is_server_error
+
+
+class ParseError(ValueError):
+    """Raised when a message read from the wire is not valid HTTP"""
+
+
+class DecodingError(ValueError):
+    """Raised when the content of a message can't be decoded"""
@@ -1,10 +1,128 @@
+import re
+from collections import namedtuple
 from date import Date
 from datetime import datetime
 
 
+class HeaderName(str):
+    """
+    A header name whose lowercased form is computed and interned once.
+
+    Using the same ``HeaderName`` object for every lookup lets
+    :class:`Headers` skip lowercasing the name, and the index lookup ends
+    up being an identity comparison.
+    """
+
+    def __new__(cls, name):
+        self = str.__new__(cls, name)
+        self.lower_name = intern(name.lower())
+        return self
+
+    def lower(self):
+        return self.lower_name
+
+
+# lowercased name -> registered ``HeaderName``
+_header_names = {}
+# registered spellings (canonical and lowercased) -> interned lowercased name
+_lower_names = {}
+
+
+def register_header(name):
+    """
+    Registers a header name and returns its :class:`HeaderName`. If the
+    name is already registered, the existing object is returned.
+
+    :param name: canonical form of the header name (ie. *X-Request-Id*)
+    :type name: string
+    :rtype: class:`HeaderName`
+    """
+    lname = name.lower()
+    header = _header_names.get(lname)
+    if header is None:
+        header = HeaderName(name)
+        _header_names[header.lower_name] = header
+        _lower_names[str(header)] = header.lower_name
+        _lower_names[header.lower_name] = header.lower_name
+    return header
+
+
+def header_name(name):
+    """
+    Returns the registered :class:`HeaderName` for a name, in any case, or
+    ``None`` if the name is unknown
+
+    :rtype: class:`HeaderName`
+    """
+    return _header_names.get(name.lower())
+
+
+def _lower(key):
+    if type(key) is HeaderName:
+        return key.lower_name
+    lkey = _lower_names.get(key)
+    if lkey is None:
+        lkey = key.lower()
+    return lkey
+
+
+ACCEPT = register_header('Accept')
+ACCEPT_CHARSET = register_header('Accept-Charset')
+ACCEPT_ENCODING = register_header('Accept-Encoding')
+ACCEPT_LANGUAGE = register_header('Accept-Language')
+ACCEPT_RANGES = register_header('Accept-Ranges')
+AGE = register_header('Age')
+ALLOW = register_header('Allow')
+AUTHORIZATION = register_header('Authorization')
+CACHE_CONTROL = register_header('Cache-Control')
+CONNECTION = register_header('Connection')
+CONTENT_BASE = register_header('Content-Base')
+CONTENT_DISPOSITION = register_header('Content-Disposition')
+CONTENT_ENCODING = register_header('Content-Encoding')
+CONTENT_LANGUAGE = register_header('Content-Language')
+CONTENT_LENGTH = register_header('Content-Length')
+CONTENT_LOCATION = register_header('Content-Location')
+CONTENT_RANGE = register_header('Content-Range')
+CONTENT_TYPE = register_header('Content-Type')
+COOKIE = register_header('Cookie')
+DATE = register_header('Date')
+ETAG = register_header('ETag')
+EXPECT = register_header('Expect')
+EXPIRES = register_header('Expires')
+HOST = register_header('Host')
+IF_MATCH = register_header('If-Match')
+IF_MODIFIED_SINCE = register_header('If-Modified-Since')
+IF_NONE_MATCH = register_header('If-None-Match')
+IF_RANGE = register_header('If-Range')
+IF_UNMODIFIED_SINCE = register_header('If-Unmodified-Since')
+KEEP_ALIVE = register_header('Keep-Alive')
+LAST_MODIFIED = register_header('Last-Modified')
+LOCATION = register_header('Location')
+PRAGMA = register_header('Pragma')
+PROXY_AUTHORIZATION = register_header('Proxy-Authorization')
+RANGE = register_header('Range')
+REFERER = register_header('Referer')
+RETRY_AFTER = register_header('Retry-After')
+SERVER = register_header('Server')
+SET_COOKIE = register_header('Set-Cookie')
+TE = register_header('TE')
+TRAILER = register_header('Trailer')
+TRANSFER_ENCODING = register_header('Transfer-Encoding')
+UPGRADE = register_header('Upgrade')
+USER_AGENT = register_header('User-Agent')
+VARY = register_header('Vary')
+VIA = register_header('Via')
+WWW_AUTHENTICATE = register_header('WWW-Authenticate')
+
+
 class Headers(object):
     """
     Class to manipulate HTTP headers
+
+    Headers are kept in insertion order, duplicates included, and indexed
+    by their lowercased name so that lookups don't need to scan the whole
+    list. Names can be given as plain strings or as :class:`HeaderName`
+    constants (ie. ``CONTENT_TYPE``).
     """
 
     def __init__(self, headers=None):
@@ -14,39 +132,132 @@ class Headers(object):
         :param headers: headers
         :type headers: a list or a dict
         """
+        # list of [name, value] entries, in insertion order. Removed
+        # entries are left in place with a ``None`` name until the list
+        # is compacted.
+        self._headers = []
+        # lowercased name -> list of entries for this name
+        self._index = {}
+        self._removed = 0
+        # lowercased name -> value of the header as parsed by one of the
+        # properties, dropped when the header changes
+        self._parsed = {}
+        # whether the structures above are shared with a copy, see copy()
+        self._shared = False
+
         if headers is None:
-            headers = []
+            return
 
         if isinstance(headers, dict):
-            _headers = []
-            for k in headers:
-                _headers.append((k, headers[k]))
-            headers = _headers
-
-        self._headers = headers
+            headers = headers.iteritems()
+
+        entries = self._headers
+        index = self._index
+        for k, v in headers:
+            entry = [k, v]
+            entries.append(entry)
+            lkey = _lower(k)
+            if lkey in index:
+                index[lkey].append(entry)
+            else:
+                index[lkey] = [entry]
+
+    @classmethod
+    def _from_entries(cls, entries):
+        # adopts a list of [name, value] entries, ie. from the parser
+        self = cls.__new__(cls)
+        self._headers = entries
+        index = self._index = {}
+        self._removed = 0
+        self._parsed = {}
+        self._shared = False
+        get = _lower_names.get
+        for entry in entries:
+            name = entry[0]
+            lkey = get(name)
+            if lkey is None:
+                lkey = name.lower()
+            if lkey in index:
+                index[lkey].append(entry)
+            else:
+                index[lkey] = [entry]
+        return self
 
     def __getitem__(self, key):
         if isinstance(key, (int, long)):
+            self._compact()
             return self._headers[key][0]
-        for k, v in self._headers:
-            if k.lower() == key.lower():
-                return v
+        entries = self._index.get(_lower(key))
+        if entries:
+            return entries[0][1]
         return None
 
     def __delitem__(self, key):
-        key = key.lower()
-        new = []
-        for k, v in self._headers:
-            if k.lower() != key:
-                new.append((k, v))
-        self._headers[:] = new
+        if self._shared:
+            self._own()
+        lkey = _lower(key)
+        self._parsed.pop(lkey, None)
+        entries = self._index.pop(lkey, None)
+        if not entries:
+            return
+        for entry in entries:
+            entry[0] = None
+        self._removed += len(entries)
+        if self._removed > len(self._headers) / 2:
+            self._compact()
+
+    def __contains__(self, key):
+        return _lower(key) in self._index
+
+    def __iter__(self):
+        for k, v in self.iteritems():
+            yield k
 
     def __str__(self):
-        strs = []
-        for key, value in self.to_list():
-            strs.append('%s: %s' % (key, value))
-        strs.append('\r\n')
-        return '\r\n'.join(strs)
+        lines = ['%s: %s\r\n' % item for item in self.to_list()]
+        lines.append('\r\n')
+        return ''.join(lines)
+
+    def _compact(self):
+        if self._removed:
+            self._headers = [e for e in self._headers if e[0] is not None]
+            self._removed = 0
+
+    def _own(self):
+        # copies the entries shared with a copy, before modifying them
+        entries = []
+        index = {}
+        for k, v in self._headers:
+            if k is None:
+                continue
+            entry = [k, v]
+            entries.append(entry)
+            lkey = _lower(k)
+            if lkey in index:
+                index[lkey].append(entry)
+            else:
+                index[lkey] = [entry]
+        self._headers = entries
+        self._index = index
+        self._removed = 0
+        self._parsed = dict(self._parsed)
+        self._shared = False
+
+    def copy(self):
+        """
+        Returns a copy of the headers. The copy shares its entries with the
+        headers until either of them is modified, so making it is cheap
+
+        :rtype: class:`Headers`
+        """
+        self._compact()
+        copy = Headers.__new__(Headers)
+        copy._headers = self._headers
+        copy._index = self._index
+        copy._removed = 0
+        copy._parsed = self._parsed
+        copy._shared = self._shared = True
+        return copy
 
     def items(self):
         """
@@ -63,10 +274,25 @@ class Headers(object):
         :rtype: iterator
         """
         for k, v in self._headers:
-            yield k, v
+            if k is not None:
+                yield k, v
 
     def to_list(self):
-        return [(k, str(v)) for k, v in self._headers]
+        """
+        Returns a list of items, with the values as strings. Dates are
+        formatted as HTTP dates
+
+        :rtype: list
+        """
+        items = []
+        for k, v in self.iteritems():
+            if not isinstance(v, str):
+                if isinstance(v, datetime):
+                    v = Date.time2str(v)
+                else:
+                    v = str(v)
+            items.append((k, v))
+        return items
 
     def add(self, key, *values):
         """
@@ -76,8 +302,17 @@ class Headers(object):
         :type key: string
         :param \*values: one or many values for this header
         """
+        if not values:
+            return
+        if self._shared:
+            self._own()
+        lkey = _lower(key)
+        self._parsed.pop(lkey, None)
+        entries = self._index.setdefault(lkey, [])
         for value in values:
-            self._headers.append((key, value))
+            entry = [key, value]
+            self._headers.append(entry)
+            entries.append(entry)
 
     def get(self, key):
         """
@@ -103,10 +338,8 @@ class Headers(object):
         return self.get_list(key)
 
     def get_list(self, key):
-        values = []
-        for header_values in self._headers:
-            values.append(header_values[1])
-        return values
+        entries = self._index.get(_lower(key), ())
+        return [v for k, v in entries]
 
     def set(self, key, value):
         """
@@ -118,16 +351,15 @@ class Headers(object):
         :type key: string
         :param value: new value
         """
-        if not self._headers:
-            self._headers.append((key, value))
-            return
-
-        lkey = key.lower()
-        for idx, (prev_key, prev_value) in enumerate(self.iteritems()):
-            if prev_key.lower() == lkey:
-                self._headers[idx] = (key, value)
-                break
-        self._headers.append([key, value])
+        if self._shared:
+            self._own()
+        lkey = _lower(key)
+        entries = self._index.get(lkey)
+        if entries:
+            self._parsed.pop(lkey, None)
+            entries[0][:] = [key, value]
+        else:
+            self.add(key, value)
 
     def remove(self, key):
         """
@@ -145,12 +377,7 @@ class Headers(object):
 
         :rtype: string
         """
-        ct = self.get('Content-Type')
-        if ct:
-            # Return only the type, scrubbing type parameters
-            return ct.split(';', 1)[0]
-        else:
-            return None
+        return self._parse(CONTENT_TYPE, _parse_content_type)[0]
 
     @property
     def content_type_params(self):
@@ -159,24 +386,37 @@ class Headers(object):
 
         :rtype: dictionary
         """
-        type_str = self.get('Content-Type').split(';', 1)
-        if len(type_str) == 1:
-            return {}
-        else:
-            params = {}
-            for param in type_str[1].split(';'):
-                k, v = map(str.strip, param.split('='))
-                params[k] = v
-            return params
+        return dict(self._parse(CONTENT_TYPE, _parse_content_type)[1])
+
+    @property
+    def content_disposition(self):
+        """
+        Returns the lowercased disposition type of the
+        *Content-Disposition* header, ie. 'form-data' or 'attachment'
+
+        :rtype: string
+        """
+        return self._parse(CONTENT_DISPOSITION, _parse_disposition)[0]
+
+    @property
+    def content_disposition_params(self):
+        """
+        Returns the parameters of the *Content-Disposition* header, ie.
+        ``name`` and ``filename``
+
+        :rtype: dictionary
+        """
+        return dict(self._parse(CONTENT_DISPOSITION, _parse_disposition)[1])
 
     @property
     def content_length(self):
         """
-        Returns the value for the *Content-Length* header
+        Returns the value for the *Content-Length* header, or ``None`` if
+        the header is not set
 
         :rtype: int
         """
-        return int(self.get('Content-Length'))
+        return self._parse(CONTENT_LENGTH, _parse_int)
 
     @property
     def content_is_json(self):
@@ -247,12 +487,12 @@ class Headers(object):
 
         :rtype: datetime
         """
-        return self._get_date_header('Last-Modified')
+        return self._get_date_header(LAST_MODIFIED)
 
     @last_modified.setter
     def last_modified(self, date):
         """Set the value of the *Last-Modified* header"""
-        return self._set_date_header('Last-Modified', date)
+        return self._set_date_header(LAST_MODIFIED, date)
 
     @property
     def date(self):
@@ -261,12 +501,12 @@ class Headers(object):
 
         :rtype: datetime
         """
-        return self._get_date_header('Date')
+        return self._get_date_header(DATE)
 
     @date.setter
     def date(self, date):
         """Set the value of the *Date* header"""
-        return self._set_date_header('Date', date)
+        return self._set_date_header(DATE, date)
 
     @property
     def expires(self):
@@ -275,12 +515,12 @@ class Headers(object):
 
         :rtype: datetime
         """
-        return self._get_date_header('Expires')
+        return self._get_date_header(EXPIRES)
 
     @expires.setter
     def expires(self, date):
         """Set the value of the *Expires* header"""
-        return self._set_date_header('Expires', date)
+        return self._set_date_header(EXPIRES, date)
 
     @property
     def if_modified_since(self):
@@ -290,12 +530,12 @@ class Headers(object):
         :rtype: datetime
         """
 
-        return self._get_date_header('If-Modified-Since')
+        return self._get_date_header(IF_MODIFIED_SINCE)
 
     @if_modified_since.setter
     def if_modified_since(self, date):
         """Set the value of the *If-Modified-Since* header"""
-        return self._set_date_header('If-Modified-Since', date)
+        return self._set_date_header(IF_MODIFIED_SINCE, date)
 
     @property
     def if_unmodified_since(self):
@@ -305,29 +545,155 @@ class Headers(object):
         :rtype: datetime
         """
 
-        return self._get_date_header('If-Unmodified-Since')
+        return self._get_date_header(IF_UNMODIFIED_SINCE)
 
     @if_unmodified_since.setter
     def if_unmodified_since(self, date):
         """Set the value of the *If-Unmodified-Since* header"""
-        return self._set_date_header('If-Unmodified-Since', date)
+        return self._set_date_header(IF_UNMODIFIED_SINCE, date)
+
+    @property
+    def content_encoding(self):
+        """
+        Returns the lowercased codings of the *Content-Encoding* header, in
+        the order they were applied
+
+        :rtype: tuple
+        """
+        return self._parse_list(CONTENT_ENCODING, _parse_tokens)
+
+    @property
+    def cache_control(self):
+        """
+        Returns the directives of the *Cache-Control* header, mapping the
+        lowercased name of a directive to its argument, or to ``None``
+
+        :rtype: dictionary
+        """
+        return dict(self._parse_list(CACHE_CONTROL, _parse_cache_control))
+
+    @property
+    def accept(self):
+        """
+        Returns the media ranges of the *Accept* header, as ``(range, q,
+        params)`` tuples sorted by decreasing quality, where *params* is a
+        tuple of ``(name, value)`` pairs
+
+        :rtype: tuple
+        """
+        return self._parse_list(ACCEPT, _parse_accept)
+
+    @property
+    def accept_encoding(self):
+        """
+        Returns the content codings of the *Accept-Encoding* header, as
+        ``(coding, q)`` tuples sorted by decreasing quality
+
+        :rtype: tuple
+        """
+        return self._parse_list(ACCEPT_ENCODING, _parse_accept_encoding)
+
+    @property
+    def vary(self):
+        """
+        Returns the lowercased header names of the *Vary* header
+
+        :rtype: tuple
+        """
+        return self._parse_list(VARY, _parse_tokens)
+
+    @property
+    def connection(self):
+        """
+        Returns the lowercased options of the *Connection* header
+
+        :rtype: tuple
+        """
+        return self._parse_list(CONNECTION, _parse_tokens)
+
+    @property
+    def etag(self):
+        """
+        Returns the *ETag* header as an :class:`ETag`, or ``None``
+
+        :rtype: class:`ETag`
+        """
+        return self._parse(ETAG, _parse_etag)
+
+    @property
+    def if_none_match(self):
+        """
+        Returns the entity tags of the *If-None-Match* header, as a tuple
+        of :class:`ETag`, or ``'*'``
+
+        :rtype: tuple or string
+        """
+        return self._parse_list(IF_NONE_MATCH, _parse_etags)
+
+    @property
+    def range(self):
+        """
+        Returns the *Range* header as ``(unit, ranges)``, where *ranges* is
+        a tuple of ``(first, last)`` byte positions. *first* is ``None``
+        for a suffix range (the last *last* bytes), and *last* is ``None``
+        for an open-ended one. Returns ``None`` if the header is missing or
+        not valid
+
+        :rtype: tuple
+        """
+        return self._parse(RANGE, _parse_range)
+
+    def best_match(self, offers):
+        """
+        Returns the media type, among the ones the server can offer, the
+        *Accept* header prefers. The most specific range matching a type
+        gives its quality; the order of *offers* breaks ties. Returns
+        ``None`` if no type is acceptable
+
+        :param offers: media types, ie. ``['application/json', 'text/html']``
+        :type offers: list
+        :rtype: string
+        """
+        accept = self.accept
+        if ACCEPT not in self:
+            return offers[0] if offers else None
+        best, best_q = None, 0
+        for offer in offers:
+            q = _quality(accept, offer.lower())
+            if q > best_q:
+                best, best_q = offer, q
+        return best
 
     def _get_date_header(self, key):
-        value = self.__getitem__(key)
-        if value is None:
-            return None
+        return self._parse(key, _parse_date)
+
+    def _parse(self, key, parse):
+        # returns parse(value) for the value of a header, parsed only once
+        # until the header changes
+        lkey = key.lower_name
+        try:
+            return self._parsed[lkey]
+        except KeyError:
+            pass
+        value = parse(self.__getitem__(key))
+        self._parsed[lkey] = value
+        return value
 
-        if isinstance(value, str):
-            return Date.str2time(value)
-        elif isinstance(value, int):
-            return Date.epoch2time(value)
-        elif isinstance(value, datetime):
-            return value
+    def _parse_list(self, key, parse):
+        # same as _parse, for a header whose values are comma-separated
+        # lists: all the values are parsed, as a single list
+        lkey = key.lower_name
+        try:
+            return self._parsed[lkey]
+        except KeyError:
+            pass
+        values = self.get_list(key)
+        if len(values) > 1:
+            value = parse(', '.join(str(v) for v in values))
         else:
-            print value
-            raise ValueError("date is of type <{type}> but can only be an "
-                "instance of string, int or a datetime object"
-                .format(type=type(value)))
+            value = parse(values[0] if values else None)
+        self._parsed[lkey] = value
+        return value
 
     def _set_date_header(self, key, date):
         # XXX for now we only document that the helpers can accept a
@@ -345,3 +711,236 @@ class Headers(object):
                 "instance of string, int or a datetime object"
                 .format(type=type(date)))
         self.set(key, date)
+
+
+#: an entity tag, as found in the *ETag* and *If-None-Match* headers: the
+#: opaque tag, without the quotes, and whether it is weak
+ETag = namedtuple('ETag', 'tag weak')
+
+# parsed values kept by _memoize, per parser
+_MEMO_SIZE = 512
+
+# an element of a comma-separated list, or a parameter of a
+# semicolon-separated one, with the quoted strings in it
+_LIST_ITEM = re.compile(r'(?:"(?:[^"\\]|\\.)*"|[^,"])+')
+_PARAMETER = re.compile(r'(?:"(?:[^"\\]|\\.)*"|[^;"])+')
+_QUOTED_PAIR = re.compile(r'\\(.)')
+_ETAG = re.compile(r'\s*(W/)?"([^"]*)"\s*$')
+
+
+def _memoize(parse):
+    # the same raw values come back on request after request: the parsed
+    # values (which must not be mutable) are kept for a while
+    cache = {}
+
+    def memoized(value):
+        try:
+            return cache[value]
+        except KeyError:
+            pass
+        except TypeError:
+            return parse(value)
+        parsed = parse(value)
+        if len(cache) >= _MEMO_SIZE:
+            cache.clear()
+        cache[value] = parsed
+        return parsed
+    memoized.cache = cache
+    return memoized
+
+
+def _unquote(value):
+    if len(value) > 1 and value[0] == '"' and value[-1] == '"':
+        return _QUOTED_PAIR.sub(r'\1', value[1:-1])
+    return value
+
+
+def _split(value):
+    # returns the elements of a comma-separated list
+    if not value:
+        return []
+    value = str(value)
+    if '"' not in value:
+        items = value.split(',')
+    else:
+        items = _LIST_ITEM.findall(value)
+    return [item for item in map(str.strip, items) if item]
+
+
+def _element(item):
+    # returns the value and the parameters of an element, ie. from
+    # 'text/html; level=1; q=0.5'
+    if ';' not in item:
+        return item, ()
+    if '"' not in item:
+        parts = item.split(';')
+    else:
+        parts = _PARAMETER.findall(item)
+    params = []
+    for part in parts[1:]:
+        name, sep, argument = part.partition('=')
+        name = name.strip().lower()
+        if name:
+            params.append((name, _unquote(argument.strip())))
+    return parts[0].strip(), tuple(params)
+
+
+def _qvalue(params):
+    # removes the 'q' parameter, and returns it as a float with the rest
+    if not params:
+        return 1.0, params
+    q = 1.0
+    rest = []
+    for name, argument in params:
+        if name == 'q':
+            try:
+                q = min(max(float(argument), 0.0), 1.0)
+            except ValueError:
+                q = 0.0
+        else:
+            rest.append((name, argument))
+    return q, tuple(rest)
+
+
+@_memoize
+def _parse_content_type(value):
+    # returns the media type and the parameters of a Content-Type header
+    if not value:
+        return None, ()
+    media_type, params = _element(str(value))
+    # parameter names are case-insensitive, values are kept as they are
+    return media_type, params
+
+
+@_memoize
+def _parse_disposition(value):
+    if not value:
+        return None, ()
+    disposition, params = _element(str(value))
+    return disposition.lower(), params
+
+
+@_memoize
+def _parse_cache_control(value):
+    directives = []
+    for item in _split(value):
+        name, sep, argument = item.partition('=')
+        name = name.strip().lower()
+        directives.append((name, _unquote(argument.strip()) if sep
+                           else None))
+    return tuple(directives)
+
+
+@_memoize
+def _parse_accept(value):
+    ranges = []
+    for item in _split(value):
+        media_range, params = _element(item)
+        q, params = _qvalue(params)
+        ranges.append((media_range.lower(), q, params))
+    ranges.sort(key=lambda r: -r[1])
+    return tuple(ranges)
+
+
+@_memoize
+def _parse_accept_encoding(value):
+    codings = []
+    for item in _split(value):
+        coding, params = _element(item)
+        codings.append((coding.lower(), _qvalue(params)[0]))
+    codings.sort(key=lambda c: -c[1])
+    return tuple(codings)
+
+
+@_memoize
+def _parse_tokens(value):
+    return tuple(item.lower() for item in _split(value))
+
+
+@_memoize
+def _parse_etag(value):
+    if not value:
+        return None
+    match = _ETAG.match(str(value))
+    if match is None:
+        return None
+    return ETag(match.group(2), match.group(1) is not None)
+
+
+@_memoize
+def _parse_etags(value):
+    if not value:
+        return ()
+    value = str(value)
+    if value.strip() == '*':
+        return '*'
+    etags = []
+    for item in _split(value):
+        etag = _parse_etag(item)
+        if etag is not None:
+            etags.append(etag)
+    return tuple(etags)
+
+
+@_memoize
+def _parse_range(value):
+    if not value:
+        return None
+    unit, sep, specs = str(value).partition('=')
+    if not sep:
+        return None
+    ranges = []
+    for spec in specs.split(','):
+        first, sep, last = spec.strip().partition('-')
+        # digits only: int() would take signs and spaces
+        if not sep or not first and not last or \
+                first and not first.isdigit() or \
+                last and not last.isdigit():
+            return None
+        first = int(first) if first else None
+        last = int(last) if last else None
+        if first is not None and last is not None and last < first:
+            return None
+        ranges.append((first, last))
+    return unit.strip().lower(), tuple(ranges)
+
+
+def _quality(accept, media_type):
+    # returns the quality given to a media type by the ranges of an Accept
+    # header, from the most specific range matching it
+    main = media_type.split('/', 1)[0] + '/*'
+    best, specificity = 0, -1
+    for media_range, q, params in accept:
+        if media_range == media_type:
+            level = 2
+        elif media_range == main:
+            level = 1
+        elif media_range == '*/*':
+            level = 0
+        else:
+            continue
+        if level > specificity:
+            best, specificity = q, level
+    return best
+
+
+def _parse_int(value):
+    if value is None:
+        return None
+    return int(value)
+
+
+def _parse_date(value):
+    if value is None:
+        return None
+
+    if isinstance(value, str):
+        return Date.str2time(value)
+    elif isinstance(value, int):
+        return Date.epoch2time(value)
+    elif isinstance(value, datetime):
+        return value
+    else:
+        raise ValueError("date is of type <{type}> but can only be an "
+                         "instance of string, int or a datetime object"
+                         .format(type=type(value)))
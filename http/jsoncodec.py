@@ -0,0 +1,109 @@
+import json
+from functools import partial
+
+from exception import DecodingError
+
+#: modules used instead of ``json`` when one of them is installed, in order
+#: of preference
+FAST_BACKENDS = ('ujson', 'simplejson')
+
+# modules whose output has whitespace unless told otherwise
+_SPACED_BACKENDS = frozenset(['json', 'simplejson'])
+
+# charsets JSON can be decoded from without converting it to unicode first
+_COMPATIBLE_CHARSETS = frozenset(['utf-8', 'utf8', 'us-ascii', 'ascii'])
+
+# the (loads, dumps) functions in use, see set_json_backend
+_loads = _dumps = None
+
+
+def set_json_backend(backend):
+    """
+    Sets the module used to decode and encode JSON contents, instead of
+    the fastest one installed. Any object with ``loads`` and ``dumps``
+    functions will do.
+
+    :param backend: a module, or the name of one, ie. 'json' or 'ujson'
+    :type backend: module or string
+    """
+    global _loads, _dumps
+    if isinstance(backend, basestring):
+        backend = __import__(backend)
+    _loads = backend.loads
+    if getattr(backend, '__name__', None) in _SPACED_BACKENDS:
+        # no whitespace: a content is sent, not read
+        _dumps = partial(backend.dumps, separators=(',', ':'))
+    else:
+        _dumps = backend.dumps
+
+
+def _default_backend():
+    for name in FAST_BACKENDS:
+        try:
+            return __import__(name)
+        except ImportError:
+            pass
+    return json
+
+
+set_json_backend(_default_backend())
+
+
+def loads(data, charset=None):
+    """
+    Returns the value of a JSON document
+
+    :param data: the document
+    :type data: string
+    :param charset: charset of the document, UTF-8 by default
+    :type charset: string
+    :raises: :class:`DecodingError` if the document is not valid JSON
+    """
+    try:
+        if charset is not None and isinstance(data, str) and \
+                charset.lower() not in _COMPATIBLE_CHARSETS:
+            data = data.decode(charset)
+        return _loads(data)
+    except (LookupError, ValueError) as e:
+        raise DecodingError(str(e))
+
+
+def dumps(value):
+    """
+    Returns a value encoded as a JSON document
+
+    :rtype: string
+    """
+    return _dumps(value)
+
+
+def iter_records(chunks, charset=None):
+    """
+    Returns an iterator over the records of a newline-delimited JSON
+    content, decoded as soon as their line is complete. Empty lines are
+    skipped
+
+    :param chunks: the chunks of the content, as strings
+    :type chunks: iterable
+    :param charset: charset of the content, UTF-8 by default
+    :type charset: string
+    :rtype: iterator
+    """
+    # pieces of the line not complete yet
+    pending = []
+    for chunk in chunks:
+        if '\n' not in chunk:
+            if chunk:
+                pending.append(chunk)
+            continue
+        lines = chunk.split('\n')
+        if pending:
+            pending.append(lines[0])
+            lines[0] = ''.join(pending)
+        pending = [lines.pop()]
+        for line in lines:
+            if line and not line.isspace():
+                yield loads(line, charset)
+    line = ''.join(pending)
+    if line and not line.isspace():
+        yield loads(line, charset)
@@ -0,0 +1,368 @@
+from collections import deque
+
+from coding import decode as _decode
+from headers import CONTENT_TYPE, TRANSFER_ENCODING
+from jsoncodec import dumps as _dumps, iter_records as _iter_records, \
+    loads as _loads
+
+#: default size of the chunks read from a streamed body
+CHUNK_SIZE = 65536
+
+
+class Body(object):
+    """
+    Body of a message being received.
+
+    The parser pushes chunks to the body as they come off the wire, and
+    iterating over the body consumes them. Chunks are ``memoryview``
+    objects over the data given to the parser: nothing is copied until
+    :meth:`read` is called.
+    """
+
+    def __init__(self, fill=None):
+        """
+        Construct a new ``Body`` object
+
+        :param fill: called without argument when the body is iterated
+            over and no chunk is available; it is expected to feed more
+            data to the parser, or to raise
+        :type fill: callable
+        """
+        self._chunks = deque()
+        #: called to get more data, see above
+        self.fill = fill
+        self.complete = False
+        #: number of bytes received
+        self.received = 0
+        #: number of bytes received but not consumed yet
+        self.buffered = 0
+        #: called without argument once the body has been completely
+        #: received and iterated over
+        self.on_finish = None
+        #: called without argument when the body is closed before that
+        self.on_close = None
+
+    def __iter__(self):
+        chunks = self._chunks
+        while True:
+            while chunks:
+                chunk = chunks.popleft()
+                self.buffered -= len(chunk)
+                yield chunk
+            if self.complete:
+                on_finish, self.on_finish = self.on_finish, None
+                self.on_close = None
+                if on_finish is not None:
+                    on_finish()
+                return
+            if self.fill is None:
+                return
+            self.fill()
+
+    def push(self, chunk):
+        """
+        Adds a chunk of data at the end of the body
+
+        :param chunk: data
+        :type chunk: ``memoryview``
+        """
+        self._chunks.append(chunk)
+        self.received += len(chunk)
+        self.buffered += len(chunk)
+
+    def finish(self):
+        """Marks the body as completely received"""
+        self.complete = True
+
+    def close(self):
+        """
+        Gives up reading the body. If it was not completely received and
+        iterated over, :attr:`on_close` is called instead of
+        :attr:`on_finish`
+        """
+        on_close, self.on_close = self.on_close, None
+        if self.on_finish is None:
+            return
+        self.on_finish = None
+        if on_close is not None:
+            on_close()
+
+    def read(self):
+        """
+        Returns the rest of the body as a single string
+
+        :rtype: string
+        """
+        return ''.join([chunk.tobytes() for chunk in self])
+
+
+class Message(object):
+    """
+    Base class for :class:`Request` and :class:`Response`, with what they
+    share on the wire.
+
+    The content of a message is either a string, or a stream: a file-like
+    object, or an iterable of strings (or buffers). A stream is read only
+    once, either through :meth:`iter_content` or :meth:`readinto`, or when
+    :attr:`content` is accessed and the whole stream is read in memory.
+    """
+
+    # the subclasses set all of these in their constructor
+    __slots__ = ('_headers', '_content', '_streamed', '_reader', '_pending',
+                 '_json')
+
+    #: HTTP version used when the message is serialized
+    http_version = 'HTTP/1.1'
+
+    @property
+    def start_line(self):
+        """
+        Returns the first line of the message, as sent on the wire
+
+        :rtype: string
+        """
+        raise NotImplementedError
+
+    @property
+    def content(self):
+        """
+        Returns the content of the message. If the content is a stream, it
+        is read until the end, and kept in memory
+
+        :rtype: string
+        """
+        content = self._content
+        if content is not None and not isinstance(content, basestring):
+            content = ''.join([c.tobytes() if isinstance(c, memoryview)
+                               else str(c) for c in self._iter_body(None)])
+            self._content = content
+        return content
+
+    @content.setter
+    def content(self, content):
+        """
+        Set the content of the message: a string, a file-like object, or
+        an iterable
+        """
+        self._content = content
+        self._streamed = False
+        self._reader = None
+        self._pending = None
+        # (value, codings, charset) once the content was decoded as JSON
+        self._json = None
+
+    @property
+    def is_streamed(self):
+        """
+        Returns ``True`` if the content is a stream that was not read in
+        memory yet
+
+        :rtype: boolean
+        """
+        content = self._content
+        return content is not None and not isinstance(content, basestring)
+
+    def iter_content(self, chunk_size=CHUNK_SIZE, decode=False):
+        """
+        Returns an iterator over the content, as strings of at most
+        *chunk_size* bytes. A stream is read as it is iterated over, and
+        is not kept in memory.
+
+        With *decode*, the codings of the *Content-Encoding* header are
+        undone as the content is read. Inflating gzip and deflate is
+        bounded: the decoded chunks are at most *chunk_size* bytes too,
+        whatever the compression ratio. Other
+        codings can be added with :func:`http.coding.register_coding`;
+        :exc:`DecodingError` is raised for an unknown coding, or a content
+        that can't be decoded.
+
+        :param chunk_size: maximum size of a chunk, or ``None`` to get the
+            chunks as they come
+        :type chunk_size: int
+        :param decode: whether to decode the content
+        :type decode: boolean
+        :rtype: iterator
+        """
+        chunks = self._iter_body(chunk_size)
+        if decode:
+            codings = self._headers.content_encoding
+            if codings:
+                chunks = _decode(chunks, codings, chunk_size or CHUNK_SIZE)
+        for chunk in chunks:
+            if isinstance(chunk, memoryview):
+                chunk = chunk.tobytes()
+            yield chunk
+
+    def json(self):
+        """
+        Returns the value of the JSON content. A streamed content is read
+        in memory, and the codings of the *Content-Encoding* header are
+        undone. The value is decoded only once, until the content, its
+        *Content-Encoding* or its charset changes.
+
+        The module used is the fastest one installed, see
+        :func:`http.jsoncodec.set_json_backend`
+
+        :raises: :class:`DecodingError` if the content is not valid JSON
+        """
+        headers = self._headers
+        codings = headers.content_encoding
+        charset = headers.content_type_params.get('charset')
+        cached = self._json
+        if cached is None or cached[1] != codings or cached[2] != charset:
+            content = self.content or ''
+            if codings:
+                content = ''.join(_decode([content], codings, CHUNK_SIZE))
+            cached = self._json = (_loads(content, charset), codings, charset)
+        return cached[0]
+
+    def set_json(self, value):
+        """
+        Sets the content to a value encoded as JSON, and the
+        *Content-Type* header to *application/json*
+
+        :param value: the value to encode
+        """
+        self.content = _dumps(value)
+        self._headers.set(CONTENT_TYPE, 'application/json')
+
+    def iter_json(self, chunk_size=CHUNK_SIZE):
+        """
+        Returns an iterator over the records of a newline-delimited JSON
+        content (*application/x-ndjson*), decoded as the content is read:
+        a record is given as soon as its line is received, and the content
+        is never held in memory. The content is decoded first, if it has a
+        *Content-Encoding*
+
+        :param chunk_size: maximum size of the chunks read, or ``None`` to
+            read the chunks as they come
+        :type chunk_size: int
+        :raises: :class:`DecodingError` if a line is not valid JSON
+        :rtype: iterator
+        """
+        charset = self._headers.content_type_params.get('charset')
+        return _iter_records(self.iter_content(chunk_size, decode=True),
+                             charset)
+
+    def iter_parts(self, **kwargs):
+        """
+        Returns an iterator over the parts of a *multipart* content, ie.
+        *multipart/form-data*, as :class:`http.multipart.Part` objects.
+        The parts are parsed as the content is read; the big ones are
+        written to temporary files. The keyword arguments are given to
+        :class:`http.multipart.MultipartParser`
+
+        :rtype: iterator
+        """
+        # imported here: multipart uses the header parser, which imports
+        # this module
+        from multipart import iter_parts
+        return iter_parts(self, **kwargs)
+
+    def readinto(self, buffer):
+        """
+        Reads the next bytes of the content into a writable buffer, such as
+        a ``bytearray``
+
+        :param buffer: buffer to fill
+        :rtype: int, the number of bytes read, 0 at the end of the content
+        """
+        view = memoryview(buffer)
+        pending = self._pending
+        if not pending:
+            if self._reader is None:
+                self._reader = self._iter_body(len(view))
+            pending = next(self._reader, None)
+            if pending is None:
+                return 0
+            if not isinstance(pending, memoryview):
+                pending = memoryview(pending)
+        size = min(len(view), len(pending))
+        view[:size] = pending[:size]
+        self._pending = pending[size:]
+        return size
+
+    def _iter_body(self, chunk_size):
+        # yields the chunks of the content, as strings or buffers
+        content = self._content
+        if content is None:
+            return
+        if isinstance(content, basestring):
+            if isinstance(content, unicode) or chunk_size is None:
+                yield content
+                return
+            view = memoryview(content)
+            for i in xrange(0, len(view), chunk_size):
+                yield view[i:i + chunk_size]
+            return
+
+        if self._streamed:
+            raise ValueError('the content has already been read')
+        self._streamed = True
+
+        if hasattr(content, 'read') and not isinstance(content, Body):
+            read = content.read
+            size = chunk_size or CHUNK_SIZE
+            while True:
+                chunk = read(size)
+                if not chunk:
+                    return
+                yield chunk
+        else:
+            for chunk in content:
+                if chunk_size is None or len(chunk) <= chunk_size:
+                    yield chunk
+                    continue
+                view = memoryview(chunk)
+                for i in xrange(0, len(view), chunk_size):
+                    yield view[i:i + chunk_size]
+
+    @property
+    def _chunked(self):
+        te = self._headers[TRANSFER_ENCODING]
+        return te is not None and \
+            te.rsplit(',', 1)[-1].strip().lower() == 'chunked'
+
+    def iter_chunks(self):
+        """
+        Returns an iterator over the message as sent on the wire: the
+        start line and the headers in a single string, then the body.
+        A string body is given as a ``memoryview``, and a streamed body is
+        passed through chunk by chunk, so the body is never copied. When
+        the *Transfer-Encoding* header is *chunked*, the body is framed
+        accordingly.
+
+        The chunks can be handed to ``socket.sendmsg`` or written one by
+        one.
+
+        :rtype: iterator
+        """
+        yield self.start_line + '\r\n' + str(self._headers)
+        chunked = self._chunked
+        in_memory = type(self._content) is str
+        for chunk in self._iter_body(None):
+            if not len(chunk):
+                continue
+            if in_memory:
+                chunk = memoryview(chunk)
+            if chunked:
+                yield '%x\r\n' % len(chunk)
+                yield chunk
+                yield '\r\n'
+            else:
+                yield chunk
+        if chunked:
+            yield '0\r\n\r\n'
+
+    def to_bytes(self):
+        """
+        Returns the message as sent on the wire
+
+        :rtype: string
+        """
+        content = self._content
+        if type(content) is str and not self._chunked or content is None:
+            return ''.join((self.start_line, '\r\n', str(self._headers),
+                            content or ''))
+        return ''.join([c.tobytes() if isinstance(c, memoryview) else str(c)
+                        for c in self.iter_chunks()])
@@ -0,0 +1,425 @@
+import mimetypes
+import os
+import stat
+from binascii import hexlify
+from tempfile import SpooledTemporaryFile
+
+from exception import ParseError
+from headers import Headers, CONTENT_DISPOSITION, CONTENT_LENGTH, \
+    CONTENT_TYPE
+from message import CHUNK_SIZE
+from parser import parse_headers
+
+#: parts bigger than this are written to a temporary file by the parser
+MAX_MEMORY_SIZE = 1024 * 1024
+
+# parser states
+PREAMBLE, DELIMITER, HEADERS, BODY, EPILOGUE = range(5)
+
+# characters that can't be sent as they are in a quoted name or filename,
+# escaped the way browsers do
+_ESCAPES = (('\r', '%0D'), ('\n', '%0A'), ('"', '%22'))
+
+
+def _quote(value):
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+    value = str(value)
+    for char, escape in _ESCAPES:
+        if char in value:
+            value = value.replace(char, escape)
+    return value
+
+
+def _remaining_size(f):
+    # returns the number of bytes left to read from a file, or None
+    try:
+        info = os.fstat(f.fileno())
+        if stat.S_ISREG(info.st_mode):
+            return max(info.st_size - f.tell(), 0)
+        return None
+    except (AttributeError, IOError, OSError, ValueError):
+        pass
+    try:
+        pos = f.tell()
+        f.seek(0, 2)
+        end = f.tell()
+        f.seek(pos)
+    except (AttributeError, IOError, OSError, ValueError):
+        return None
+    return end - pos
+
+
+class MultipartEncoder(object):
+    """
+    A *multipart/form-data* content, built as it is sent.
+
+    The encoder is given as the content of a :class:`Request`: iterating
+    over it yields the parts one after the other, and the files are read
+    chunk by chunk, so a large upload is never held in memory::
+
+        >>> form = MultipartEncoder([
+        ...     ('title', 'holidays'),
+        ...     ('photo', ('beach.jpg', open('beach.jpg', 'rb'))),
+        ... ])
+        >>> request = Request('POST', url, headers=form.headers,
+        ...                   content=form)
+    """
+
+    def __init__(self, fields, boundary=None, chunk_size=CHUNK_SIZE):
+        """
+        Construct a new ``MultipartEncoder`` object
+
+        :param fields: the fields of the form, as ``(name, value)`` pairs.
+            A value is a string, a file-like object, or a tuple
+            ``(filename, value)`` or ``(filename, value, content_type)``
+        :type fields: list of tuples or dict
+        :param boundary: delimiter of the parts, random if not given
+        :type boundary: string
+        :param chunk_size: size of the chunks read from the files
+        :type chunk_size: int
+        """
+        if isinstance(fields, dict):
+            fields = fields.items()
+        #: delimiter of the parts
+        self.boundary = boundary or hexlify(os.urandom(16))
+        self.chunk_size = chunk_size
+        # (head, value) for each part, the head including the delimiter
+        self._parts = [self._part(name, value) for name, value in fields]
+
+    def _part(self, name, value):
+        filename = content_type = None
+        if isinstance(value, tuple):
+            if len(value) > 2:
+                filename, value, content_type = value
+            else:
+                filename, value = value
+        elif hasattr(value, 'read'):
+            filename = getattr(value, 'name', None)
+            if isinstance(filename, basestring):
+                filename = os.path.basename(filename)
+            else:
+                filename = None
+
+        disposition = 'form-data; name="%s"' % _quote(name)
+        if filename is not None:
+            disposition += '; filename="%s"' % _quote(filename)
+            if content_type is None:
+                content_type = mimetypes.guess_type(filename)[0] or \
+                    'application/octet-stream'
+        headers = Headers([(CONTENT_DISPOSITION, disposition)])
+        if content_type is not None:
+            headers.add(CONTENT_TYPE, content_type)
+
+        if isinstance(value, unicode):
+            value = value.encode('utf-8')
+        elif not isinstance(value, str) and not hasattr(value, 'read'):
+            value = str(value)
+        return '--%s\r\n%s' % (self.boundary, headers), value
+
+    @property
+    def content_type(self):
+        """
+        Returns the value of the *Content-Type* header of the content
+
+        :rtype: string
+        """
+        return 'multipart/form-data; boundary=' + self.boundary
+
+    @property
+    def length(self):
+        """
+        Returns the size of the content, or ``None`` if the size of one of
+        the files can't be known
+
+        :rtype: int
+        """
+        # the last delimiter, and a CRLF before all the delimiters but the
+        # first one
+        length = len(self.boundary) + 6 + 2 * len(self._parts)
+        for head, value in self._parts:
+            if isinstance(value, str):
+                size = len(value)
+            else:
+                size = _remaining_size(value)
+                if size is None:
+                    return None
+            length += len(head) + size
+        return length
+
+    @property
+    def headers(self):
+        """
+        Returns the headers to send the content with: its *Content-Type*,
+        and its *Content-Length* when it is known. Otherwise the content is
+        sent chunked
+
+        :rtype: list of tuples
+        """
+        headers = [(CONTENT_TYPE, self.content_type)]
+        length = self.length
+        if length is not None:
+            headers.append((CONTENT_LENGTH, str(length)))
+        return headers
+
+    def __iter__(self):
+        # the heads and the strings are sent together, up to the next file
+        pending = []
+        separator = ''
+        for head, value in self._parts:
+            pending.append(separator)
+            pending.append(head)
+            separator = '\r\n'
+            if isinstance(value, str):
+                pending.append(value)
+                continue
+            yield ''.join(pending)
+            pending = []
+            read = value.read
+            while True:
+                chunk = read(self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        pending.append(separator)
+        pending.append('--%s--\r\n' % self.boundary)
+        yield ''.join(pending)
+
+
+class Part(object):
+    """
+    A part of a multipart content, as given by :class:`MultipartParser`
+    """
+
+    def __init__(self, headers, file):
+        """
+        Construct a new ``Part`` object
+
+        :param headers: headers of the part
+        :type headers: class:`Headers`
+        :param file: content of the part, read from the start
+        :type file: file-like object
+
+        .. attribute:: size
+
+           Size of the content
+        """
+        self.headers = headers
+        self.file = file
+        self.size = 0
+
+    @property
+    def name(self):
+        """
+        Returns the name of the form field, or ``None``
+
+        :rtype: string
+        """
+        return self.headers.content_disposition_params.get('name')
+
+    @property
+    def filename(self):
+        """
+        Returns the name of the file that was uploaded, or ``None``
+
+        :rtype: string
+        """
+        return self.headers.content_disposition_params.get('filename')
+
+    @property
+    def content_type(self):
+        """
+        Returns the media type of the content; ``text/plain`` by default
+
+        :rtype: string
+        """
+        return self.headers.content_type or 'text/plain'
+
+    @property
+    def content(self):
+        """
+        Returns the content of the part, read in memory
+
+        :rtype: string
+        """
+        f = self.file
+        f.seek(0)
+        content = f.read()
+        f.seek(0)
+        return content
+
+    def close(self):
+        """Closes the file of the part, and deletes it if it is on disk"""
+        self.file.close()
+
+
+class MultipartParser(object):
+    """
+    Incremental *multipart* parser.
+
+    The content is fed as it is received, and the parts are returned as
+    soon as they are complete. A part is held in memory up to
+    *max_memory_size* bytes, and written to a temporary file beyond. The
+    delimiters are searched with a single scan of each chunk: only the
+    end of a chunk that can be the start of a delimiter is kept until the
+    next one.
+    """
+
+    def __init__(self, boundary, max_memory_size=MAX_MEMORY_SIZE,
+                 max_header_size=16384, max_parts=1000):
+        """
+        Construct a new parser
+
+        :param boundary: the *boundary* parameter of the *Content-Type*
+            header
+        :type boundary: string
+        :param max_memory_size: size above which a part is written to disk
+        :type max_memory_size: int
+        :param max_header_size: maximum size of the headers of a part
+        :type max_header_size: int
+        :param max_parts: maximum number of parts
+        :type max_parts: int
+        """
+        if not boundary:
+            raise ValueError('a boundary is required')
+        self.max_memory_size = max_memory_size
+        self.max_header_size = max_header_size
+        self.max_parts = max_parts
+        self._delimiter = '\r\n--' + str(boundary)
+        self._state = PREAMBLE
+        # the content starts with a delimiter without the CRLF
+        self._buffer = '\r\n'
+        self._part = None
+        self._count = 0
+
+    @property
+    def complete(self):
+        """
+        Returns ``True`` once the last delimiter was received
+
+        :rtype: boolean
+        """
+        return self._state == EPILOGUE
+
+    def feed(self, data):
+        """
+        Parses a chunk of the content
+
+        :param data: data received
+        :type data: string or buffer
+        :rtype: list of the parts completed by the data
+        """
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        buffer = self._buffer + data if self._buffer else data
+        delimiter = self._delimiter
+        parts = []
+        pos = 0
+        end = len(buffer)
+        while pos < end:
+            state = self._state
+            if state == BODY or state == PREAMBLE:
+                idx = buffer.find(delimiter, pos)
+                if idx < 0:
+                    # keep what can be the start of a delimiter
+                    keep = max(pos, end - len(delimiter) + 1)
+                    if state == BODY:
+                        self._write(buffer, pos, keep)
+                    pos = keep
+                    break
+                if state == BODY:
+                    self._write(buffer, pos, idx)
+                    parts.append(self._finish_part())
+                pos = idx + len(delimiter)
+                self._state = DELIMITER
+
+            elif state == DELIMITER:
+                if end - pos < 2:
+                    break
+                if buffer.startswith('--', pos):
+                    self._state = EPILOGUE
+                    continue
+                idx = buffer.find('\r\n', pos)
+                if idx < 0:
+                    if end - pos > 1024:
+                        raise ParseError('invalid multipart delimiter')
+                    break
+                if buffer[pos:idx].strip(' \t'):
+                    raise ParseError('invalid multipart delimiter')
+                pos = idx + 2
+                self._state = HEADERS
+
+            elif state == HEADERS:
+                if buffer.startswith('\r\n', pos):
+                    # no headers
+                    head = ''
+                    pos += 2
+                else:
+                    idx = buffer.find('\r\n\r\n', pos)
+                    if idx < 0:
+                        if end - pos > self.max_header_size:
+                            raise ParseError('multipart headers too large')
+                        break
+                    head = buffer[pos:idx]
+                    pos = idx + 4
+                self._start_part(head)
+
+            else:
+                # the epilogue is ignored
+                pos = end
+        self._buffer = buffer[pos:]
+        return parts
+
+    def feed_eof(self):
+        """
+        Signals the end of the content
+
+        :raises: :class:`ParseError` if the last delimiter was not received
+        """
+        if self._state != EPILOGUE:
+            if self._part is not None:
+                self._part.close()
+                self._part = None
+            raise ParseError('multipart content truncated')
+
+    def _start_part(self, head):
+        if self._count >= self.max_parts:
+            raise ParseError('too many parts')
+        if len(head) > self.max_header_size:
+            raise ParseError('multipart headers too large')
+        self._count += 1
+        self._part = Part(parse_headers(head.split('\r\n') if head else []),
+                          SpooledTemporaryFile(self.max_memory_size))
+        self._state = BODY
+
+    def _write(self, buffer, start, end):
+        if end > start:
+            part = self._part
+            part.file.write(buffer[start:end])
+            part.size += end - start
+
+    def _finish_part(self):
+        part, self._part = self._part, None
+        part.file.seek(0)
+        return part
+
+
+def iter_parts(message, **kwargs):
+    """
+    Returns an iterator over the parts of a *multipart* message, parsed as
+    its content is read. The content is decoded first, if it has a
+    *Content-Encoding*. The keyword arguments are given to
+    :class:`MultipartParser`
+
+    :param message: a request or a response
+    :type message: class:`Request` or class:`Response`
+    :rtype: iterator of class:`Part`
+    """
+    boundary = message.headers.content_type_params.get('boundary')
+    if not boundary:
+        raise ParseError('no multipart boundary')
+    parser = MultipartParser(boundary, **kwargs)
+    for chunk in message.iter_content(None, decode=True):
+        for part in parser.feed(chunk):
+            yield part
+    parser.feed_eof()
@@ -0,0 +1,467 @@
+from collections import deque
+from string import hexdigits
+
+from exception import ParseError
+from headers import Headers, CONNECTION, CONTENT_LENGTH, HOST, \
+    TRANSFER_ENCODING
+from message import Body
+from request import Request
+from response import Response
+from url import Url
+
+# parser states
+HEAD, LENGTH, CHUNK_SIZE, CHUNK_DATA, CHUNK_END, TRAILERS, UNTIL_CLOSE = \
+    range(7)
+
+# terminator of the item being read in the line oriented states
+_TERMINATORS = {
+    HEAD: '\r\n\r\n',
+    CHUNK_SIZE: '\r\n',
+    CHUNK_END: '\r\n',
+    TRAILERS: '\r\n',
+}
+
+
+def parse_headers(lines):
+    """
+    Returns the headers of a message, or of a part of a *multipart*
+    content, parsed from their lines
+
+    :param lines: the lines of the header fields, without the CRLFs
+    :type lines: list of strings
+    :raises: :class:`ParseError` if a line is not a valid header field
+    :rtype: class:`Headers`
+    """
+    fields = []
+    for line in lines:
+        name, sep, value = line.partition(':')
+        if sep and name and name[-1] not in ' \t' and name[0] not in ' \t':
+            fields.append([name, value.strip()])
+        elif line[:1] in (' ', '\t') and fields:
+            # obsolete line folding
+            fields[-1][1] += ' ' + line.strip()
+        else:
+            raise ParseError('invalid header: {0!r}'.format(line))
+    return Headers._from_entries(fields)
+
+
+class _Parser(object):
+    """
+    Base class of the incremental parsers
+    """
+
+    # whether a body can be delimited by the end of the connection
+    _until_close_allowed = False
+    # whether Content-Length can come with Transfer-Encoding, which then
+    # takes precedence
+    _length_with_encoding_allowed = False
+
+    def __init__(self, max_header_size=65536, max_headers=100, read=None):
+        """
+        Construct a new parser
+
+        :param max_header_size: maximum size of the head of a message
+        :type max_header_size: int
+        :param max_headers: maximum number of headers in a message
+        :type max_headers: int
+        :param read: returns the next data read from the connection, or an
+            empty string when it is closed. When given, the body of a
+            message reads from the connection as it is iterated over
+        :type read: callable
+
+        .. attribute:: keep_alive
+
+           Whether the connection can be reused after the current message
+        """
+        self.max_header_size = max_header_size
+        self.max_headers = max_headers
+        self.read = read
+        self.keep_alive = True
+        self._state = HEAD
+        self._buffer = ''
+        self._remaining = 0
+        self._message = None
+        self._body = None
+        # (message, body) parsed while reading from the connection, and
+        # body of the last message returned by next_message
+        self._queue = deque()
+        self._returned = None
+
+    @property
+    def message(self):
+        """
+        Returns the message being received, or the last one received
+
+        :rtype: class:`Request` or class:`Response`
+        """
+        return self._message
+
+    @property
+    def idle(self):
+        """
+        Returns ``True`` if the parser is not in the middle of a message
+
+        :rtype: boolean
+        """
+        return self._state == HEAD and not self._buffer
+
+    def feed(self, data):
+        """
+        Parses a chunk of data
+
+        :param data: data read from the socket
+        :type data: string
+        :rtype: list of the messages whose head was parsed
+        """
+        messages = []
+        if self._buffer:
+            pos = self._complete_buffer(data)
+            if pos < 0:
+                return messages
+            buffer, self._buffer = self._buffer, ''
+            self._parse(buffer, 0, messages)
+            if self._buffer:
+                # the buffered item was complete: nothing can be left
+                raise ParseError('unexpected data in buffer')
+        else:
+            pos = 0
+        if pos < len(data):
+            self._parse(data, pos, messages)
+        return messages
+
+    def feed_eof(self):
+        """
+        Signals that the connection was closed
+
+        :raises: :class:`ParseError` if a message was not complete
+        """
+        if self._state == UNTIL_CLOSE:
+            self._finish()
+        elif not self.idle:
+            raise ParseError('connection closed in the middle of a message')
+
+    def next_message(self):
+        """
+        Reads from the connection until the head of the next message is
+        parsed. The rest of the body of the previous message is skipped if
+        it was not read. Requires the *read* callable.
+
+        :rtype: class:`Request` or class:`Response`, or ``None`` if the
+            connection was closed
+        """
+        body = self._returned
+        if body is not None and not body.complete:
+            for chunk in body:
+                pass
+        queue = self._queue
+        while not queue:
+            data = self.read()
+            if not data:
+                self.feed_eof()
+                return None
+            queue.extend(self._with_bodies(self.feed(data)))
+        message, self._returned = queue.popleft()
+        return message
+
+    def _fill(self):
+        data = self.read()
+        if data:
+            self._queue.extend(self._with_bodies(self.feed(data)))
+        else:
+            self.feed_eof()
+
+    def _with_bodies(self, messages):
+        # a request without a body has an empty string as its content
+        return [(message, message._content
+                 if isinstance(message._content, Body) else None)
+                for message in messages]
+
+    def _new_body(self):
+        self._body = Body(self._fill if self.read is not None else None)
+        return self._body
+
+    def _complete_buffer(self, data):
+        # Moves to the buffer only the part of data needed to complete the
+        # pending line or head, so that the rest of data is never copied.
+        # Returns the position in data after the item, or -1.
+        term = _TERMINATORS[self._state]
+        keep = len(term) - 1
+        tail = self._buffer[-keep:]
+        idx = (tail + data[:keep]).find(term)
+        if idx >= 0:
+            pos = idx + len(term) - len(tail)
+        else:
+            idx = data.find(term)
+            pos = idx + len(term) if idx >= 0 else -1
+        if pos < 0:
+            self._buffer += data
+            self._check_buffer()
+        else:
+            self._buffer += data[:pos]
+        return pos
+
+    def _check_buffer(self):
+        if self._state == HEAD:
+            limit = self.max_header_size
+        else:
+            limit = 1024
+        if len(self._buffer) > limit:
+            raise ParseError('line too long')
+
+    def _parse(self, data, pos, messages):
+        view = memoryview(data)
+        end = len(data)
+        while pos < end:
+            state = self._state
+            if state == LENGTH or state == CHUNK_DATA:
+                size = min(self._remaining, end - pos)
+                self._body.push(view[pos:pos + size])
+                pos += size
+                self._remaining -= size
+                if not self._remaining:
+                    if state == LENGTH:
+                        self._finish()
+                    else:
+                        self._state = CHUNK_END
+                continue
+
+            if state == UNTIL_CLOSE:
+                self._body.push(view[pos:])
+                return
+
+            idx = data.find(_TERMINATORS[state], pos)
+            if idx < 0:
+                self._buffer = data[pos:]
+                self._check_buffer()
+                return
+
+            if state == HEAD:
+                head = data[pos:idx].lstrip('\r\n')
+                if len(head) > self.max_header_size:
+                    raise ParseError('headers too large')
+                pos = idx + 4
+                if head:
+                    messages.append(self._start_message(head))
+            elif state == CHUNK_SIZE:
+                self._chunk_size(data[pos:idx])
+                pos = idx + 2
+            elif state == CHUNK_END:
+                if idx != pos:
+                    raise ParseError('invalid chunk terminator')
+                self._state = CHUNK_SIZE
+                pos = idx + 2
+            elif state == TRAILERS:
+                line = data[pos:idx]
+                pos = idx + 2
+                if line:
+                    name, value = self._parse_field(line)
+                    self._message.headers.add(name, value)
+                else:
+                    self._finish()
+
+    def _chunk_size(self, line):
+        size, sep, extensions = line.partition(';')
+        if sep:
+            # whitespace is allowed before the extensions
+            size = size.rstrip(' \t')
+        if not size or size.strip(hexdigits):
+            raise ParseError('invalid chunk size: {0!r}'.format(line))
+        size = int(size, 16)
+        if size:
+            self._state = CHUNK_DATA
+            self._remaining = size
+        else:
+            self._state = TRAILERS
+
+    def _start_message(self, head):
+        lines = head.split('\r\n')
+        if len(lines) > self.max_headers + 1:
+            raise ParseError('too many headers')
+        line = lines[0]
+        del lines[0]
+        headers = parse_headers(lines)
+        version = self._create_message(line, headers)
+        index = headers._index
+        connection = index.get(CONNECTION.lower_name)
+        self.keep_alive = self._keep_alive(version, connection)
+
+        if not self._has_body():
+            self._finish()
+            return self._message
+
+        # the index is read directly: it is the hot path of small requests
+        entries = index.get(TRANSFER_ENCODING.lower_name)
+        if entries is not None:
+            if not self._length_with_encoding_allowed and \
+                    CONTENT_LENGTH.lower_name in index:
+                # RFC 7230, 3.3.3: a way to smuggle a request
+                raise ParseError('both Transfer-Encoding and Content-Length')
+            te = ', '.join([value for name, value in entries])
+            if te.rsplit(',', 1)[-1].strip().lower() == 'chunked':
+                self._state = CHUNK_SIZE
+            elif self._until_close_allowed:
+                self._until_close()
+            else:
+                raise ParseError('invalid Transfer-Encoding: {0!r}'.format(te))
+            self._attach_body()
+            return self._message
+
+        entries = index.get(CONTENT_LENGTH.lower_name)
+        if entries is None:
+            if self._until_close_allowed:
+                self._until_close()
+                self._attach_body()
+            else:
+                self._finish()
+            return self._message
+
+        length = entries[0][1]
+        if len(entries) > 1 or ',' in length:
+            # the same length can be repeated, not different ones
+            values = set(v.strip() for name, value in entries
+                         for v in value.split(','))
+            if len(values) != 1:
+                raise ParseError('invalid Content-Length: {0!r}'.format(
+                    ', '.join([value for name, value in entries])))
+            length = values.pop()
+        if not length.isdigit():
+            raise ParseError('invalid Content-Length: {0!r}'.format(length))
+        length = int(length)
+        if length:
+            self._state = LENGTH
+            self._remaining = length
+            self._attach_body()
+        else:
+            self._finish()
+        return self._message
+
+    def _create_message(self, line, headers):
+        # parses the start line, sets self._message and returns the version
+        raise NotImplementedError
+
+    def _has_body(self):
+        return True
+
+    def _attach_body(self):
+        # gives a body to the current message, unless it already has one;
+        # the message was just created with an empty content
+        if self._body is None:
+            self._message._content = self._new_body()
+
+    def _parse_field(self, line):
+        name, sep, value = line.partition(':')
+        if not sep or not name or name.rstrip() != name:
+            raise ParseError('invalid header: {0!r}'.format(line))
+        return name, value.strip()
+
+    def _keep_alive(self, version, entries):
+        # entries of the Connection header in the index of the headers
+        if entries is None:
+            return version != 'HTTP/1.0'
+        tokens = [t.strip() for t in entries[0][1].lower().split(',')]
+        if version == 'HTTP/1.0':
+            return 'keep-alive' in tokens
+        return 'close' not in tokens
+
+    def _until_close(self):
+        self._state = UNTIL_CLOSE
+        self.keep_alive = False
+
+    def _finish(self):
+        body, self._body = self._body, None
+        if body is not None:
+            body.finish()
+        self._state = HEAD
+
+
+class RequestParser(_Parser):
+    """
+    Incremental HTTP/1.1 request parser.
+
+    Data is pushed to the parser with :meth:`feed` as it is read from the
+    client. When the head of a request has been parsed, a :class:`Request`
+    is created with a :class:`Body` as its content, and the following data
+    is pushed to that body. Pipelined requests can be given in a single
+    call to :meth:`feed`.
+
+    The body is delimited by the *Transfer-Encoding* header when it is
+    chunked, by the *Content-Length* header otherwise. A request with
+    neither of these headers doesn't have a body: its content is an empty
+    string.
+    """
+
+    def _create_message(self, line, headers):
+        parts = line.split(' ')
+        if len(parts) != 3 or not parts[0] or not parts[1] \
+                or not parts[2].startswith('HTTP/'):
+            raise ParseError('invalid request line: {0!r}'.format(line))
+        method, target, version = parts
+
+        entries = headers._index.get(HOST.lower_name)
+        host = entries[0][1] if entries is not None else None
+        if method == 'CONNECT':
+            url = Url(netloc=target)
+        elif target[:1] == '/' and target[1:2] != '/' and \
+                not (host and (':' in host or '@' in host)):
+            # origin form: the URL is parsed when it is first used
+            url = '//' + host + target if host else target
+        else:
+            url = Url(target)
+            if url.host is None and host:
+                if ':' in host or '@' in host:
+                    url.netloc = host
+                else:
+                    url.host = host
+
+        # the body is attached when the headers tell there is one
+        self._message = Request(method, url, headers, content='')
+        return version
+
+
+class ResponseParser(_Parser):
+    """
+    Incremental HTTP/1.1 response parser.
+
+    Data is pushed to the parser with :meth:`feed` as it comes off the
+    socket. When the head of a response has been parsed, a
+    :class:`Response` is created with a :class:`Body` as its content, and
+    the following data is pushed to that body.
+
+    The body is delimited by the *Transfer-Encoding* header when it is
+    chunked, by the *Content-Length* header otherwise, and by the end of
+    the connection (see :meth:`feed_eof`) when neither is present.
+
+    .. attribute:: request_method
+
+       Method of the request the next response answers. Set it to *HEAD*
+       for responses that don't have a body
+    """
+
+    _until_close_allowed = True
+    _length_with_encoding_allowed = True
+
+    def __init__(self, *args, **kwargs):
+        super(ResponseParser, self).__init__(*args, **kwargs)
+        self.request_method = None
+
+    def _create_message(self, line, headers):
+        version, status, reason = self._parse_status_line(line)
+        self._message = Response.from_parts(status, reason, headers,
+                                            self._new_body())
+        return version
+
+    def _has_body(self):
+        status = self._message.status
+        if status < 200 or status in (204, 304):
+            return False
+        return self.request_method != 'HEAD'
+
+    def _parse_status_line(self, line):
+        parts = line.split(' ', 2)
+        if len(parts) < 2 or not parts[0].startswith('HTTP/'):
+            raise ParseError('invalid status line: {0!r}'.format(line))
+        status = parts[1]
+        if len(status) != 3 or not status.isdigit():
+            raise ParseError('invalid status line: {0!r}'.format(line))
+        reason = parts[2] if len(parts) == 3 else ''
+        return parts[0], int(status), reason
@@ -0,0 +1,304 @@
+"""
+Replays the requests described in a file of JSON lines, and reports the
+throughput, the latencies and the errors.
+
+    $ python -m http.replay requests.jsonl --target http://127.0.0.1:8080 \\
+        --concurrency 50 --repeat 10
+
+Each line describes a request; only *url* is required::
+
+    {"method": "POST", "url": "/items", "headers": {"X-Foo": "bar"},
+     "json": {"name": "widget"}}
+
+*content* gives the body as a string, *json* as a value to encode. Blank
+lines and lines starting with ``#`` are skipped.
+"""
+import argparse
+import json
+import socket
+import ssl
+import sys
+import time
+from collections import Counter
+
+from asyncclient import AsyncClient
+from exception import ParseError
+from request import Request
+from url import Url
+
+#: percentiles of the latencies given in the report
+PERCENTILES = (50, 90, 99)
+
+
+def load(lines):
+    """
+    Returns the descriptions of the requests read from lines of JSON
+
+    :param lines: the lines, ie. a file
+    :type lines: iterable
+    :raises: ``ValueError`` if a line is not a valid description
+    :rtype: list of dicts
+    """
+    descriptions = []
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            description = json.loads(line)
+        except ValueError as e:
+            raise ValueError('line {0}: {1}'.format(number, e))
+        if not isinstance(description, dict) or \
+                not isinstance(description.get('url'), basestring):
+            raise ValueError('line {0}: a request needs a url'.format(number))
+        descriptions.append(description)
+    return descriptions
+
+
+def build(description, target=None):
+    """
+    Returns a new :class:`Request` from its description. With a *target*,
+    the path and the query of the URL are resolved against it, so that
+    requests recorded for a host can be sent to another one
+
+    :param description: the description, as given by :func:`load`
+    :type description: dict
+    :param target: base URL, ie. 'http://127.0.0.1:8080'
+    :type target: string or class:`Url`
+    :rtype: class:`Request`
+    """
+    url = Url(str(description['url']))
+    if target is not None:
+        url = Url(target) + url.abs_path_query
+    headers = description.get('headers') or []
+    if isinstance(headers, dict):
+        headers = headers.items()
+    request = Request(str(description.get('method', 'GET')), url,
+                      [(str(name), str(value)) for name, value in headers])
+    if 'json' in description:
+        request.set_json(description['json'])
+    elif description.get('content') is not None:
+        content = description['content']
+        if isinstance(content, unicode):
+            content = content.encode('utf-8')
+        request.content = content
+    return request
+
+
+class Report(object):
+    """
+    Results of a replay
+
+    .. attribute:: latencies
+
+       Time to get each response, in seconds
+
+    .. attribute:: statuses
+
+       Number of responses for each status, as a ``Counter``
+
+    .. attribute:: failures
+
+       Number of requests that got no response, by type of exception
+    """
+
+    def __init__(self):
+        self.latencies = []
+        self.statuses = Counter()
+        self.failures = Counter()
+        self.client_errors = 0
+        self.server_errors = 0
+        self.elapsed = 0.0
+
+    @property
+    def count(self):
+        """
+        Returns the number of requests sent
+
+        :rtype: int
+        """
+        return len(self.latencies) + sum(self.failures.values())
+
+    @property
+    def throughput(self):
+        """
+        Returns the number of requests per second
+
+        :rtype: float
+        """
+        return self.count / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def error_rate(self):
+        """
+        Returns the share of the requests that failed, or got a 4xx or 5xx
+        response
+
+        :rtype: float
+        """
+        if not self.count:
+            return 0.0
+        errors = self.client_errors + self.server_errors + \
+            sum(self.failures.values())
+        return float(errors) / self.count
+
+    def add(self, response, latency):
+        """
+        Records a response
+
+        :param response: the response
+        :type response: class:`Response`
+        :param latency: time to get it, in seconds
+        :type latency: float
+        """
+        self.latencies.append(latency)
+        self.statuses[response.status] += 1
+        if response.is_client_error:
+            self.client_errors += 1
+        elif response.is_server_error:
+            self.server_errors += 1
+
+    def percentile(self, percent):
+        """
+        Returns a percentile of the latencies, with the nearest-rank
+        method, or ``None`` if no response was received
+
+        :param percent: from 0 to 100
+        :type percent: float
+        :rtype: float
+        """
+        latencies = sorted(self.latencies)
+        if not latencies:
+            return None
+        rank = int(-(-percent * len(latencies) // 100))
+        return latencies[min(max(rank, 1), len(latencies)) - 1]
+
+    def __str__(self):
+        count = self.count or 1
+        lines = ['requests:      {0}'.format(self.count),
+                 'elapsed:       {0:.3f} s'.format(self.elapsed),
+                 'throughput:    {0:.1f} requests/s'.format(self.throughput)]
+        if self.latencies:
+            for percent in PERCENTILES:
+                label = 'latency p{0}:'.format(percent)
+                lines.append('{0:<15}{1:.2f} ms'.format(
+                    label, self.percentile(percent) * 1000))
+            lines.append('latency max:   {0:.2f} ms'.format(
+                max(self.latencies) * 1000))
+        lines.append('client errors: {0} ({1:.2%})'.format(
+            self.client_errors, float(self.client_errors) / count))
+        lines.append('server errors: {0} ({1:.2%})'.format(
+            self.server_errors, float(self.server_errors) / count))
+        failures = sum(self.failures.values())
+        lines.append('failures:      {0} ({1:.2%})'.format(
+            failures, float(failures) / count))
+        for name, n in sorted(self.failures.items()):
+            lines.append('  {0}: {1}'.format(name, n))
+        lines.append('statuses:      ' + ', '.join(
+            '{0}: {1}'.format(status, n)
+            for status, n in sorted(self.statuses.items())))
+        return '\n'.join(lines)
+
+
+def replay(requests, client=None, concurrency=10, timeout=None):
+    """
+    Sends requests, *concurrency* of them at a time, and returns a
+    :class:`Report`. A new request is sent as soon as a response is
+    received, so the latencies don't include any time spent waiting for a
+    connection
+
+    :param requests: the requests to send
+    :type requests: iterable of class:`Request`
+    :param client: the client to send them with, by default an
+        :class:`AsyncClient` with *concurrency* connections
+    :type client: class:`AsyncClient`
+    :param concurrency: number of requests sent at the same time
+    :type concurrency: int
+    :param timeout: time to get each response, in seconds
+    :type timeout: float
+    :rtype: class:`Report`
+    """
+    if client is None:
+        client = AsyncClient(max_connections_per_host=concurrency,
+                             max_connections=concurrency)
+        try:
+            return replay(requests, client, concurrency, timeout)
+        finally:
+            client.close()
+    report = Report()
+    requests = iter(requests)
+    done = []
+    in_flight = 0
+    start = time.time()
+    while True:
+        while in_flight < concurrency:
+            request = next(requests, None)
+            if request is None:
+                break
+            sent = time.time()
+            try:
+                future = client.request(request, timeout=timeout)
+            except (socket.error, ssl.SSLError, ParseError) as e:
+                report.failures[type(e).__name__] += 1
+                continue
+            future.add_done_callback(
+                lambda future, sent=sent: done.append((future, sent,
+                                                       time.time())))
+            in_flight += 1
+        if not in_flight:
+            break
+        client.poll()
+        for future, sent, received in done:
+            in_flight -= 1
+            exception = future.exception()
+            if exception is not None:
+                report.failures[type(exception).__name__] += 1
+            else:
+                report.add(future.result(), received - sent)
+        del done[:]
+    report.elapsed = time.time() - start
+    return report
+
+
+def main(args=None):
+    """Runs the replay from the command line"""
+    parser = argparse.ArgumentParser(
+        prog='python -m http.replay',
+        description='Replays the requests described in a file of JSON '
+                    'lines.')
+    parser.add_argument('file', help="file of requests, '-' for stdin")
+    parser.add_argument('-t', '--target',
+                        help='base URL the requests are sent to')
+    parser.add_argument('-c', '--concurrency', type=int, default=10,
+                        help='requests sent at the same time')
+    parser.add_argument('-n', '--repeat', type=int, default=1,
+                        help='times the file is replayed')
+    parser.add_argument('--timeout', type=float, default=60,
+                        help='time to get a response, in seconds')
+    parser.add_argument('--max-error-rate', type=float,
+                        help='exit with status 1 above this share of '
+                             'errors, ie. 0.01')
+    options = parser.parse_args(args)
+
+    try:
+        if options.file == '-':
+            descriptions = load(sys.stdin)
+        else:
+            with open(options.file) as f:
+                descriptions = load(f)
+    except (IOError, ValueError) as e:
+        parser.error(str(e))
+    requests = (build(description, options.target)
+                for i in xrange(options.repeat)
+                for description in descriptions)
+    report = replay(requests, concurrency=options.concurrency,
+                    timeout=options.timeout)
+    print report
+    if options.max_error_rate is not None and \
+            report.error_rate > options.max_error_rate:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
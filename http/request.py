@@ -1,12 +1,15 @@
 from headers import Headers
+from message import Message
 from url import Url
 
 
-class Request(object):
+class Request(Message):
     """
     The ``Request`` object encapsulates HTTP style requests
     """
 
+    __slots__ = ('_method', '_url')
+
     def __init__(self, method, url, headers=None, content=None):
         """
         Construct a new ``Request`` object
@@ -17,14 +20,13 @@ class Request(object):
         :type url: string or class:`Url`
         :param headers: Headers for the request
         :type headers: list of tuples or class:`Headers`
-        :param content: body
+        :param content: body, as a string, a file-like object or an
+            iterable
         """
         self.method = method
         self.content = content
-
-        if not isinstance(url, Url):
-            url = Url(url)
-        self.url = url
+        # a string is parsed when the URL is first used
+        self._url = url
 
         if headers is None:
             headers = Headers()
@@ -47,6 +49,33 @@ class Request(object):
         """Set the HTTP method"""
         self._method = str(value)
 
+    @property
+    def url(self):
+        """
+        Returns the URL of the request
+
+        :rtype: class:`Url`
+        """
+        url = self._url
+        if not isinstance(url, Url):
+            url = self._url = Url(url)
+        return url
+
+    @url.setter
+    def url(self, url):
+        """Set the URL of the request, as a string or a :class:`Url`"""
+        self._url = url
+
+    @property
+    def start_line(self):
+        """
+        Returns the request line, ie. 'GET /foo?bar=baz HTTP/1.1'
+
+        :rtype: string
+        """
+        return '{0} {1} {2}'.format(self._method, self.url.abs_path_query,
+                                    self.http_version)
+
     def header(self, name, value=None):
         """Returns the value of the given header
 
@@ -1,13 +1,24 @@
-from headers import Headers
+from httplib import responses
+
+from coding import encode, is_compressible, negotiate
+from headers import Headers, CONTENT_BASE, CONTENT_ENCODING, \
+    CONTENT_LENGTH, CONTENT_LOCATION, CONTENT_RANGE, ETAG, \
+    TRANSFER_ENCODING, VARY
+from message import Body, Message
 from url import Url
 
+#: contents smaller than this are not compressed by Response.compressed
+MIN_COMPRESSED_SIZE = 1024
+
 
-class Response(object):
+class Response(Message):
     """
     The ``Response`` object encapsulates HTTP style responses.
     """
 
-    def __init__(self, status, headers=Headers(), content=None,
+    __slots__ = ('_status', 'message', 'redirects', '_request')
+
+    def __init__(self, status, headers=None, content=None,
         message=None, request=None):
 
         """
@@ -17,7 +28,8 @@ class Response(object):
         :type status: integer
         :param headers: HTTP headers
         :type status: a list of tuples or a class:`Headers` object
-        :param content: content
+        :param content: content, as a string, a file-like object or an
+            iterable
         :param message: HTTP message for the response
         :param request: origin Request object used
         :type request: class:`Request`
@@ -32,14 +44,52 @@ class Response(object):
         self.message = message
         self.redirects = list()
 
-        if (not isinstance(headers, Headers)):
+        if headers is None:
+            headers = Headers()
+        elif not isinstance(headers, Headers):
             headers = Headers(headers)
 
         self._headers = headers
 
         self._content = content
+        self._streamed = False
+        self._reader = None
+        self._pending = None
+        self._json = None
         self._request = request
 
+    @classmethod
+    def from_parts(cls, status, message, headers, content=None,
+                   request=None):
+        """
+        Returns a new ``Response``, built from parts that are already
+        parsed: nothing is checked or converted. Use :meth:`Headers.copy`
+        to give the response headers that are used elsewhere
+
+        :param status: HTTP status code
+        :type status: int
+        :param message: reason phrase, or ``None``
+        :param headers: HTTP headers, used as they are
+        :type headers: class:`Headers`
+        :param content: content, as a string, a file-like object or an
+            iterable
+        :param request: origin Request object used
+        :type request: class:`Request`
+        :rtype: class:`Response`
+        """
+        response = cls.__new__(cls)
+        response._status = status
+        response.message = message
+        response.redirects = []
+        response._headers = headers
+        response._content = content
+        response._streamed = False
+        response._reader = None
+        response._pending = None
+        response._json = None
+        response._request = request
+        return response
+
     @property
     def status(self):
         """
@@ -124,10 +174,10 @@ class Response(object):
         """
 
         url = None
-        if self.header('Content-Base'):
-            url = self.header('Content-Base')
-        if self.header('Content-Location'):
-            url = self.header('Content-Location')
+        if self.header(CONTENT_BASE):
+            url = self.header(CONTENT_BASE)
+        if self.header(CONTENT_LOCATION):
+            url = self.header(CONTENT_LOCATION)
         if url is None and self.request:
             url = self.request.url
 
@@ -148,22 +198,6 @@ class Response(object):
         """
         return self._request
 
-    @property
-    def content(self):
-        """
-        Returns the actual content of the response
-
-        :rtype: string
-        """
-        return self._content
-
-    @content.setter
-    def content(self, content):
-        """
-        Set the actual content of the response
-        """
-        self._content = content
-
     def header(self, name):
         """
         Returns the value for a given header
@@ -190,6 +224,19 @@ class Response(object):
         """
         return "{0} {1}".format(self.status, self.message)
 
+    @property
+    def start_line(self):
+        """
+        Returns the status line, ie. 'HTTP/1.1 200 OK'. The standard reason
+        phrase is used when the response has no message
+
+        :rtype: string
+        """
+        message = self.message
+        if message is None:
+            message = responses.get(self.status, '')
+        return '{0} {1} {2}'.format(self.http_version, self.status, message)
+
     @property
     def last_modified(self):
         """
@@ -220,7 +267,8 @@ class Response(object):
     @property
     def content_length(self):
         """
-        Returns the content-length of the actual response
+        Returns the content-length of the actual response, as declared by
+        the *Content-Length* header. A streamed content is not read
 
         :rtype: int
         """
@@ -252,3 +300,92 @@ class Response(object):
         :rtype: boolean
         """
         return self._headers.content_is_xhtml
+
+    def close(self):
+        """
+        Closes a streamed response whose content was not read to the end:
+        the connection it is read from is closed, instead of going back to
+        the pool. Nothing is done otherwise
+        """
+        content = self._content
+        if isinstance(content, Body):
+            content.close()
+
+    def compressed(self, request=None, level=6,
+                   min_size=MIN_COMPRESSED_SIZE):
+        """
+        Returns the response compressed with the coding the request
+        prefers, among the ones its *Accept-Encoding* header lists, as a
+        new ``Response``. A string content is compressed at once, and gets
+        a *Content-Length*; a streamed content is compressed as it is
+        read, and sent chunked.
+
+        The response itself is returned, unchanged, when there is no
+        request, or when the content is not worth compressing: it is
+        already encoded, smaller than *min_size*, or of a media type
+        already compressed (see :data:`http.coding.INCOMPRESSIBLE_TYPES`).
+        Otherwise the choice depends on the request, and *Accept-Encoding*
+        is added to the *Vary* header of the new response: when the client
+        accepts no known coding, it is a copy of the response, with the
+        same content.
+
+        :param request: the request answered, by default the one of the
+            response
+        :type request: class:`Request`
+        :param level: compression level, from 1 to 9
+        :type level: int
+        :param min_size: size of the smallest content to compress
+        :type min_size: int
+        :rtype: class:`Response`
+        """
+        headers = self._headers
+        status = self.status
+        if status < 200 or status in (204, 304) or \
+                CONTENT_ENCODING in headers or CONTENT_RANGE in headers or \
+                not is_compressible(headers.content_type):
+            return self
+        content = self._content
+        if content is None:
+            return self
+        size = len(content) if isinstance(content, basestring) \
+            else headers.content_length
+        if size is not None and size < min_size:
+            return self
+
+        if request is None:
+            request = self._request
+            if request is None:
+                return self
+        coding = negotiate(request.headers.accept_encoding)
+        vary = headers.vary
+        add_vary = '*' not in vary and 'accept-encoding' not in vary
+        if coding is None and not add_vary:
+            return self
+
+        headers = headers.copy()
+        if add_vary:
+            headers.add(VARY, 'Accept-Encoding')
+        if coding is None:
+            response = Response.from_parts(status, self.message, headers,
+                                           content, self._request)
+            response.redirects = self.redirects
+            return response
+        headers.set(CONTENT_ENCODING, coding)
+        etag = headers.etag
+        if etag is not None and not etag.weak:
+            # the compressed content is another representation
+            headers.set(ETAG, 'W/"{0}"'.format(etag.tag))
+        chunked = self._chunked
+        del headers[CONTENT_LENGTH]
+        if type(content) is str:
+            content = ''.join(encode([content], coding, level))
+            if not chunked:
+                headers.set(CONTENT_LENGTH, str(len(content)))
+        else:
+            content = encode(self._iter_body(None), coding, level)
+            if not chunked:
+                headers.add(TRANSFER_ENCODING, 'chunked')
+        response = Response.from_parts(status, self.message, headers,
+                                       content, self._request)
+        response.redirects = self.redirects
+        return response
@@ -1,6 +1,5 @@
-from urlparse import urlunparse as urlimplode, urlparse as urlexplode
-from urlparse import parse_qsl as queryexplode, urljoin
-from urllib import urlencode as queryimplode, quote
+from urlparse import scheme_chars, uses_netloc, uses_params
+from urllib import quote, quote_plus, unquote
 import re
 
 """
@@ -12,6 +11,53 @@ import re
 
 __author__ = "Damien 'bl0b' Leroux <damien.leroux@gmail.com>"
 
+#: number of URL strings kept parsed, see _parse_cached
+PARSE_CACHE_SIZE = 1024
+
+_set = object.__setattr__
+
+_QUERY_SEPARATORS = re.compile('[&;]')
+
+
+def _invalidating(method):
+    # wraps a method of list, to drop the serialized form of the list
+    # before it is modified
+    def wrapper(self, *args):
+        self._string = None
+        return method(self, *args)
+    wrapper.__name__ = method.__name__
+    return wrapper
+
+
+class _List(list):
+    # a list keeping its serialized form, until it is modified
+
+    __slots__ = ('_string',)
+
+    def __init__(self, items=()):
+        list.__init__(self, items)
+        self._string = None
+
+    def __str__(self):
+        string = self._string
+        if string is None:
+            string = self._string = self._serialize()
+        return string
+
+    __setitem__ = _invalidating(list.__setitem__)
+    __delitem__ = _invalidating(list.__delitem__)
+    __setslice__ = _invalidating(list.__setslice__)
+    __delslice__ = _invalidating(list.__delslice__)
+    __iadd__ = _invalidating(list.__iadd__)
+    __imul__ = _invalidating(list.__imul__)
+    append = _invalidating(list.append)
+    extend = _invalidating(list.extend)
+    insert = _invalidating(list.insert)
+    pop = _invalidating(list.pop)
+    remove = _invalidating(list.remove)
+    reverse = _invalidating(list.reverse)
+    sort = _invalidating(list.sort)
+
 
 class Url(object):
 
@@ -23,17 +69,30 @@ class Url(object):
     User can either configure netloc as a whole or username, password, host,
     and port independently.
     String representation of Url instance is the URL string itself.
+
+    An URL string is parsed once, and the strings parsed recently are
+    remembered. The string representation is kept until a component
+    changes.
     """
 
-    class Path(list):
+    __slots__ = ('scheme', '_path', '_query', 'fragment', 'params',
+                 'username', 'password', 'host', 'port', '_string')
+
+    class Path(_List):
+
+        __slots__ = ()
 
         SEP = '/'   # necessary for splitting
 
         def __init__(self, path):
             parts = self._get_parts(path)
-            list.__init__(self, parts)
+            _List.__init__(self, parts)
 
         def append(self, path):
+            self._string = None
+            if len(self) > 1 and self[-1] == '':
+                # the final slash
+                list.pop(self)
             parts = self._get_parts(path)
             # TODO refactor this part
             for i in parts:
@@ -43,14 +102,12 @@ class Url(object):
         def _get_parts(self, path):
             type_path = type(path)
             if type_path is str or type_path is unicode:
-                parts = [x for (i, x)
-                            in enumerate(path.split(Url.Path.SEP))
-                            if x or not i]
+                parts = _split_path(path)
             else:
                 parts = path
             return parts
 
-        def __str__(self):
+        def _serialize(self):
             return quote(Url.Path.SEP.join(self))
 
         @property
@@ -64,25 +121,233 @@ class Url(object):
         def canonify(self):
             if len(self) > 0 and self[0] == '':
                 tmp = self[1:]
-                init = self[:1]
+                canon = self[:1]
             else:
                 tmp = self
-                init = []
-
-            def _canon(a, b):
-                if b in ('.', ''):
-                    return a
-                if b == '..':
-                    return a[:-1]
-                return a + [b]
-            canon = init + reduce(_canon, tmp, [])
+                canon = []
+            start = len(canon)
+            for segment in tmp:
+                if segment in ('.', ''):
+                    continue
+                if segment == '..':
+                    if len(canon) > start:
+                        canon.pop()
+                else:
+                    canon.append(segment)
             self.__init__(canon)
             return self
 
+    class Query(object):
+        """The query, as a list of (key, value) tuples, indexed by key.
+
+        The query string an URL was parsed from is kept as it is: it is
+        decoded the first time the query is read, and it is given back
+        byte for byte until the query is modified. Then only the pairs that
+        were added or changed are encoded again. The pairs without a value
+        are ignored, as :func:`urlparse.parse_qsl` does."""
+
+        __slots__ = ('_raw', '_pairs', '_encoded', '_index', '_string')
+
+        def __init__(self, query=()):
+            """
+            :param query: a query string, or (key, value) tuples
+            """
+            self._index = None
+            if isinstance(query, basestring):
+                self._raw = self._string = query
+                self._pairs = self._encoded = None
+            elif isinstance(query, Url.Query):
+                self._raw = query._raw
+                self._string = query._string
+                self._pairs = self._encoded = None
+                if query._pairs is not None:
+                    self._pairs = list(query._pairs)
+                    self._encoded = list(query._encoded)
+            else:
+                self._raw = self._string = None
+                self._pairs = [tuple(pair) for pair in query]
+                self._encoded = [None] * len(self._pairs)
+
+        def __str__(self):
+            string = self._string
+            if string is None:
+                encoded = self._encoded
+                for i, part in enumerate(encoded):
+                    if part is None:
+                        key, value = self._pairs[i]
+                        encoded[i] = '{0}={1}'.format(quote_plus(str(key)),
+                                                      quote_plus(str(value)))
+                string = self._string = '&'.join(encoded)
+            return string
+
+        def __repr__(self):
+            return repr(self._decoded())
+
+        def __len__(self):
+            return len(self._decoded())
+
+        def __iter__(self):
+            return iter(self._decoded())
+
+        def __eq__(self, other):
+            if isinstance(other, Url.Query):
+                other = other._decoded()
+            return self._decoded() == list(other)
+
+        def __ne__(self, other):
+            return not self.__eq__(other)
+
+        __hash__ = None
+
+        def __contains__(self, key):
+            return key in self._keys()
+
+        def __getitem__(self, item):
+            if isinstance(item, basestring):
+                return self.get(item)
+            return self._decoded()[item]
+
+        def __setitem__(self, i, pair):
+            self._modified(False)
+            self._pairs[i] = tuple(pair)
+            self._encoded[i] = None
+            self._index = None
+
+        def __delitem__(self, item):
+            if isinstance(item, basestring):
+                return self.remove(item)
+            self._modified()
+            del self._pairs[item]
+            del self._encoded[item]
+
+        def items(self):
+            """
+            Returns the (key, value) tuples
+
+            :rtype: list
+            """
+            return list(self._decoded())
+
+        def get(self, key, default=None):
+            """
+            Returns the first value for a given key
+
+            :param key: key
+            :type key: string
+            :rtype: string
+            """
+            positions = self._keys().get(key)
+            if positions:
+                return self._pairs[positions[0]][1]
+            return default
+
+        def get_all(self, key):
+            """
+            Returns all the values for a given key
+
+            :param key: key
+            :type key: string
+            :rtype: list
+            """
+            pairs = self._decoded()
+            return [pairs[i][1] for i in self._keys().get(key, ())]
+
+        def add(self, key, value):
+            """
+            Adds a value for a key, at the end of the query
+
+            :param key: key
+            :type key: string
+            :param value: value
+            """
+            self.append((key, value))
+
+        def append(self, pair):
+            self._modified(False)
+            index = self._index
+            if index is not None:
+                index.setdefault(pair[0], []).append(len(self._pairs))
+            self._pairs.append(tuple(pair))
+            self._encoded.append(None)
+
+        def extend(self, pairs):
+            for pair in pairs:
+                self.append(pair)
+
+        def set(self, key, value):
+            """
+            Set a key to some specific value. If there is more than one
+            value for this key, the new value replace the first one
+
+            :param key: key
+            :type key: string
+            :param value: new value
+            """
+            positions = self._keys().get(key)
+            if not positions:
+                return self.add(key, value)
+            self._modified(False)
+            self._pairs[positions[0]] = (key, value)
+            self._encoded[positions[0]] = None
+
+        def remove(self, key):
+            """
+            Removes all the values of a key
+
+            :param key: key
+            :type key: string
+            """
+            positions = self._keys().get(key)
+            if not positions:
+                return
+            self._modified()
+            keep = set(range(len(self._pairs))) - set(positions)
+            self._pairs = [p for i, p in enumerate(self._pairs) if i in keep]
+            self._encoded = [e for i, e in enumerate(self._encoded)
+                             if i in keep]
+
+        def _decoded(self):
+            pairs = self._pairs
+            if pairs is None:
+                pairs = self._pairs = []
+                encoded = self._encoded = []
+                for part in _QUERY_SEPARATORS.split(self._raw):
+                    key, sep, value = part.partition('=')
+                    if value:
+                        if '+' in part:
+                            key = key.replace('+', ' ')
+                            value = value.replace('+', ' ')
+                        if '%' in part:
+                            key = unquote(key)
+                            value = unquote(value)
+                        pairs.append((key, value))
+                        encoded.append(part)
+            return pairs
+
+        def _keys(self):
+            index = self._index
+            if index is None:
+                index = self._index = {}
+                for i, pair in enumerate(self._decoded()):
+                    key = pair[0]
+                    if key in index:
+                        index[key].append(i)
+                    else:
+                        index[key] = [i]
+            return index
+
+        def _modified(self, moved=True):
+            # called before the pairs are modified; moved is True when
+            # some of the pairs change position
+            self._decoded()
+            self._raw = self._string = None
+            if moved:
+                self._index = None
+
     netloc_re = re.compile('(([^:@]+)(:([^@]+))?@)?([^:]+)(:([0-9]+))?')
 
-    def __init__(self, string_url=None, scheme='http', netloc='', path=[],
-                 params='', query=[], fragment='', username=None,
+    def __init__(self, string_url=None, scheme='http', netloc='', path=None,
+                 params='', query=None, fragment='', username=None,
                  password=None, host=None, port=None):
         """Construct an instance from an URL string
 
@@ -101,42 +366,67 @@ class Url(object):
         (username, password, host, port). Only host is mandatory if netloc is
         not provided."""
 
+        _set(self, '_string', None)
         if string_url is not None:
-            p = urlexplode(string_url, scheme=scheme)
-            scheme, netloc, path, params, query, fragment = p
-            self.username = p.username
-            self.password = p.password
-            self.host = p.hostname
-            self.port = p.port
-            query = queryexplode(query)
+            scheme, username, password, host, port, path, params, query, \
+                fragment = _parse_cached(string_url, scheme)
         elif netloc:
             self.netloc = netloc
-        else:
-            self.host = host
-            self.port = port
-            self.username = username
-            self.password = password
-
-        self.scheme = scheme
-        self._path = Url.Path(path)
-        self.query = query
-        self.fragment = fragment
-        self.params = params
+            username, password, host, port = \
+                self.username, self.password, self.host, self.port
+
+        _set(self, 'scheme', scheme)
+        _set(self, 'username', username)
+        _set(self, 'password', password)
+        _set(self, 'host', host)
+        _set(self, 'port', port)
+        _set(self, '_path', Url.Path(path if path is not None else []))
+        _set(self, '_query', Url.Query(query if query is not None else ''))
+        _set(self, 'fragment', fragment)
+        _set(self, 'params', params)
+
+    def __setattr__(self, name, value):
+        # any change of a component drops the string representation
+        _set(self, name, value)
+        _set(self, '_string', None)
 
     def __str__(self):
         "The URL in human-copypastable form."
-        return urlimplode(self)
+        path = self._path
+        query = self._query
+        cached = self._string
+        # the path and the query drop their own string when they change
+        if cached is not None and cached[1] is path._string and \
+                cached[2] is query._string:
+            return cached[0]
+        # same as urlparse.urlunparse
+        scheme = self.scheme
+        netloc = self.netloc
+        path_string = self.abs_path
+        if self.params:
+            path_string += ';' + self.params
+        if netloc or scheme and scheme in uses_netloc and \
+                path_string[:2] != '//':
+            if path_string[:1] != '/':
+                path_string = '/' + path_string
+            path_string = '//' + netloc + path_string
+        parts = [scheme + ':' if scheme else '', path_string]
+        query_string = str(query)
+        if query_string:
+            parts.append('?' + query_string)
+        if self.fragment:
+            parts.append('#' + self.fragment)
+        string = ''.join(parts)
+        _set(self, '_string', (string, path._string, query._string))
+        return string
 
     def __iter__(self):
         "Behave as a tuple or more precisely as a urlparse.ParseResult"
         yield self.scheme
         yield self.netloc
-        path = str(self.path)
-        if path == '':
-            path = '/'
-        yield path
+        yield self.abs_path
         yield self.params
-        yield queryimplode(self.query)
+        yield str(self._query)
         yield self.fragment
 
     def _netloc_get(self):
@@ -162,9 +452,38 @@ class Url(object):
     def _path_set(self, p):
         self._path = Url.Path(p)
 
+    def _query_set(self, q):
+        self._query = Url.Query(q)
+
     def __add__(self, u):
-        "Join two URLs."
-        return Url(urljoin(str(self), str(u)))
+        """Join two URLs: resolve *u* as a reference relative to this URL,
+        as described by RFC 3986 (5.2.2). The components are combined as
+        they are, without going through strings."""
+        if not isinstance(u, Url):
+            u = Url(u)
+        if u.host is not None or u.scheme not in ('http', 'https'):
+            # not relative
+            return Url(scheme=u.scheme, username=u.username,
+                       password=u.password, host=u.host, port=u.port,
+                       path=_remove_dots(u._path), params=u.params,
+                       query=u._query, fragment=u.fragment)
+        path, params, query = u._path, u.params, u._query
+        if not path and not params:
+            path, params = self._path, self.params
+            if not str(query):
+                query = self._query
+        elif path and path[0] == '':
+            path = _remove_dots(path)
+        else:
+            base = self._path
+            if len(base) < 2 and (self.host is not None or not base):
+                # '/', or no path at all
+                base = ['', '']
+            path = _remove_dots(base[:-1] + (path or ['']))
+        return Url(scheme=self.scheme, username=self.username,
+                   password=self.password, host=self.host, port=self.port,
+                   path=path, params=params, query=query,
+                   fragment=u.fragment)
 
     def __eq__(self, u):
         return str(self) == str(u)
@@ -175,7 +494,7 @@ class Url(object):
     def abs_path(self):
         """Return a string representing the absolute path.
         ("/" if self.path is empty)"""
-        path = str(self.path)
+        path = str(self._path)
         if path == '':
             path = '/'
         return path
@@ -183,11 +502,145 @@ class Url(object):
     @property
     def abs_path_query(self):
         """Return the absolute path and query components as a single string.
-        The path and the query are separated by a "?" character."""
-        return self.abs_path + "?" + queryimplode(self.query)
+        The path and the query are separated by a "?" character, which is
+        left out when there is no query."""
+        query = str(self._query)
+        if not query:
+            return self.abs_path
+        return self.abs_path + "?" + query
 
     path = property(lambda s: s._path, _path_set)
+    query = property(lambda s: s._query, _query_set)
     netloc = property(_netloc_get, _netloc_set)
     is_absolute = property(lambda s: bool(s.host))
     is_relative = property(lambda s: not bool(s.host))
     is_secure = property(lambda s: s.scheme.lower() == 'https')
+
+
+# the strings parsed recently, as two generations: a string found in the
+# old one moves to the new one, and the old one is dropped when the new
+# one is full
+_recent = {}
+_old = {}
+
+
+def _parse_cached(string, scheme):
+    # same as _parse, remembering the strings parsed recently
+    global _recent, _old
+    key = string if scheme == 'http' else (scheme, string)
+    try:
+        return _recent[key]
+    except KeyError:
+        pass
+    parsed = _old.get(key)
+    if parsed is None:
+        parsed = _parse(string, scheme)
+    if len(_recent) >= PARSE_CACHE_SIZE:
+        _old = _recent
+        _recent = {}
+    _recent[key] = parsed
+    return parsed
+
+
+def _parse(string, scheme):
+    # returns (scheme, username, password, host, port, path segments,
+    # params, query, fragment), the same way as urlparse.urlparse with
+    # *scheme* as the default scheme
+    url = string
+    netloc = params = query = fragment = ''
+    if url[:1] == '/' and url[:2] != '//':
+        # origin-form, as found in request lines
+        pass
+    else:
+        i = url.find(':')
+        if i > 0:
+            name = url[:i]
+            if name == 'http':
+                scheme = name
+                url = url[i + 1:]
+            else:
+                for c in name:
+                    if c not in scheme_chars:
+                        break
+                else:
+                    rest = url[i + 1:]
+                    # "name:port" is a path
+                    if not rest.isdigit():
+                        scheme, url = name.lower(), rest
+        if url[:2] == '//':
+            end = len(url)
+            for c in '/?#':
+                j = url.find(c, 2)
+                if 0 <= j < end:
+                    end = j
+            netloc, url = url[2:end], url[end:]
+            if ('[' in netloc) != (']' in netloc):
+                raise ValueError("Invalid IPv6 URL")
+    if '#' in url:
+        url, fragment = url.split('#', 1)
+    if '?' in url:
+        url, query = url.split('?', 1)
+    if ';' in url and scheme in uses_params:
+        start = url.rfind('/')
+        i = url.find(';', start if start >= 0 else 0)
+        if i >= 0:
+            url, params = url[:i], url[i + 1:]
+
+    username = password = host = port = None
+    if netloc:
+        userinfo, sep, hostport = netloc.rpartition('@')
+        if sep:
+            username, sep, password = userinfo.partition(':')
+            if not sep:
+                password = None
+        if '[' in hostport and ']' in hostport:
+            host = hostport.split(']')[0][1:].lower()
+        elif ':' in hostport:
+            host = hostport.split(':')[0].lower()
+        elif hostport:
+            host = hostport.lower()
+        hostport = hostport.split(']')[-1]
+        if ':' in hostport:
+            port = hostport.split(':')[1]
+            port = int(port, 10) if port else None
+            if port is not None and not 0 <= port <= 65535:
+                port = None
+
+    if url:
+        segments = _split_path(url)
+    else:
+        segments = [''] if netloc else []
+    return (scheme, username, password, host, port, tuple(segments),
+            params, query, fragment)
+
+
+def _split_path(path):
+    # returns the segments of a path, without the empty ones but the first
+    # (an absolute path) and the last (a final slash): '/a//b/' gives
+    # ['', 'a', 'b', '']. The root path gives ['']
+    parts = path.split('/')
+    segments = [x for i, x in enumerate(parts) if x or not i]
+    if not parts[-1] and len(parts) > 1 and segments != ['']:
+        segments.append('')
+    return segments
+
+
+def _remove_dots(segments):
+    # removes the '.' and '..' segments of a path, as described by RFC 3986
+    # (5.2.4), in a single pass
+    output = []
+    last = len(segments) - 1
+    for i, segment in enumerate(segments):
+        if segment == '.' or segment == '..':
+            if segment == '..' and (len(output) > 1 or
+                                    output and output[0] != ''):
+                output.pop()
+            if i == last:
+                # 'a/.' and 'a/b/..' are 'a/'
+                output.append('')
+        else:
+            output.append(segment)
+    if output == ['', '']:
+        # the root path
+        output.pop()
+    return output
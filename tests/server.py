@@ -0,0 +1,104 @@
+"""
+A local HTTP/1.1 server for the tests that need a network peer
+"""
+import socket
+import sys
+import threading
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+
+class Handler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    # a response is sent in one piece when the handler returns
+    wbufsize = -1
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.server.connections += 1
+
+    def _send(self, status, body, headers=()):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        if body is not None:
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body and self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        route = self.server.routes.get(path)
+        if route is not None:
+            return route(self)
+        if path == '/chunked':
+            self.send_response(200)
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for chunk in ('hello', ' ', 'world'):
+                self.wfile.write('%x\r\n%s\r\n' % (len(chunk), chunk))
+            self.wfile.write('0\r\n\r\n')
+        elif path == '/close':
+            self.close_connection = 1
+            self.send_response(200)
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.wfile.write('closed')
+        else:
+            self._send(200, 'hello world', [('Content-Type', 'text/plain')])
+
+    do_HEAD = do_GET
+
+    def do_POST(self):
+        if self.headers.get('Transfer-Encoding') == 'chunked':
+            body = []
+            while True:
+                line = self.rfile.readline()
+                if not line:
+                    # the client gave up sending the request
+                    self.close_connection = 1
+                    return
+                size = int(line.strip(), 16)
+                body.append(self.rfile.read(size))
+                self.rfile.readline()
+                if not size:
+                    break
+            body = ''.join(body)
+        else:
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self._send(200, body, [('Content-Type', 'text/plain')])
+
+    do_PUT = do_POST
+
+
+class Server(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), Handler)
+        self.connections = 0
+        # path -> function called with the handler
+        self.routes = {}
+        self.thread = threading.Thread(target=self.serve_forever,
+                                       args=(0.05,))
+        self.thread.daemon = True
+        self.thread.start()
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{0}'.format(self.server_address[1])
+
+    def handle_error(self, request, client_address):
+        # the tests close connections in the middle of a response at will
+        if not isinstance(sys.exc_info()[1], socket.error):
+            HTTPServer.handle_error(self, request, client_address)
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,144 @@
+import socket
+import time
+from unittest2 import TestCase
+from http import AsyncClient, Request, Response
+from server import Server
+
+
+class TestAsyncClient(TestCase):
+
+    def setUp(self):
+        self.server = Server()
+        self.client = AsyncClient(agent='test agent', timeout=5)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def test_request(self):
+        request = Request('GET', self.server.url + '/foo')
+        future = self.client.request(request)
+        self.assertFalse(future.done)
+        response = future.result()
+        self.assertTrue(future.done)
+        self.assertIsInstance(response, Response)
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.content, 'hello world')
+        self.assertIs(response.request, request)
+        self.assertEqual(request.header('User-Agent'), 'test agent')
+
+    def test_concurrent(self):
+        client = AsyncClient(max_connections_per_host=4)
+        futures = [client.request(Request('GET', self.server.url))
+                   for i in range(20)]
+        futures.append(client.request(
+            Request('POST', self.server.url, content='some data')))
+        done = []
+        futures[0].add_done_callback(done.append)
+        self.assertEqual(client.pending, 21)
+        client.run()
+        self.assertEqual(client.pending, 0)
+        self.assertEqual(done, [futures[0]])
+        for future in futures[:-1]:
+            self.assertEqual(future.result().content, 'hello world')
+        self.assertEqual(futures[-1].result().content, 'some data')
+        self.assertLessEqual(self.server.connections, 4)
+        client.close()
+
+    def test_keep_alive(self):
+        for i in range(3):
+            response = self.client.request(
+                Request('GET', self.server.url + '/chunked')).result()
+            self.assertEqual(response.content, 'hello world')
+        self.assertEqual(self.server.connections, 1)
+
+        client = AsyncClient(keep_alive=False)
+        for i in range(2):
+            client.request(Request('GET', self.server.url)).result()
+        self.assertEqual(self.server.connections, 3)
+
+    def test_stream(self):
+        def slow(handler):
+            handler.send_response(200)
+            handler.send_header('Content-Length', '11')
+            handler.end_headers()
+            handler.wfile.flush()
+            time.sleep(0.05)
+            handler.wfile.write('hello world')
+        self.server.routes['/slow'] = slow
+
+        response = self.client.request(
+            Request('GET', self.server.url + '/slow'), stream=True).result()
+        self.assertEqual(response.status, 200)
+        self.assertEqual(''.join(response.iter_content()), 'hello world')
+        self.assertEqual(self.client.pending, 0)
+
+    def test_close_stream(self):
+        def big(handler):
+            handler._send(200, 'x' * 4000000)
+        self.server.routes['/big'] = big
+        client = AsyncClient(timeout=5, max_connections_per_host=1)
+        for i in range(2):
+            response = client.request(
+                Request('GET', self.server.url + '/big'), stream=True).result()
+            chunks = response.iter_content()
+            self.assertTrue(chunks.next())
+            response.close()
+            self.assertEqual(client.pending, 0)
+            self.assertEqual(client._total, 0)
+            self.assertRaises(socket.error, list, chunks)
+        response = client.request(Request('GET', self.server.url)).result()
+        self.assertEqual(response.content, 'hello world')
+        client.close()
+
+    def test_timeout(self):
+        def hang(handler):
+            time.sleep(0.5)
+            handler._send(200, 'late')
+        self.server.routes['/hang'] = hang
+
+        future = self.client.request(
+            Request('GET', self.server.url + '/hang'), timeout=0.05)
+        self.assertIsInstance(future.exception(), socket.timeout)
+        self.assertRaises(socket.timeout, future.result)
+
+    def test_errors(self):
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        future = self.client.request(
+            Request('GET', 'http://127.0.0.1:{0}/'.format(port)))
+        self.assertIsInstance(future.exception(), socket.error)
+        self.assertRaises(ValueError, self.client.request,
+                          Request('GET', '/foo'))
+
+    def test_content_error(self):
+        def content():
+            yield 'a'
+            raise RuntimeError('broken')
+        client = AsyncClient(timeout=5, max_connections_per_host=1)
+        for i in range(2):
+            future = client.request(Request('PUT', self.server.url,
+                                            content=content()))
+            self.assertIsInstance(future.exception(), RuntimeError)
+            self.assertEqual(client.pending, 0)
+            self.assertEqual(client._total, 0)
+        response = client.request(Request('GET', self.server.url)).result()
+        self.assertEqual(response.content, 'hello world')
+        client.close()
+
+    def test_stale_connection(self):
+        def drop(handler):
+            handler._send(200, 'dropped')
+            handler.close_connection = 1
+        self.server.routes['/drop'] = drop
+
+        response = self.client.request(
+            Request('GET', self.server.url + '/drop')).result()
+        self.assertEqual(response.content, 'dropped')
+        time.sleep(0.05)
+        response = self.client.request(
+            Request('GET', self.server.url)).result()
+        self.assertEqual(response.content, 'hello world')
+        self.assertEqual(self.server.connections, 2)
@@ -0,0 +1,211 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest2 import TestCase
+from http import CachingClient, Client, Request
+from http.cache import CacheEntry, DiskStore, LRUStore
+from http.date import Date
+from server import Server
+
+
+class TestCachingClient(TestCase):
+
+    def setUp(self):
+        self.server = Server()
+        self.requests = []
+        self.server.routes['/doc'] = self.doc
+        self.client = CachingClient(Client(timeout=5))
+        self.cache_control = 'max-age=60'
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def doc(self, handler):
+        self.requests.append(handler.headers)
+        headers = [('ETag', '"v1"'), ('Cache-Control', self.cache_control),
+                   ('Date', Date.epoch2str(int(time.time()))),
+                   ('Vary', 'Accept-Language')]
+        if handler.headers.get('If-None-Match') == '"v1"':
+            return handler._send(304, None, headers)
+        language = handler.headers.get('Accept-Language', 'en')
+        handler._send(200, 'doc in ' + language, headers)
+
+    def get(self, *headers):
+        return self.client.request(
+            Request('GET', self.server.url + '/doc', headers=list(headers)))
+
+    def test_fresh(self):
+        self.assertEqual(self.get().content, 'doc in en')
+        response = self.get()
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.content, 'doc in en')
+        self.assertEqual(response.header('Age'), '0')
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual(self.client.hits, 1)
+        self.assertEqual(self.client.misses, 1)
+
+    def test_revalidate(self):
+        self.cache_control = 'max-age=0'
+        self.get()
+        response = self.get()
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.content, 'doc in en')
+        self.assertEqual(len(self.requests), 2)
+        self.assertEqual(self.requests[1]['If-None-Match'], '"v1"')
+        self.assertEqual(self.client.revalidations, 1)
+
+        self.cache_control = 'max-age=60'
+        self.get(('Cache-Control', 'no-cache'))
+        self.assertEqual(len(self.requests), 3)
+        # refreshed by the 304
+        self.get()
+        self.assertEqual(len(self.requests), 3)
+
+    def test_max_age_request(self):
+        self.get()
+        self.get(('Cache-Control', 'max-age=0'))
+        self.assertEqual(len(self.requests), 2)
+
+    def test_no_store(self):
+        self.cache_control = 'no-store'
+        self.get()
+        self.get()
+        self.assertEqual(len(self.requests), 2)
+        self.assertEqual(len(self.client.store), 0)
+
+    def test_vary(self):
+        self.assertEqual(self.get(('Accept-Language', 'fr')).content,
+                         'doc in fr')
+        self.assertEqual(self.get().content, 'doc in en')
+        self.assertEqual(self.get(('Accept-Language', 'fr')).content,
+                         'doc in fr')
+        self.assertEqual(self.get().content, 'doc in en')
+        self.assertEqual(len(self.requests), 2)
+
+    def test_invalidate(self):
+        self.get()
+        self.client.request(Request('POST', self.server.url + '/doc',
+                                    content='x'))
+        self.get()
+        self.assertEqual(len(self.requests), 2)
+
+
+class TestLRUStore(TestCase):
+
+    def entry(self, content):
+        return CacheEntry(200, 'OK', [('Content-Type', 'text/plain')],
+                          content, 0, 0)
+
+    def test_max_entries(self):
+        store = LRUStore(max_entries=2)
+        store.set('a', [self.entry('a')])
+        store.set('b', [self.entry('b')])
+        store.get('a')
+        store.set('c', [self.entry('c')])
+        self.assertEqual(len(store), 2)
+        self.assertIsNone(store.get('b'))
+        self.assertEqual(store.get('a')[0].content, 'a')
+
+    def test_max_size(self):
+        size = self.entry('').size
+        store = LRUStore(max_size=size * 2 + 20)
+        store.set('a', [self.entry('x' * 10)])
+        store.set('b', [self.entry('x' * 10)])
+        self.assertEqual(store.size, size * 2 + 20)
+        store.set('c', [self.entry('x')])
+        self.assertIsNone(store.get('a'))
+        store.set('d', [self.entry('x' * 100)])
+        self.assertIsNone(store.get('d'))
+        store.delete('b')
+        self.assertEqual(store.size, size + 1)
+
+
+class TestDiskStore(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def entry(self, content, headers=()):
+        return CacheEntry(200, 'OK', [('Content-Type', 'text/plain'),
+                                      ('X-Bytes', '\xe9')] + list(headers),
+                          content, 0, 0, (('accept-language', 'fr'),))
+
+    def test_store(self):
+        store = DiskStore(self.dir)
+        key = ('GET', 'http://example.com/')
+        store.set(key, [self.entry('hello world')])
+        entry = store.get(key)[0]
+        self.assertIsInstance(entry.content, memoryview)
+        self.assertEqual(entry.content.tobytes(), 'hello world')
+        self.assertEqual(entry.headers[1], ('X-Bytes', '\xe9'))
+        self.assertEqual(entry.vary, (('accept-language', 'fr'),))
+        response = entry.to_response()
+        self.assertEqual(response.to_bytes().split('\r\n\r\n')[1],
+                         'hello world')
+        self.assertEqual(len(os.listdir(os.path.join(self.dir, 'data'))), 1)
+
+        # the content isn't written again
+        entry.headers.append(('X-Foo', 'bar'))
+        store.set(key, [entry])
+        self.assertEqual(store.get(key)[0].headers[-1], ('X-Foo', 'bar'))
+        self.assertEqual(len(os.listdir(os.path.join(self.dir, 'data'))), 1)
+
+        store.delete(key)
+        self.assertIsNone(store.get(key))
+        self.assertEqual(os.listdir(os.path.join(self.dir, 'data')), [])
+
+    def test_shared(self):
+        a = DiskStore(self.dir)
+        b = DiskStore(self.dir)
+        a.set(('GET', 'a'), [self.entry('a')])
+        self.assertEqual(b.get(('GET', 'a'))[0].content.tobytes(), 'a')
+        b.set(('GET', 'b'), [self.entry('b')])
+        a.delete(('GET', 'a'))
+        self.assertIsNone(b.get(('GET', 'a')))
+        self.assertEqual(a.get(('GET', 'b'))[0].content.tobytes(), 'b')
+        for i in range(100):
+            a.set(('GET', 'c'), [self.entry(str(i))])
+        # compacted
+        self.assertEqual(b.get(('GET', 'c'))[0].content.tobytes(), '99')
+        self.assertEqual(len(b), 2)
+        self.assertEqual(len(DiskStore(self.dir)), 2)
+        self.assertEqual(a.size, 3)
+        self.assertEqual(b.size, 3)
+        self.assertEqual(DiskStore(self.dir).size, 3)
+
+    def test_max_size(self):
+        store = DiskStore(self.dir, max_size=25)
+        store.set(('GET', 'a'), [self.entry('x' * 10, [('ETag', '"a"')])])
+        store.set(('GET', 'b'), [self.entry('x' * 10)])
+        store.set(('GET', 'c'), [self.entry('x' * 10, [('ETag', '"c"')])])
+        # b can't be revalidated
+        self.assertIsNone(store.get(('GET', 'b')))
+        self.assertIsNotNone(store.get(('GET', 'a')))
+        store.set(('GET', 'd'), [self.entry('x' * 10, [('ETag', '"d"')])])
+        self.assertIsNone(store.get(('GET', 'a')))
+        self.assertEqual(store.size, 20)
+        self.assertEqual(DiskStore(self.dir, max_size=25).size, 20)
+        store.delete(('GET', 'c'))
+        self.assertEqual(store.size, 10)
+
+    def test_caching_client(self):
+        server = Server()
+        server.routes['/doc'] = lambda handler: handler._send(
+            200, 'doc', [('Cache-Control', 'max-age=60')])
+        url = server.url + '/doc'
+        try:
+            client = CachingClient(Client(timeout=5), DiskStore(self.dir))
+            client.request(Request('GET', url))
+            client.close()
+            # another process
+            client = CachingClient(Client(timeout=5), DiskStore(self.dir))
+            response = client.request(Request('GET', url))
+            self.assertEqual(client.hits, 1)
+            self.assertEqual(response.content, 'doc')
+        finally:
+            server.stop()
@@ -0,0 +1,310 @@
+import os
+import shutil
+import socket
+import tempfile
+import time
+from unittest2 import TestCase
+from http import Client, Request, Response
+from http.client import ConnectionPool, MirrorResult
+from server import Server
+
+
+class TestClient(TestCase):
+
+    def setUp(self):
+        self.server = Server()
+        self.client = Client(agent='test agent', timeout=5)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def test_request(self):
+        request = Request('GET', self.server.url + '/foo')
+        response = self.client.request(request)
+        self.assertIsInstance(response, Response)
+        self.assertTrue(response.is_success)
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.content_length, 11)
+        self.assertTrue(response.content_is_text)
+        self.assertEqual(response.content, 'hello world')
+        self.assertIs(response.request, request)
+        self.assertEqual(request.header('User-Agent'), 'test agent')
+
+    def test_keep_alive(self):
+        for i in range(5):
+            response = self.client.request(Request('GET', self.server.url))
+            self.assertEqual(response.content, 'hello world')
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(self.client.pool.idle, 1)
+
+    def test_no_keep_alive(self):
+        client = Client(keep_alive=False)
+        for i in range(3):
+            response = client.request(Request('GET', self.server.url))
+            self.assertEqual(response.content, 'hello world')
+        self.assertEqual(self.server.connections, 3)
+        self.assertEqual(client.pool.idle, 0)
+
+    def test_connection_close(self):
+        for i in range(2):
+            response = self.client.request(
+                Request('GET', self.server.url + '/close'))
+            self.assertEqual(response.content, 'closed')
+        self.assertEqual(self.server.connections, 2)
+
+    def test_chunked(self):
+        response = self.client.request(
+            Request('GET', self.server.url + '/chunked'))
+        self.assertEqual(response.content, 'hello world')
+        response = self.client.request(Request('HEAD', self.server.url))
+        self.assertEqual(response.content_length, 11)
+        self.assertEqual(response.content, '')
+        self.assertEqual(self.server.connections, 1)
+
+    def test_post(self):
+        response = self.client.request(
+            Request('POST', self.server.url, content='some data'))
+        self.assertEqual(response.content, 'some data')
+        response = self.client.request(
+            Request('POST', self.server.url, content=iter(['a', 'b', 'c'])))
+        self.assertEqual(response.content, 'abc')
+        self.assertEqual(self.server.connections, 1)
+
+    def test_unicode_content(self):
+        request = Request('POST', self.server.url, content=u'\xe9t\xe9')
+        response = self.client.request(request)
+        self.assertEqual(response.content, '\xc3\xa9t\xc3\xa9')
+        self.assertEqual(request.header('Content-Length'), 5)
+
+        request = Request('POST', self.server.url,
+                          [('Content-Type', 'text/plain; charset=latin-1')],
+                          content=u'\xe9t\xe9')
+        self.assertEqual(self.client.request(request).content, '\xe9t\xe9')
+
+    def test_timeout(self):
+        calls = []
+
+        def hang(handler):
+            calls.append(handler.path)
+            time.sleep(0.3)
+            handler._send(200, 'late')
+        self.server.routes['/hang'] = hang
+
+        client = Client(timeout=0.1)
+        client.request(Request('GET', self.server.url))
+        # sent on the connection just used, but not sent again
+        self.assertRaises(socket.timeout, client.request,
+                          Request('GET', self.server.url + '/hang'))
+        self.assertEqual(len(calls), 1)
+        client.close()
+
+    def test_content_error(self):
+        def content():
+            yield 'a'
+            raise RuntimeError('broken')
+        client = Client(timeout=5, max_connections_per_host=2)
+        key = client._prepare(Request('GET', self.server.url))
+        for i in range(3):
+            self.assertRaises(RuntimeError, client.request,
+                              Request('PUT', self.server.url,
+                                      content=content()))
+            # the connection was not kept
+            self.assertEqual(client.pool._opened[key], 0)
+        response = client.request(Request('GET', self.server.url))
+        self.assertEqual(response.content, 'hello world')
+        client.close()
+
+    def test_stream(self):
+        def slow(handler):
+            handler.send_response(200)
+            handler.send_header('Content-Length', '11')
+            handler.end_headers()
+            handler.wfile.flush()
+            time.sleep(0.05)
+            handler.wfile.write('hello world')
+        self.server.routes['/slow'] = slow
+
+        response = self.client.request(
+            Request('GET', self.server.url + '/slow'), stream=True)
+        self.assertEqual(self.client.pool.idle, 0)
+        self.assertEqual(''.join(response.iter_content()), 'hello world')
+        self.assertEqual(self.client.pool.idle, 1)
+
+    def test_stale_connection(self):
+        def drop(handler):
+            # keep-alive response, but the server closes the connection
+            handler._send(200, 'dropped')
+            handler.close_connection = 1
+        self.server.routes['/drop'] = drop
+
+        response = self.client.request(Request('GET', self.server.url + '/drop'))
+        self.assertEqual(response.content, 'dropped')
+        self.assertEqual(self.client.pool.idle, 1)
+        response = self.client.request(Request('GET', self.server.url))
+        self.assertEqual(response.content, 'hello world')
+        self.assertEqual(self.server.connections, 2)
+
+
+class TestConnectionPool(TestCase):
+
+    def test_limits(self):
+        server = Server()
+        try:
+            pool = ConnectionPool(max_per_host=2, max_total=2)
+            host = ('http', '127.0.0.1', server.server_address[1])
+            a = pool.acquire(host)
+            b = pool.acquire(host)
+            self.assertIsNot(a, b)
+            pool.release(a)
+            self.assertIs(pool.acquire(host), a)
+            pool.release(a)
+            pool.release(b, reuse=False)
+            self.assertEqual(pool.idle, 1)
+            pool.close()
+            self.assertEqual(pool.idle, 0)
+        finally:
+            server.stop()
+
+    def test_acquire_timeout(self):
+        server = Server()
+        try:
+            pool = ConnectionPool(max_per_host=1, timeout=0.05)
+            host = ('http', '127.0.0.1', server.server_address[1])
+            a = pool.acquire(host)
+            start = time.time()
+            self.assertRaises(socket.timeout, pool.acquire, host)
+            self.assertLess(time.time() - start, 1)
+            pool.release(a)
+            self.assertIs(pool.acquire(host), a)
+        finally:
+            server.stop()
+
+    def test_idle_timeout(self):
+        server = Server()
+        try:
+            pool = ConnectionPool(idle_timeout=0.01)
+            host = ('http', '127.0.0.1', server.server_address[1])
+            a = pool.acquire(host)
+            pool.release(a)
+            a.last_used -= 1
+            self.assertIsNot(pool.acquire(host), a)
+        finally:
+            server.stop()
+
+
+class TestMirror(TestCase):
+
+    document = 'hello world, ' * 100
+
+    def setUp(self):
+        self.server = Server()
+        self.server.routes['/doc'] = self.doc
+        self.client = Client(timeout=5)
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'doc')
+        self.url = self.server.url + '/doc'
+        self.requests = []
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+        shutil.rmtree(self.dir)
+
+    def doc(self, handler):
+        self.requests.append(handler.headers)
+        headers = [('ETag', '"v1"'),
+                   ('Last-Modified', 'Sat, 01 Jan 2011 00:00:00 GMT')]
+        if handler.headers.get('If-None-Match') == '"v1"':
+            return handler._send(304, None, headers)
+        range = handler.headers.get('Range')
+        if range and handler.headers.get('If-Range') == '"v1"':
+            start = int(range[6:-1])
+            headers.append(('Content-Range', 'bytes {0}-{1}/{2}'.format(
+                start, len(self.document) - 1, len(self.document))))
+            return handler._send(206, self.document[start:], headers)
+        handler._send(200, self.document, headers)
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def test_mirror(self):
+        response = self.client.mirror(self.url, self.path)
+        self.assertEqual(response.status, 200)
+        self.assertEqual(self.read(self.path), self.document)
+        self.assertEqual(self.read(self.path + '.etag'), '"v1"')
+        self.assertEqual(os.path.getmtime(self.path), 1293840000)
+        self.assertFalse(os.path.exists(self.path + '.part'))
+
+        response = self.client.mirror(self.url, self.path)
+        self.assertEqual(response.status, 304)
+        self.assertEqual(self.requests[1]['If-None-Match'], '"v1"')
+        self.assertEqual(self.requests[1]['If-Modified-Since'],
+                         'Sat, 01 Jan 2011 00:00:00 GMT')
+        self.assertEqual(self.read(self.path), self.document)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_resume(self):
+        with open(self.path + '.part', 'w') as f:
+            f.write(self.document[:100])
+        with open(self.path + '.part.etag', 'w') as f:
+            f.write('"v1"')
+        response = self.client.mirror(self.url, self.path)
+        self.assertEqual(response.status, 206)
+        self.assertEqual(self.requests[0]['Range'], 'bytes=100-')
+        self.assertEqual(self.read(self.path), self.document)
+        self.assertEqual(self.read(self.path + '.etag'), '"v1"')
+
+    def test_changed(self):
+        # a partial download of another version is started over
+        with open(self.path + '.part', 'w') as f:
+            f.write('x' * 100)
+        with open(self.path + '.part.etag', 'w') as f:
+            f.write('"v0"')
+        response = self.client.mirror(self.url, self.path)
+        self.assertEqual(response.status, 200)
+        self.assertEqual(self.read(self.path), self.document)
+
+    def test_mirror_error(self):
+        # big enough not to be received with the head
+        self.document = 'x' * 1000000
+        path = os.path.join(self.dir, 'missing', 'doc')
+        client = Client(timeout=5, max_connections_per_host=1)
+        key = client._prepare(Request('GET', self.url))
+        for i in range(2):
+            self.assertRaises(IOError, client.mirror, self.url, path)
+            # the connection was closed, not kept out of the pool
+            self.assertEqual(client.pool._opened[key], 0)
+        client.mirror(self.url, self.path)
+        self.assertEqual(self.read(self.path), self.document)
+        client.close()
+
+    def test_mirror_many(self):
+        def pairs():
+            for i in range(20):
+                yield (self.url + '?' + str(i),
+                       os.path.join(self.dir, str(i)))
+            yield ('http://127.0.0.1:1/', os.path.join(self.dir, 'error'))
+            yield ('/relative', os.path.join(self.dir, 'relative'))
+
+        results = list(self.client.mirror_many(pairs(), concurrency=4))
+        self.assertEqual(len(results), 22)
+        errors = [r for r in results if r.error is not None]
+        self.assertEqual(sorted(r.url for r in errors),
+                         ['/relative', 'http://127.0.0.1:1/'])
+        results = [r for r in results if r.error is None]
+        self.assertIsInstance(results[0], MirrorResult)
+        self.assertEqual(set(r.status for r in results), set([200]))
+        self.assertEqual(set(r.bytes for r in results),
+                         set([len(self.document)]))
+        for r in results:
+            self.assertEqual(self.read(r.path), self.document)
+        self.assertLessEqual(self.server.connections, 4)
+
+        results = list(self.client.mirror_many(
+            [(r.url, r.path) for r in results], concurrency=4))
+        self.assertEqual(len(results), 20)
+        self.assertTrue(all(r.not_modified for r in results))
+        self.assertEqual(sum(r.bytes for r in results), 0)
+        self.assertLessEqual(self.server.connections, 4)
@@ -0,0 +1,99 @@
+import gzip
+import zlib
+from StringIO import StringIO
+from unittest2 import TestCase
+from http import DecodingError, Response, register_coding
+from http.coding import decode
+
+
+def gzipped(data):
+    out = StringIO()
+    f = gzip.GzipFile(fileobj=out, mode='wb')
+    f.write(data)
+    f.close()
+    return out.getvalue()
+
+
+class TestCoding(TestCase):
+
+    def response(self, coding, content):
+        return Response(200, [('Content-Encoding', coding)],
+                        iter([content[i:i + 7]
+                              for i in range(0, len(content), 7)]))
+
+    def test_gzip(self):
+        data = 'hello world ' * 1000
+        response = self.response('gzip', gzipped(data))
+        chunks = list(response.iter_content(1000, decode=True))
+        self.assertEqual(''.join(chunks), data)
+        self.assertLessEqual(max(len(c) for c in chunks), 1000)
+
+        # several members
+        response = self.response('x-gzip', gzipped('foo') + gzipped('bar'))
+        self.assertEqual(''.join(response.iter_content(decode=True)),
+                         'foobar')
+
+        # zeros after the last member, read in several chunks
+        response = self.response('gzip', gzipped('foo') + '\0' * 20)
+        self.assertEqual(''.join(response.iter_content(decode=True)), 'foo')
+        response = self.response('gzip', gzipped('foo') + '\0' * 10 + 'x')
+        self.assertRaises(DecodingError, list,
+                          response.iter_content(decode=True))
+
+        # not decoded by default
+        response = self.response('gzip', gzipped(data))
+        self.assertEqual(''.join(response.iter_content()), gzipped(data))
+
+    def test_deflate(self):
+        data = 'hello world ' * 100
+        response = self.response('deflate', zlib.compress(data))
+        self.assertEqual(''.join(response.iter_content(decode=True)), data)
+        # without the zlib header
+        raw = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+        raw = raw.compress(data) + raw.flush()
+        response = self.response('Deflate', raw)
+        self.assertEqual(''.join(response.iter_content(decode=True)), data)
+
+    def test_several_codings(self):
+        data = 'hello world'
+        response = Response(200, [('Content-Encoding', 'deflate, identity'),
+                                  ('Content-Encoding', 'gzip')],
+                            gzipped(zlib.compress(data)))
+        self.assertEqual(''.join(response.iter_content(None, decode=True)),
+                         data)
+        response = Response(200, content=data)
+        self.assertEqual(''.join(response.iter_content(decode=True)), data)
+
+    def test_errors(self):
+        response = self.response('gzip', 'not gzipped')
+        self.assertRaises(DecodingError, list,
+                          response.iter_content(decode=True))
+        response = self.response('compress', 'data')
+        self.assertRaises(DecodingError, list,
+                          response.iter_content(decode=True))
+
+    def test_register(self):
+        class Rot13(object):
+            def decode(self, data, size):
+                return [data.decode('rot13')]
+
+            def flush(self):
+                return ['!']
+        register_coding('x-rot13', Rot13)
+        self.assertEqual(''.join(decode(['uryy', 'b'], ['x-rot13'], 10)),
+                         'hello!')
+
+    def test_negotiate(self):
+        from http.coding import negotiate, is_compressible
+        self.assertEqual(negotiate((('gzip', 1.0), ('deflate', 1.0))), 'gzip')
+        self.assertEqual(negotiate((('deflate', 1.0), ('gzip', 0.5))),
+                         'deflate')
+        self.assertEqual(negotiate((('*', 1.0),)), 'gzip')
+        self.assertEqual(negotiate((('*', 1.0), ('gzip', 0.0))), 'deflate')
+        self.assertIsNone(negotiate((('compress', 1.0), ('gzip', 0.0))))
+        self.assertIsNone(negotiate(()))
+        self.assertTrue(is_compressible('text/html'))
+        self.assertTrue(is_compressible('image/svg+xml'))
+        self.assertTrue(is_compressible(None))
+        self.assertFalse(is_compressible('Image/JPEG'))
+        self.assertFalse(is_compressible('application/zip'))
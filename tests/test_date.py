@@ -1,3 +1,4 @@
+import time
 from unittest2 import TestCase
 from datetime import datetime
 from http import Date
@@ -15,6 +16,15 @@ class TestDate(TestCase):
         time = Date.str2time('Mon, 12 Dec 2011 12:00:00 GMT')
         self.assertEqual(time.year, 2011)
 
+    def test_str2time_normalized(self):
+        # as the servers send them: out of range fields roll over
+        self.assertEqual(Date.str2time('Sun, 06 Nov 1994 08:49:60 GMT'),
+                         datetime(1994, 11, 6, 8, 50, 0))
+        self.assertEqual(Date.str2time('Mon, 31 Feb 1994 08:49:37 GMT'),
+                         datetime(1994, 3, 3, 8, 49, 37))
+        self.assertEqual(Date.str2time('Thursday, 31-Feb-94 08:49:37 GMT'),
+                         datetime(1994, 3, 3, 8, 49, 37))
+
     def test_str2epoch(self):
         epoch = Date.str2epoch('Mon, 12 Dec 2011 12:00:00 GMT')
         self.assertEqual(epoch, 1323691200)
@@ -27,3 +37,26 @@ class TestDate(TestCase):
     def test_epoch2str(self):
         string = Date.epoch2str(1323691200)
         self.assertEqual(string, 'Mon, 12 Dec 2011 12:00:00 GMT')
+
+    def test_formats(self):
+        for string in ('Sun, 06 Nov 1994 08:49:37 GMT',
+                       'Sunday, 06-Nov-94 08:49:37 GMT',
+                       'Sun Nov  6 08:49:37 1994',
+                       'Sun, 6 Nov 1994 08:49:37 +0000'):
+            self.assertEqual(Date.str2epoch(string), 784111777)
+            self.assertEqual(Date.str2time(string),
+                             datetime(1994, 11, 6, 8, 49, 37))
+        self.assertEqual(Date.str2epoch('Friday, 31-Dec-99 23:59:59 GMT'),
+                         946684799)
+        self.assertRaises(TypeError, Date.str2epoch, 'not a date')
+
+    def test_epoch2str_leap_year(self):
+        self.assertEqual(Date.epoch2str(951782400),
+                         'Tue, 29 Feb 2000 00:00:00 GMT')
+        self.assertEqual(Date.str2epoch('Tue, 29 Feb 2000 00:00:00 GMT'),
+                         951782400)
+
+    def test_now(self):
+        now = Date.now()
+        self.assertIs(Date.now(), now)
+        self.assertAlmostEqual(Date.str2epoch(now), time.time(), delta=2)
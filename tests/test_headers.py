@@ -1,5 +1,6 @@
 from unittest2 import TestCase
-from http import Headers
+from http import Headers, HeaderName, register_header
+from http import headers
 from datetime import datetime
 
 
@@ -47,6 +48,11 @@ class TestHeaders(TestCase):
         self.assertEqual(headers.get_all('X-Foo'), ['bar', 'baz', 'foo'])
         self.assertEqual(headers.get_all('x-fOo'), ['bar', 'baz', 'foo'])
 
+        headers.add('X-Bar')
+        self.assertNotIn('X-Bar', headers)
+        self.assertEqual(headers.items(), [('X-Foo', 'bar'), ('X-Foo', 'baz'),
+                                           ('X-Foo', 'foo')])
+
     def test_content(self):
         headers = Headers([self.ct_headers])
         self.assertFalse(headers.content_is_text)
@@ -81,6 +87,9 @@ class TestHeaders(TestCase):
         headers.if_modified_since = 'Mon, 12 Dec 2011 12:00:00 GMT'
         self.assertEqual(headers.if_modified_since.year, now.year)
 
+        headers = Headers([('Last-Modified', 'Sun, 06 Nov 1994 08:49:60 GMT')])
+        self.assertEqual(headers.last_modified, datetime(1994, 11, 6, 8, 50))
+
     def test_str(self):
         headers = Headers([self.ct_headers])
 
@@ -96,3 +105,173 @@ class TestHeaders(TestCase):
         headers = Headers()
         headers.set('Content-Type', 'application/xml')
         self.assertEqual(headers.get('Content-Type'), 'application/xml')
+
+    def test_set_keeps_position(self):
+        headers = Headers([('Content-Type', 'text/plain'), ('X-Foo', 'bar')])
+        headers.set('content-type', 'application/json')
+        self.assertEqual(headers.items(),
+            [('content-type', 'application/json'), ('X-Foo', 'bar')])
+
+    def test_get_all_filters_by_name(self):
+        headers = Headers()
+        headers.add('X-Foo', 'bar')
+        headers.add('X-Bar', 'baz')
+        headers.add('x-foo', 'qux')
+        self.assertEqual(headers.get_all('X-Foo'), ['bar', 'qux'])
+        self.assertEqual(headers.get_all('X-Nope'), [])
+
+    def test_contains(self):
+        headers = Headers([self.ct_headers])
+        self.assertTrue('content-type' in headers)
+        self.assertFalse('X-Foo' in headers)
+        headers.remove('Content-Type')
+        self.assertFalse('Content-Type' in headers)
+
+    def test_remove_keeps_order(self):
+        headers = Headers()
+        headers.add('A', '1')
+        headers.add('B', '2')
+        headers.add('a', '3')
+        headers.add('C', '4')
+        headers.remove('a')
+        self.assertEqual(headers.items(), [('B', '2'), ('C', '4')])
+        self.assertEqual(headers[0], 'B')
+        self.assertEqual(list(headers), ['B', 'C'])
+        headers.add('A', '5')
+        self.assertEqual(headers.items(), [('B', '2'), ('C', '4'), ('A', '5')])
+
+    def test_header_name(self):
+        self.assertEqual(headers.CONTENT_TYPE, 'Content-Type')
+        self.assertEqual(headers.CONTENT_TYPE.lower(), 'content-type')
+        self.assertIs(headers.header_name('CONTENT-type'),
+            headers.CONTENT_TYPE)
+        self.assertEqual(headers.header_name('X-Unknown'), None)
+
+        h = Headers([self.ct_headers])
+        self.assertEqual(h.get(headers.CONTENT_TYPE), 'application/json')
+        h.add(headers.USER_AGENT, 'fluffy')
+        self.assertEqual(h.get('user-agent'), 'fluffy')
+        self.assertEqual(h.items()[1], ('User-Agent', 'fluffy'))
+
+    def test_register_header(self):
+        name = register_header('X-Request-Id')
+        self.assertIsInstance(name, HeaderName)
+        self.assertIs(register_header('x-request-id'), name)
+        self.assertIs(headers.header_name('X-REQUEST-ID'), name)
+
+        h = Headers({'x-request-id': '42'})
+        self.assertEqual(h.get(name), '42')
+        self.assertTrue(name in h)
+
+    def test_str_format(self):
+        h = Headers([self.ct_headers, ('Content-Length', 42)])
+        self.assertEqual(str(h), 'Content-Type: application/json\r\n'
+                                 'Content-Length: 42\r\n\r\n')
+        self.assertEqual(str(Headers()), '\r\n')
+
+    def test_parsed_values(self):
+        headers = Headers([('Content-Type', 'text/html; charset=UTF-8'),
+                           ('Content-Length', '12'),
+                           ('Last-Modified', 'Mon, 12 Dec 2011 12:00:00 GMT')])
+        self.assertEqual(headers.content_type, 'text/html')
+        self.assertTrue(headers.content_is_text)
+        self.assertEqual(headers.content_length, 12)
+        self.assertEqual(headers.last_modified.year, 2011)
+        params = headers.content_type_params
+        params['charset'] = 'latin-1'
+        self.assertEqual(headers.content_type_params, {'charset': 'UTF-8'})
+
+        headers.set('content-type', 'application/json')
+        self.assertTrue(headers.content_is_json)
+        self.assertEqual(headers.content_type_params, {})
+        headers.remove('Content-Length')
+        self.assertIsNone(headers.content_length)
+        headers.add('Content-Length', '5')
+        self.assertEqual(headers.content_length, 5)
+        headers.last_modified = datetime(2012, 1, 1)
+        self.assertEqual(headers.last_modified.year, 2012)
+        del headers['Last-Modified']
+        self.assertIsNone(headers.last_modified)
+        self.assertIsNone(Headers().content_type)
+
+    def test_structured_values(self):
+        h = Headers([
+            ('Content-Type', 'multipart/form-data; Boundary="a;b=c"'),
+            ('Cache-Control', 'max-age=60, no-cache="Set-Cookie, Foo"'),
+            ('Cache-Control', 'Public'),
+            ('Accept', 'text/*;q=0.5, text/html, */*;q=0.1'),
+            ('Accept', 'text/plain;format=flowed;q=0.5'),
+            ('Accept-Encoding', 'gzip;q=0.8, identity, br;q=x'),
+            ('Vary', 'Accept-Encoding, accept-language'),
+            ('Connection', 'Keep-Alive, Upgrade'),
+            ('ETag', 'W/"xyz"'),
+            ('If-None-Match', '"a", W/"b,c"'),
+            ('Range', 'bytes=0-99, 200-, -50')])
+        self.assertEqual(h.content_type, 'multipart/form-data')
+        self.assertEqual(h.content_type_params, {'boundary': 'a;b=c'})
+        self.assertEqual(h.cache_control, {'max-age': '60', 'public': None,
+                                           'no-cache': 'Set-Cookie, Foo'})
+        self.assertEqual(h.accept, (
+            ('text/html', 1.0, ()), ('text/*', 0.5, ()),
+            ('text/plain', 0.5, (('format', 'flowed'),)),
+            ('*/*', 0.1, ())))
+        self.assertEqual(h.accept_encoding,
+                         (('identity', 1.0), ('gzip', 0.8), ('br', 0.0)))
+        self.assertEqual(h.vary, ('accept-encoding', 'accept-language'))
+        self.assertEqual(h.connection, ('keep-alive', 'upgrade'))
+        self.assertEqual(h.etag, headers.ETag('xyz', True))
+        self.assertEqual(h.if_none_match, (headers.ETag('a', False),
+                                           headers.ETag('b,c', True)))
+        self.assertEqual(h.range,
+                         ('bytes', ((0, 99), (200, None), (None, 50))))
+
+        h.set('If-None-Match', '*')
+        self.assertEqual(h.if_none_match, '*')
+        for value in ('bytes=5-1', 'bytes=x-', 'bytes', 'bytes=-'):
+            h.set('Range', value)
+            self.assertIsNone(h.range)
+        h.set('ETag', 'xyz')
+        self.assertIsNone(h.etag)
+
+        empty = Headers()
+        self.assertEqual(empty.cache_control, {})
+        self.assertEqual(empty.accept, ())
+        self.assertEqual(empty.vary, ())
+        self.assertIsNone(empty.etag)
+        self.assertIsNone(empty.range)
+        self.assertEqual(empty.if_none_match, ())
+
+    def test_best_match(self):
+        h = Headers([('Accept', 'text/*;q=0.5, text/html, */*;q=0.1')])
+        self.assertEqual(h.best_match(['application/json', 'text/plain']),
+                         'text/plain')
+        self.assertEqual(h.best_match(['application/json', 'text/html']),
+                         'text/html')
+        self.assertEqual(h.best_match(['application/json']),
+                         'application/json')
+        h.set('Accept', 'text/html, image/*;q=0')
+        self.assertEqual(h.best_match(['image/png']), None)
+        self.assertEqual(Headers().best_match(['image/png', 'text/html']),
+                         'image/png')
+
+    def test_copy(self):
+        h = Headers([('Content-Type', 'text/plain'), ('Set-Cookie', 'a=b')])
+        self.assertEqual(h.content_type, 'text/plain')
+        copy = h.copy()
+        self.assertEqual(copy.items(), h.items())
+        self.assertEqual(copy.content_type, 'text/plain')
+
+        copy.set('Content-Type', 'text/html')
+        copy.add('Set-Cookie', 'c=d')
+        self.assertEqual(h.content_type, 'text/plain')
+        self.assertEqual(h.get_all('Set-Cookie'), ['a=b'])
+        self.assertEqual(copy.content_type, 'text/html')
+        self.assertEqual(copy.get_all('Set-Cookie'), ['a=b', 'c=d'])
+
+        again = h.copy()
+        del h['Set-Cookie']
+        self.assertEqual(again.get_all('Set-Cookie'), ['a=b'])
+        self.assertEqual(h.items(), [('Content-Type', 'text/plain')])
+        again.remove('Content-Type')
+        self.assertEqual(h.content_type, 'text/plain')
+        self.assertIsNone(again.content_type)
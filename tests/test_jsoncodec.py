@@ -0,0 +1,110 @@
+import json
+import types
+import zlib
+from unittest2 import TestCase
+from http import DecodingError, Response, set_json_backend
+from http import jsoncodec
+from http.jsoncodec import iter_records
+
+
+class Backend(object):
+    # counts the documents decoded
+    calls = 0
+
+    def loads(self, data):
+        self.calls += 1
+        return json.loads(data)
+
+    def dumps(self, value):
+        return json.dumps(value)
+
+
+class TestJSON(TestCase):
+
+    def setUp(self):
+        self.backend = jsoncodec._loads, jsoncodec._dumps
+
+    def tearDown(self):
+        jsoncodec._loads, jsoncodec._dumps = self.backend
+
+    def test_json(self):
+        response = Response(200, [('Content-Type', 'application/json')],
+                            iter(['{"a": ', '[1, 2]}']))
+        self.assertEqual(response.json(), {'a': [1, 2]})
+        self.assertIs(response.json(), response.json())
+
+        response.content = '[]'
+        self.assertEqual(response.json(), [])
+
+    def test_cached(self):
+        backend = Backend()
+        set_json_backend(backend)
+        response = Response(200, content='{"a": 1}')
+        response.json()
+        response.json()
+        self.assertEqual(backend.calls, 1)
+        self.assertEqual(Response(200, content='1').json(), 1)
+        self.assertEqual(backend.calls, 2)
+
+        set_json_backend('json')
+        self.assertEqual(Response(200, content='[1]').json(), [1])
+
+    def test_compact(self):
+        # simplejson spaces its output the way json does
+        for name in ('json', 'simplejson'):
+            backend = types.ModuleType(name)
+            backend.loads, backend.dumps = json.loads, json.dumps
+            set_json_backend(backend)
+            self.assertEqual(jsoncodec.dumps({'a': [1, 2]}), '{"a":[1,2]}')
+
+    def test_encoding(self):
+        response = Response(200, [('Content-Encoding', 'deflate')],
+                            zlib.compress('{"a": 1}'))
+        self.assertEqual(response.json(), {'a': 1})
+        response = Response(200, [('Content-Type',
+                                   'application/json; charset=utf-16')],
+                            u'["\xe9"]'.encode('utf-16'))
+        self.assertEqual(response.json(), [u'\xe9'])
+
+    def test_headers_changed(self):
+        response = Response(200, [('Content-Encoding', 'deflate')],
+                            zlib.compress('{"a": 1}'))
+        self.assertEqual(response.json(), {'a': 1})
+        response.headers.set('Content-Encoding', 'gzip')
+        self.assertRaises(DecodingError, response.json)
+
+        response = Response(200, [('Content-Type',
+                                   'application/json; charset=latin-1')],
+                            '["\xe9"]')
+        self.assertEqual(response.json(), [u'\xe9'])
+        response.headers.set('Content-Type',
+                             'application/json; charset=utf-8')
+        self.assertRaises(DecodingError, response.json)
+
+    def test_errors(self):
+        self.assertRaises(DecodingError, Response(200, content='{').json)
+        self.assertRaises(DecodingError, Response(200).json)
+        self.assertRaises(ValueError, Response(200, content='{').json)
+
+    def test_iter_json(self):
+        content = '{"id": 1}\n\n{"id": 2}\r\n  \n{"id": 3}'
+        for size in (1, 2, 5, 100):
+            response = Response(200, content=iter(
+                [content[i:i + size] for i in range(0, len(content), size)]))
+            self.assertEqual([r['id'] for r in response.iter_json(None)],
+                             [1, 2, 3])
+
+        records = iter_records(iter(['{"id": 1}\n{', '\n']))
+        self.assertEqual(next(records), {'id': 1})
+        self.assertRaises(DecodingError, next, records)
+
+    def test_iter_json_streamed(self):
+        def chunks():
+            yield '{"id": 1}\n{"id"'
+            # the first record is given before the next chunk is read
+            self.assertEqual(received, [{'id': 1}])
+            yield ': 2}\n'
+        received = []
+        for record in Response(200, content=chunks()).iter_json():
+            received.append(record)
+        self.assertEqual(received, [{'id': 1}, {'id': 2}])
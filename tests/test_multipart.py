@@ -0,0 +1,182 @@
+import os
+import random
+import tempfile
+from StringIO import StringIO
+from unittest2 import TestCase
+from http import Client, MultipartEncoder, MultipartParser, ParseError, \
+    Request, Response
+from server import Server
+
+
+def parse(content, boundary, size=None, **kwargs):
+    parser = MultipartParser(boundary, **kwargs)
+    parts = []
+    if size is None:
+        parts.extend(parser.feed(content))
+    else:
+        for i in range(0, len(content), size):
+            parts.extend(parser.feed(content[i:i + size]))
+    parser.feed_eof()
+    return parts
+
+
+class TestMultipartEncoder(TestCase):
+
+    def test_encode(self):
+        form = MultipartEncoder([('title', 'holidays'),
+                                 ('note', u'\xe9t\xe9'),
+                                 ('photo', ('beach.jpg', StringIO('jpeg')))],
+                                boundary='xyz')
+        self.assertEqual(form.content_type,
+                         'multipart/form-data; boundary=xyz')
+        content = ''.join(form)
+        self.assertEqual(content,
+                         '--xyz\r\n'
+                         'Content-Disposition: form-data; name="title"\r\n'
+                         '\r\n'
+                         'holidays\r\n'
+                         '--xyz\r\n'
+                         'Content-Disposition: form-data; name="note"\r\n'
+                         '\r\n'
+                         '\xc3\xa9t\xc3\xa9\r\n'
+                         '--xyz\r\n'
+                         'Content-Disposition: form-data; name="photo"; '
+                         'filename="beach.jpg"\r\n'
+                         'Content-Type: image/jpeg\r\n'
+                         '\r\n'
+                         'jpeg\r\n'
+                         '--xyz--\r\n')
+
+    def test_length(self):
+        f = tempfile.NamedTemporaryFile()
+        f.write('x' * 100000)
+        f.flush()
+        f.seek(0)
+        form = MultipartEncoder({'file': f, 'a': 'b'}, chunk_size=4096)
+        length = form.length
+        self.assertEqual(dict(form.headers)['Content-Length'], str(length))
+        chunks = list(form)
+        self.assertEqual(len(''.join(chunks)), length)
+        self.assertLessEqual(max(len(c) for c in chunks), 4096)
+        self.assertEqual(MultipartEncoder([]).length,
+                         len(''.join(MultipartEncoder([]))))
+        f.close()
+
+    def test_unknown_length(self):
+        form = MultipartEncoder([('file', ('data', UnsizedFile()))])
+        self.assertIsNone(form.length)
+        self.assertEqual(len(form.headers), 1)
+
+    def test_quote(self):
+        form = MultipartEncoder([('a"b', ('x\r\ny.txt', StringIO('')))],
+                                boundary='xyz')
+        part = parse(''.join(form), 'xyz')[0]
+        self.assertEqual(part.name, 'a%22b')
+        self.assertEqual(part.filename, 'x%0D%0Ay.txt')
+        self.assertEqual(part.content_type, 'text/plain')
+
+    def test_request(self):
+        server = Server()
+        form = MultipartEncoder([('a', 'b'), ('file', UnsizedFile())])
+        request = Request('POST', server.url, headers=form.headers,
+                          content=form)
+        try:
+            client = Client(timeout=5)
+            response = client.request(request)
+            self.assertEqual(request.header('Transfer-Encoding'), 'chunked')
+            response.headers.set('Content-Type', form.content_type)
+            parts = list(response.iter_parts())
+            self.assertEqual([p.name for p in parts], ['a', 'file'])
+            self.assertEqual(parts[1].content, 'hello world' * 1000)
+            client.close()
+        finally:
+            server.stop()
+
+
+class UnsizedFile(object):
+    # a file whose size is unknown
+    name = '/tmp/data'
+
+    def __init__(self):
+        self._data = StringIO('hello world' * 1000)
+
+    def read(self, size):
+        return self._data.read(size)
+
+
+class TestMultipartParser(TestCase):
+
+    def setUp(self):
+        self.form = MultipartEncoder([('title', 'holidays'),
+                                      ('empty', ''),
+                                      ('photo', ('b.bin', StringIO(
+                                          '\r\n--' * 1000 + '\r\n-')))])
+        self.content = ''.join(self.form)
+
+    def test_parse(self):
+        for size in (None, 1, 2, 7, 64, 1000):
+            parts = parse(self.content, self.form.boundary, size)
+            self.assertEqual([p.name for p in parts],
+                             ['title', 'empty', 'photo'])
+            self.assertEqual(parts[0].content, 'holidays')
+            self.assertEqual(parts[0].content_type, 'text/plain')
+            self.assertEqual(parts[1].content, '')
+            self.assertEqual(parts[2].filename, 'b.bin')
+            self.assertEqual(parts[2].content_type,
+                             'application/octet-stream')
+            self.assertEqual(parts[2].content, '\r\n--' * 1000 + '\r\n-')
+            self.assertEqual(parts[2].size, 4003)
+
+    def test_random_chunks(self):
+        rand = random.Random(0)
+        data = os.urandom(50000)
+        form = MultipartEncoder([('a', data), ('b', data)])
+        content = ''.join(form)
+        parser = MultipartParser(form.boundary)
+        parts = []
+        pos = 0
+        while pos < len(content):
+            size = rand.randint(1, 5000)
+            parts.extend(parser.feed(memoryview(content)[pos:pos + size]))
+            pos += size
+        parser.feed_eof()
+        self.assertEqual([p.content for p in parts], [data, data])
+
+    def test_preamble(self):
+        content = 'preamble\r\n' + self.content + 'epilogue'
+        parts = parse(content, self.form.boundary, 3)
+        self.assertEqual(len(parts), 3)
+
+    def test_no_headers(self):
+        parts = parse('--x\r\n\r\nhello\r\n--x  \r\n\r\n\r\n--x--', 'x')
+        self.assertEqual([p.content for p in parts], ['hello', ''])
+        self.assertEqual(parts[0].headers.items(), [])
+        self.assertIsNone(parts[0].name)
+
+    def test_spool(self):
+        parts = parse(self.content, self.form.boundary, 100,
+                      max_memory_size=1000)
+        self.assertFalse(parts[0].file._rolled)
+        self.assertTrue(parts[2].file._rolled)
+        self.assertEqual(parts[2].content, '\r\n--' * 1000 + '\r\n-')
+        for part in parts:
+            part.close()
+
+    def test_errors(self):
+        boundary = self.form.boundary
+        self.assertRaises(ParseError, parse, self.content[:-10], boundary)
+        self.assertRaises(ParseError, parse, self.content, boundary,
+                          max_parts=2)
+        self.assertRaises(ParseError, parse, self.content, boundary,
+                          max_header_size=10)
+        self.assertRaises(ParseError, parse, '--x\r\nfoo\r\n\r\n--x--', 'x')
+        self.assertRaises(ParseError, parse, '--xy\r\n\r\n--x--', 'x')
+        self.assertRaises(ValueError, MultipartParser, '')
+
+    def test_iter_parts(self):
+        response = Response(200, [('Content-Type', self.form.content_type)],
+                            iter([self.content[:10], self.content[10:]]))
+        self.assertEqual([p.name for p in response.iter_parts()],
+                         ['title', 'empty', 'photo'])
+        self.assertRaises(ParseError, list,
+                          Response(200, content='').iter_parts())
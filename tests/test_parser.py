@@ -0,0 +1,262 @@
+from unittest2 import TestCase
+from http import RequestParser, ResponseParser, ParseError, Request, Response
+
+
+def feed_bytes(parser, data):
+    """Feeds data one byte at a time"""
+    messages = []
+    for i in range(len(data)):
+        messages.extend(parser.feed(data[i]))
+    return messages
+
+
+class TestResponseParser(TestCase):
+
+    simple = ('HTTP/1.1 200 OK\r\n'
+              'Content-Type: text/plain\r\n'
+              'Content-Length: 5\r\n'
+              '\r\n'
+              'hello')
+
+    chunked = ('HTTP/1.1 200 OK\r\n'
+               'Transfer-Encoding: chunked\r\n'
+               '\r\n'
+               '5\r\nhello\r\n'
+               '7;ext=1\r\n, world\r\n'
+               '0\r\n'
+               'X-Trailer: yes\r\n'
+               '\r\n')
+
+    def test_content_length(self):
+        parser = ResponseParser()
+        messages = parser.feed(self.simple)
+        self.assertEqual(len(messages), 1)
+        response = messages[0]
+        self.assertIsInstance(response, Response)
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.message, 'OK')
+        self.assertTrue(response.content_is_text)
+        self.assertEqual(response.content_length, 5)
+        self.assertEqual(response.content, 'hello')
+        self.assertTrue(parser.keep_alive)
+        self.assertTrue(parser.idle)
+
+    def test_byte_by_byte(self):
+        for data in (self.simple, self.chunked):
+            parser = ResponseParser()
+            messages = feed_bytes(parser, data)
+            self.assertEqual(len(messages), 1)
+            self.assertTrue(parser.idle)
+
+    def test_chunked(self):
+        parser = ResponseParser()
+        response = parser.feed(self.chunked)[0]
+        self.assertEqual(response.content, 'hello, world')
+        self.assertEqual(response.header('X-Trailer'), 'yes')
+
+        parser = ResponseParser()
+        response = feed_bytes(parser, self.chunked)[0]
+        self.assertEqual(response.content, 'hello, world')
+
+    def test_streaming(self):
+        parser = ResponseParser()
+        response = parser.feed(self.simple[:-3])[0]
+        self.assertFalse(parser.idle)
+        chunks = response.iter_content()
+        self.assertEqual(next(chunks), 'he')
+        self.assertEqual(parser.feed('llo'), [])
+        self.assertTrue(parser.idle)
+        self.assertEqual(list(chunks), ['llo'])
+
+    def test_until_close(self):
+        parser = ResponseParser()
+        response = parser.feed('HTTP/1.0 200 OK\r\n\r\nfoo')[0]
+        parser.feed('bar')
+        self.assertFalse(parser.idle)
+        self.assertFalse(parser.keep_alive)
+        parser.feed_eof()
+        self.assertTrue(parser.idle)
+        self.assertEqual(response.content, 'foobar')
+
+    def test_pipelined(self):
+        parser = ResponseParser()
+        data = ('HTTP/1.1 100 Continue\r\n\r\n' + self.simple +
+                'HTTP/1.1 304 Not Modified\r\n\r\n' + self.chunked)
+        messages = parser.feed(data)
+        self.assertEqual([m.status for m in messages], [100, 200, 304, 200])
+        self.assertEqual(messages[1].content, 'hello')
+        self.assertEqual(messages[3].content, 'hello, world')
+
+    def test_head(self):
+        parser = ResponseParser()
+        parser.request_method = 'HEAD'
+        response = parser.feed(self.simple[:-5])[0]
+        self.assertTrue(parser.idle)
+        self.assertEqual(response.content_length, 5)
+
+    def test_keep_alive(self):
+        parser = ResponseParser()
+        parser.feed('HTTP/1.1 204 No Content\r\nConnection: close\r\n\r\n')
+        self.assertFalse(parser.keep_alive)
+        parser.feed('HTTP/1.0 204 No Content\r\n'
+                    'Connection: Keep-Alive\r\n\r\n')
+        self.assertTrue(parser.keep_alive)
+
+    def test_folding(self):
+        parser = ResponseParser()
+        response = parser.feed('HTTP/1.1 204 No Content\r\n'
+                               'X-Foo: bar\r\n  baz\r\n\r\n')[0]
+        self.assertEqual(response.header('X-Foo'), 'bar baz')
+
+    def test_errors(self):
+        for data in ('FTP/1.1 200 OK\r\n\r\n',
+                     'HTTP/1.1 20 OK\r\n\r\n',
+                     'HTTP/1.1 200 OK\r\nX-Foo bar\r\n\r\n',
+                     'HTTP/1.1 200 OK\r\nX-Foo : bar\r\n\r\n',
+                     'HTTP/1.1 200 OK\r\nContent-Length: x\r\n\r\n',
+                     'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n'
+                     'zz\r\n'):
+            self.assertRaises(ParseError, ResponseParser().feed, data)
+        for size in ('0x10', '+5', '-0', ' 5', '5 ', ''):
+            self.assertRaises(ParseError, ResponseParser().feed,
+                              'HTTP/1.1 200 OK\r\n'
+                              'Transfer-Encoding: chunked\r\n\r\n'
+                              '{0}\r\n'.format(size))
+
+        parser = ResponseParser()
+        parser.feed(self.simple[:-1])
+        self.assertRaises(ParseError, parser.feed_eof)
+
+        parser = ResponseParser(max_header_size=16)
+        self.assertRaises(ParseError, parser.feed, self.simple)
+        parser = ResponseParser(max_header_size=16)
+        self.assertRaises(ParseError, feed_bytes, parser, self.simple)
+
+
+class TestRequestParser(TestCase):
+
+    get = ('GET /foo/bar?a=b HTTP/1.1\r\n'
+           'Host: example.com\r\n'
+           'Accept: */*\r\n'
+           '\r\n')
+
+    post = ('POST /foo HTTP/1.1\r\n'
+            'Host: example.com:8080\r\n'
+            'Content-Length: 3\r\n'
+            '\r\n'
+            'a=b')
+
+    def test_get(self):
+        parser = RequestParser()
+        requests = parser.feed(self.get)
+        self.assertEqual(len(requests), 1)
+        request = requests[0]
+        self.assertIsInstance(request, Request)
+        self.assertEqual(request.method, 'GET')
+        self.assertEqual(request.url.host, 'example.com')
+        self.assertEqual(request.url.abs_path_query, '/foo/bar?a=b')
+        self.assertEqual(str(request.url), 'http://example.com/foo/bar?a=b')
+        self.assertEqual(request.header('Accept'), '*/*')
+        self.assertTrue(parser.idle)
+        self.assertEqual(request.content, '')
+        self.assertTrue(parser.keep_alive)
+
+    def test_post(self):
+        parser = RequestParser()
+        request = parser.feed(self.post)[0]
+        self.assertEqual(request.url.host, 'example.com')
+        self.assertEqual(request.url.port, '8080')
+        self.assertEqual(request.content, 'a=b')
+
+        parser = RequestParser()
+        request = feed_bytes(parser, self.post)[0]
+        self.assertEqual(request.content, 'a=b')
+
+    def test_absolute_form(self):
+        parser = RequestParser()
+        request = parser.feed('GET http://example.org/x HTTP/1.1\r\n'
+                              'Host: example.com\r\n\r\n')[0]
+        self.assertEqual(request.url.host, 'example.org')
+        self.assertEqual(request.url.abs_path, '/x')
+
+    def test_no_host(self):
+        parser = RequestParser()
+        request = parser.feed('GET /x?y HTTP/1.0\r\n\r\n')[0]
+        self.assertIsNone(request.url.host)
+        self.assertEqual(request.url.abs_path_query, '/x?y')
+        self.assertEqual(request.content, '')
+
+    def test_pipelined(self):
+        parser = RequestParser()
+        requests = parser.feed(self.get + self.post + self.get)
+        self.assertEqual([r.method for r in requests], ['GET', 'POST', 'GET'])
+        self.assertEqual(requests[1].content, 'a=b')
+
+        parser = RequestParser()
+        requests = feed_bytes(parser, self.get + self.post + self.get)
+        self.assertEqual(len(requests), 3)
+
+    def test_chunked(self):
+        parser = RequestParser()
+        request = parser.feed('PUT /foo HTTP/1.1\r\n'
+                              'Transfer-Encoding: chunked\r\n\r\n'
+                              '3\r\nabc\r\n0\r\n\r\n')[0]
+        self.assertEqual(request.content, 'abc')
+
+    def test_keep_alive(self):
+        parser = RequestParser()
+        parser.feed('GET / HTTP/1.0\r\n\r\n')
+        self.assertFalse(parser.keep_alive)
+        parser.feed('GET / HTTP/1.1\r\nConnection: close\r\n\r\n')
+        self.assertFalse(parser.keep_alive)
+
+    def test_limits(self):
+        parser = RequestParser(max_headers=1)
+        self.assertRaises(ParseError, parser.feed, self.get)
+        parser = RequestParser(max_header_size=32)
+        self.assertRaises(ParseError, parser.feed, self.get)
+        parser = RequestParser(max_header_size=32)
+        self.assertRaises(ParseError, feed_bytes, parser, self.get)
+
+    def test_errors(self):
+        for data in ('GET /\r\n\r\n',
+                     'GET / FTP/1.1\r\n\r\n',
+                     'GET  / HTTP/1.1\r\n\r\n',
+                     'POST / HTTP/1.1\r\nTransfer-Encoding: gzip\r\n\r\n',
+                     'POST / HTTP/1.1\r\nContent-Length: +3\r\n\r\n',
+                     'POST / HTTP/1.1\r\nContent-Length: 3\r\n'
+                     'Content-Length: 4\r\n\r\n',
+                     'POST / HTTP/1.1\r\nContent-Length: 3, 4\r\n\r\n',
+                     'POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n'
+                     'Content-Length: 3\r\n\r\n'):
+            self.assertRaises(ParseError, RequestParser().feed, data)
+
+    def test_framing(self):
+        parser = RequestParser()
+        request = parser.feed('POST / HTTP/1.1\r\nContent-Length: 3\r\n'
+                              'Content-Length: 3, 3\r\n\r\nabc')[0]
+        self.assertEqual(request.content, 'abc')
+        request = parser.feed('PUT / HTTP/1.1\r\n'
+                              'Transfer-Encoding: gzip\r\n'
+                              'Transfer-Encoding: chunked\r\n\r\n'
+                              '3 ;ext\r\nabc\r\n0\r\n\r\n')[0]
+        self.assertEqual(request.content, 'abc')
+
+        # Transfer-Encoding takes precedence in a response
+        parser = ResponseParser()
+        response = parser.feed('HTTP/1.1 200 OK\r\n'
+                               'Transfer-Encoding: chunked\r\n'
+                               'Content-Length: 10\r\n\r\n'
+                               '3\r\nabc\r\n0\r\n\r\n')[0]
+        self.assertEqual(response.content, 'abc')
+
+    def test_next_message(self):
+        reads = iter([self.get[:10], self.get[10:] + self.post[:-1],
+                      self.post[-1:] + self.get, ''])
+        parser = RequestParser(read=reads.next)
+        self.assertEqual(parser.next_message().method, 'GET')
+        request = parser.next_message()
+        self.assertEqual(request.method, 'POST')
+        self.assertEqual(request.content, 'a=b')
+        self.assertEqual(parser.next_message().method, 'GET')
+        self.assertEqual(parser.next_message(), None)
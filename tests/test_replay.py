@@ -0,0 +1,96 @@
+import json
+import os
+import sys
+import tempfile
+from StringIO import StringIO
+from unittest2 import TestCase
+from http import replay
+from server import Server
+
+
+class TestReplay(TestCase):
+
+    def setUp(self):
+        self.server = Server()
+        self.server.routes['/missing'] = lambda handler: handler._send(
+            404, 'not found')
+        self.server.routes['/error'] = lambda handler: handler._send(
+            500, 'error')
+
+    def tearDown(self):
+        self.server.stop()
+
+    def lines(self):
+        return [json.dumps({'url': 'http://example.com/'}),
+                '',
+                '# a comment',
+                json.dumps({'url': '/missing', 'headers': {'X-Foo': 'bar'}}),
+                json.dumps({'method': 'GET', 'url': '/error?a=1'}),
+                json.dumps({'method': 'POST', 'url': '/',
+                            'json': {'a': 1}}),
+                json.dumps({'method': 'PUT', 'url': '/', 'content': u'\xe9'})]
+
+    def test_load(self):
+        descriptions = replay.load(self.lines())
+        self.assertEqual(len(descriptions), 5)
+        request = replay.build(descriptions[2], self.server.url)
+        self.assertEqual(str(request.url), self.server.url + '/error?a=1')
+        request = replay.build(descriptions[1])
+        self.assertEqual(request.header('X-Foo'), 'bar')
+        self.assertEqual(replay.build(descriptions[3]).content, '{"a":1}')
+        self.assertEqual(replay.build(descriptions[4]).content, '\xc3\xa9')
+
+        self.assertRaises(ValueError, replay.load, ['{'])
+        self.assertRaises(ValueError, replay.load, ['{"method": "GET"}'])
+        self.assertRaises(ValueError, replay.load, ['[]'])
+
+    def test_replay(self):
+        descriptions = replay.load(self.lines())
+        requests = [replay.build(d, self.server.url)
+                    for d in descriptions * 10]
+        report = replay.replay(requests, concurrency=4, timeout=5)
+        self.assertEqual(report.count, 50)
+        self.assertEqual(report.statuses, {200: 30, 404: 10, 500: 10})
+        self.assertEqual(report.client_errors, 10)
+        self.assertEqual(report.server_errors, 10)
+        self.assertEqual(report.error_rate, 0.4)
+        self.assertLessEqual(report.percentile(50), report.percentile(99))
+        self.assertEqual(report.percentile(100), max(report.latencies))
+        self.assertLessEqual(self.server.connections, 4)
+        self.assertIn('server errors: 10 (20.00%)', str(report))
+
+    def test_failures(self):
+        server = Server()
+        url = server.url
+        server.stop()
+        report = replay.replay([replay.build({'url': '/'}, url)] * 3)
+        self.assertEqual(report.count, 3)
+        self.assertEqual(sum(report.failures.values()), 3)
+        self.assertIsNone(report.percentile(50))
+        self.assertEqual(report.error_rate, 1.0)
+        str(report)
+
+    def test_percentile(self):
+        report = replay.Report()
+        report.latencies = range(1, 101)
+        self.assertEqual(report.percentile(50), 50)
+        self.assertEqual(report.percentile(99), 99)
+        self.assertEqual(report.percentile(0), 1)
+
+    def test_main(self):
+        f = tempfile.NamedTemporaryFile(suffix='.jsonl', delete=False)
+        f.write('\n'.join(self.lines()))
+        f.close()
+        stdout = sys.stdout
+        sys.stdout = out = StringIO()
+        try:
+            status = replay.main([f.name, '--target', self.server.url,
+                                  '-c', '2', '-n', '2'])
+            self.assertEqual(status, 0)
+            status = replay.main([f.name, '--target', self.server.url,
+                                  '--max-error-rate', '0.1'])
+            self.assertEqual(status, 1)
+        finally:
+            sys.stdout = stdout
+            os.remove(f.name)
+        self.assertIn('requests:      10', out.getvalue())
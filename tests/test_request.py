@@ -1,6 +1,7 @@
 from unittest2 import TestCase
 from http import Request, Headers, Url
 from datetime import datetime
+from StringIO import StringIO
 
 
 class TestClient(TestCase):
@@ -50,3 +51,63 @@ class TestClient(TestCase):
         request = Request('GET', 'http')
         request.if_modified_since = datetime(2011, 12, 12, 12, 0, 0)
         self.assertEqual(request._headers.get('If-Modified-Since'), 'Mon, 12 Dec 2011 12:00:00 GMT')
+
+    def test_to_bytes(self):
+        request = Request('POST', 'http://example.com/foo?a=b',
+                          [('Host', 'example.com'), ('Content-Length', 3)],
+                          content='foo')
+        self.assertEqual(request.start_line, 'POST /foo?a=b HTTP/1.1')
+        self.assertEqual(request.to_bytes(),
+                         'POST /foo?a=b HTTP/1.1\r\n'
+                         'Host: example.com\r\n'
+                         'Content-Length: 3\r\n'
+                         '\r\n'
+                         'foo')
+
+        request = Request('GET', 'http://example.com')
+        self.assertEqual(request.to_bytes(), 'GET / HTTP/1.1\r\n\r\n')
+
+    def test_iter_chunks(self):
+        request = Request('PUT', 'http://example.com/foo',
+                          [('Content-Length', 6)], content=iter(['foo', 'bar']))
+        chunks = list(request.iter_chunks())
+        self.assertEqual(chunks, ['PUT /foo HTTP/1.1\r\nContent-Length: 6\r\n\r\n',
+                                  'foo', 'bar'])
+
+    def test_file_content(self):
+        request = Request('PUT', 'http://example.com/foo',
+                          content=StringIO('x' * 100000))
+        chunks = list(request.iter_content(65536))
+        self.assertEqual([len(c) for c in chunks], [65536, 100000 - 65536])
+
+        request = Request('PUT', 'http://example.com/foo',
+                          content=StringIO('foo'))
+        self.assertEqual(request.content, 'foo')
+
+    def test_json(self):
+        request = Request('POST', 'http://example.com/foo')
+        request.set_json({'a': [1, 2]})
+        self.assertEqual(request.content, '{"a":[1,2]}')
+        self.assertEqual(request.header('Content-Type'), 'application/json')
+        self.assertEqual(request.json(), {'a': [1, 2]})
+
+    def test_slots(self):
+        request = Request('GET', 'http://example.com/foo',
+                          [('Accept', '*/*')], content='{"a": 1}')
+        self.assertFalse(hasattr(request, '__dict__'))
+        self.assertRaises(AttributeError, setattr, request, 'foo', 'bar')
+
+        self.assertEqual(request.method, 'GET')
+        self.assertIsInstance(request.url, Url)
+        self.assertEqual(request.url.abs_path, '/foo')
+        request.url = Url('http://example.org/bar')
+        self.assertEqual(request.start_line, 'GET /bar HTTP/1.1')
+        request.url = 'http://example.org/baz'
+        self.assertIsInstance(request.url, Url)
+        self.assertEqual(request.url.abs_path, '/baz')
+        self.assertEqual(request.headers['Accept'], '*/*')
+        self.assertEqual(request.json(), {'a': 1})
+        request.content = StringIO('foo')
+        self.assertTrue(request.is_streamed)
+        self.assertEqual(request.content, 'foo')
+        self.assertFalse(request.is_streamed)
@@ -1,6 +1,7 @@
 from unittest2 import TestCase
-from http import Response, Request, Url
+from http import Headers, Response, Request, Url
 from datetime import datetime
+from StringIO import StringIO
 
 
 class TestClient(TestCase):
@@ -52,3 +53,176 @@ class TestClient(TestCase):
 
         response.content = 'foo'
         self.assertTrue(response.content, 'foo')
+
+    def test_to_bytes(self):
+        response = Response(status=404, message='Nope',
+                headers=[('Content-Type', 'text/plain')], content='gone')
+        self.assertEqual(response.start_line, 'HTTP/1.1 404 Nope')
+        self.assertEqual(response.to_bytes(),
+                         'HTTP/1.1 404 Nope\r\n'
+                         'Content-Type: text/plain\r\n'
+                         '\r\n'
+                         'gone')
+
+        response = Response(status=200, headers={})
+        response.headers.last_modified = datetime(2011, 12, 12, 12, 0, 0)
+        self.assertEqual(response.to_bytes(),
+                         'HTTP/1.1 200 OK\r\n'
+                         'Last-Modified: Mon, 12 Dec 2011 12:00:00 GMT\r\n'
+                         '\r\n')
+
+    def test_iter_chunks(self):
+        content = 'x' * 1024
+        response = Response(status=200, headers={}, content=content)
+        chunks = list(response.iter_chunks())
+        self.assertEqual(chunks[0], 'HTTP/1.1 200 OK\r\n\r\n')
+        self.assertIsInstance(chunks[1], memoryview)
+        self.assertEqual(chunks[1].tobytes(), content)
+
+    def test_streamed_content(self):
+        response = Response(status=200,
+                headers={'Content-Length': '6'}, content=iter(['foo', 'bar']))
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(response.content_length, 6)
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(response.content, 'foobar')
+        self.assertFalse(response.is_streamed)
+        self.assertEqual(response.content, 'foobar')
+
+    def test_iter_content(self):
+        response = Response(status=200, content=StringIO('abcdefg'))
+        self.assertEqual(list(response.iter_content(3)), ['abc', 'def', 'g'])
+        self.assertRaises(ValueError, list, response.iter_content())
+
+        response = Response(status=200, content=iter(['abcdefg', 'h']))
+        self.assertEqual(list(response.iter_content(3)),
+                         ['abc', 'def', 'g', 'h'])
+
+        response = Response(status=200, content='abcdefg')
+        self.assertEqual(list(response.iter_content(4)), ['abcd', 'efg'])
+        self.assertEqual(list(response.iter_content()), ['abcdefg'])
+
+    def test_readinto(self):
+        response = Response(status=200, content=iter(['abc', 'defgh']))
+        buf = bytearray(4)
+        self.assertEqual(response.readinto(buf), 3)
+        self.assertEqual(buf[:3], 'abc')
+        self.assertEqual(response.readinto(buf), 4)
+        self.assertEqual(buf, 'defg')
+        self.assertEqual(response.readinto(buf), 1)
+        self.assertEqual(buf[:1], 'h')
+        self.assertEqual(response.readinto(buf), 0)
+
+    def test_chunked_to_bytes(self):
+        response = Response(status=200,
+                headers={'Transfer-Encoding': 'chunked'},
+                content=iter(['foo', '', 'barbaz']))
+        self.assertEqual(response.to_bytes(),
+                         'HTTP/1.1 200 OK\r\n'
+                         'Transfer-Encoding: chunked\r\n'
+                         '\r\n'
+                         '3\r\nfoo\r\n6\r\nbarbaz\r\n0\r\n\r\n')
+
+    def test_default_headers(self):
+        a = Response(status=200)
+        a.headers.add('X-Foo', 'bar')
+        self.assertIsNone(Response(status=200).header('X-Foo'))
+
+    def test_from_parts(self):
+        headers = Headers([('Content-Type', 'text/plain')])
+        request = Request('GET', 'http://foobar')
+        response = Response.from_parts(404, 'Nope', headers, 'gone', request)
+        self.assertEqual(response.status, 404)
+        self.assertIs(response.headers, headers)
+        self.assertIs(response.request, request)
+        self.assertEqual(response.redirects, [])
+        self.assertEqual(response.content, 'gone')
+        self.assertEqual(response.to_bytes(),
+                         'HTTP/1.1 404 Nope\r\n'
+                         'Content-Type: text/plain\r\n'
+                         '\r\n'
+                         'gone')
+
+    def test_compressed(self):
+        text = 'hello world ' * 200
+        request = Request('GET', 'http://foobar',
+                          headers=[('Accept-Encoding', 'deflate;q=0.5, gzip')])
+        response = Response(200, [('Content-Type', 'text/plain'),
+                                  ('Content-Length', str(len(text))),
+                                  ('ETag', '"v1"')], text, 'OK', request)
+        compressed = response.compressed()
+        self.assertIsNot(compressed, response)
+        self.assertEqual(compressed.header('Content-Encoding'), 'gzip')
+        self.assertEqual(compressed.header('ETag'), 'W/"v1"')
+        self.assertEqual(compressed.header('Vary'), 'Accept-Encoding')
+        self.assertEqual(int(compressed.header('Content-Length')),
+                         len(compressed.content))
+        self.assertEqual(''.join(compressed.iter_content(decode=True)), text)
+        self.assertIsNone(response.header('Content-Encoding'))
+        self.assertEqual(response.header('ETag'), '"v1"')
+        self.assertIsNone(response.header('Vary'))
+        self.assertEqual(response.headers.items(),
+                         [('Content-Type', 'text/plain'),
+                          ('Content-Length', str(len(text))),
+                          ('ETag', '"v1"')])
+
+        # streamed
+        response = Response(200, [('Content-Type', 'application/json')],
+                            iter([text] * 10))
+        request.headers.set('Accept-Encoding', 'gzip;q=0, *')
+        compressed = response.compressed(request, level=1)
+        self.assertEqual(compressed.header('Content-Encoding'), 'deflate')
+        self.assertEqual(compressed.header('Transfer-Encoding'), 'chunked')
+        self.assertIsNone(compressed.header('Content-Length'))
+        self.assertEqual(''.join(compressed.iter_content(decode=True)),
+                         text * 10)
+
+    def test_not_compressed(self):
+        request = Request('GET', 'http://foobar',
+                          headers=[('Accept-Encoding', 'gzip')])
+        for headers, content in (
+                ([('Content-Type', 'image/png')], 'x' * 2000),
+                ([('Content-Encoding', 'br')], 'x' * 2000),
+                ([('Content-Type', 'text/plain')], 'x' * 10),
+                ([], None)):
+            response = Response(200, headers, content)
+            self.assertIs(response.compressed(request), response)
+            self.assertIsNone(response.header('Vary'))
+
+        response = Response(200, [('Vary', 'Cookie')], 'x' * 2000)
+        copy = response.compressed(Request('GET', 'http://foobar'))
+        self.assertIsNot(copy, response)
+        self.assertEqual(copy.headers.vary, ('cookie', 'accept-encoding'))
+        self.assertEqual(copy.content, 'x' * 2000)
+        self.assertIsNone(copy.header('Content-Encoding'))
+        self.assertEqual(response.headers.vary, ('cookie',))
+
+        # no request to negotiate with
+        self.assertIs(response.compressed(), response)
+        self.assertEqual(response.headers.vary, ('cookie',))
+        response = Response(304, [], 'x' * 2000)
+        self.assertIs(response.compressed(request), response)
+
+    def test_slots(self):
+        request = Request('GET', 'http://example.com/')
+        for response in (Response(200, [('Content-Type', 'text/plain')],
+                                  'foo', 'OK', request),
+                         Response.from_parts(200, 'OK', Headers(
+                             [('Content-Type', 'text/plain')]), 'foo',
+                             request)):
+            self.assertFalse(hasattr(response, '__dict__'))
+            self.assertRaises(AttributeError, setattr, response, 'foo', 1)
+
+            self.assertEqual(response.status, 200)
+            self.assertEqual(response.message, 'OK')
+            response.message = 'Fine'
+            self.assertEqual(response.status_line, '200 Fine')
+            self.assertEqual(response.redirects, [])
+            response.redirects.append(Response(301))
+            self.assertEqual(len(response.redirects), 1)
+            self.assertIs(response.request, request)
+            self.assertEqual(response.headers['Content-Type'], 'text/plain')
+            self.assertEqual(response.content, 'foo')
+            response.content = iter(['b', 'ar'])
+            self.assertTrue(response.is_streamed)
+            self.assertEqual(response.content, 'bar')
@@ -1,6 +1,7 @@
 from unittest2 import TestCase
 from http import Url
 from itertools import product
+from urlparse import parse_qsl, urlparse, urlunparse
 
 class Test_Url(TestCase):
     flavours = (
@@ -162,3 +163,130 @@ class Test_Url(TestCase):
         for test in tests:
             u = Url(test["url"])
             self.assertEquals(u.abs_path_query, test["expected"])
+
+    def test_default_query(self):
+        u = Url(host='example.org')
+        u.query.append(('a', 'b'))
+        u.path.append('foo')
+        self.assertEqual(Url(host='example.org').query, [])
+        self.assertEqual(str(Url(host='example.org')), 'http://example.org/')
+
+    def test_parse(self):
+        urls = ['http://example.com', 'HTTP://Example.COM:8080/a/b?c=d#e',
+                'https://u:p@h.org:443/x;y/z;p?q=1&q=2&r#f',
+                'https://u@[::1]:80/', '//h/p', 'ftp://h/a;type=i', 'a:1',
+                'mailto:someone@example.com', '/p;x?y#z', '../../rville',
+                '', '?a=b+c&d=%20', 'http://h:/', 'http://h/%7Efoo/b%20r',
+                'sip:alice@atlanta.com;transport=udp', 'x-y.z+w:rest']
+        for string in urls:
+            p = urlparse(string, scheme='http')
+            u = Url(string)
+            self.assertEqual((u.scheme, u.username, u.password, u.host,
+                              u.port, u.params, u.query, u.fragment),
+                             (p.scheme, p.username, p.password, p.hostname,
+                              p.port, p.params, parse_qsl(p.query),
+                              p.fragment), msg=string)
+            self.assertEqual(list(u.path), list(Url.Path(p.path))
+                             if p.path or p.netloc else [], msg=string)
+            self.assertEqual(str(u), urlunparse(
+                (p.scheme, u.netloc, str(Url.Path(p.path)) or '/',
+                 p.params, p.query, p.fragment)),
+                msg=string)
+        self.assertRaises(ValueError, Url, 'http://[::1/')
+
+    def test_string_cache(self):
+        u = Url('http://example.com/a?b=c')
+        self.assertIs(str(u), str(u))
+        u.path.append('d')
+        self.assertEqual(str(u), 'http://example.com/a/d?b=c')
+        u.query.append(('e', 'f'))
+        self.assertEqual(str(u), 'http://example.com/a/d?b=c&e=f')
+        del u.query[0]
+        u.path[2] = 'x'
+        self.assertEqual(str(u), 'http://example.com/a/x?e=f')
+        u.port = 8080
+        u.fragment = 'top'
+        self.assertEqual(str(u), 'http://example.com:8080/a/x?e=f#top')
+        u.query = []
+        u.path = '/'
+        self.assertEqual(str(u), 'http://example.com:8080/#top')
+
+        # the parsed strings are shared, not the objects
+        v = Url('http://example.com/a?b=c')
+        self.assertEqual(str(v), 'http://example.com/a?b=c')
+        v.path.append('b')
+        self.assertEqual(Url('http://example.com/a?b=c').path, ['', 'a'])
+
+    def test_join(self):
+        # RFC 3986, 5.4
+        base = Url('http://a/b/c/d;p?q=1')
+        for reference, expected in [
+                ('g:h', 'g:h'), ('g', 'http://a/b/c/g'),
+                ('./g', 'http://a/b/c/g'), ('g/', 'http://a/b/c/g/'),
+                ('/g', 'http://a/g'), ('//g', 'http://g'),
+                ('?y=2', 'http://a/b/c/d;p?y=2'),
+                ('g?y=2', 'http://a/b/c/g?y=2'),
+                ('#s', 'http://a/b/c/d;p?q=1#s'),
+                ('g#s', 'http://a/b/c/g#s'), (';x', 'http://a/b/c/;x'),
+                ('g;x', 'http://a/b/c/g;x'), ('', 'http://a/b/c/d;p?q=1'),
+                ('.', 'http://a/b/c/'), ('./', 'http://a/b/c/'),
+                ('..', 'http://a/b/'), ('../', 'http://a/b/'),
+                ('../g', 'http://a/b/g'), ('../..', 'http://a/'),
+                ('../../', 'http://a/'), ('../../g', 'http://a/g'),
+                ('../../../g', 'http://a/g'), ('/./g', 'http://a/g'),
+                ('/../g', 'http://a/g'), ('g.', 'http://a/b/c/g.'),
+                ('..g', 'http://a/b/c/..g'), ('./../g', 'http://a/b/g'),
+                ('./g/.', 'http://a/b/c/g/'), ('g/./h', 'http://a/b/c/g/h'),
+                ('g/../h', 'http://a/b/c/h'),
+                ('g;x=1/./y', 'http://a/b/c/g;x=1/y'),
+                ('g;x=1/../y', 'http://a/b/c/y')]:
+            self.assertEqual(base + reference, Url(expected), msg=reference)
+        self.assertEqual(Url('http://a') + 'b', Url('http://a/b'))
+        self.assertEqual(Url('http://a/b/') + 'c/', Url('http://a/b/c/'))
+        self.assertEqual(str(Url('http://a/b/')), 'http://a/b/')
+
+    def test_canonify(self):
+        path = Url.Path('/a/./b/../../../c//d/')
+        self.assertEqual(path.canonify(), ['', 'c', 'd'])
+        self.assertEqual(str(path), '/c/d')
+        path = Url.Path(['a', '..', '..', 'b', '.'])
+        self.assertEqual(path.canonify(), ['b'])
+
+    def test_query(self):
+        raw = 'b=2&a=%C3%A9+x;empty=&flag&a=3'
+        u = Url('http://example.com/?' + raw)
+        # given back as it is, without being decoded
+        self.assertEqual(u.abs_path_query, '/?' + raw)
+        self.assertIsNone(u.query._pairs)
+
+        self.assertEqual(u.query, [('b', '2'), ('a', '\xc3\xa9 x'),
+                                   ('a', '3')])
+        self.assertEqual(u.query['a'], '\xc3\xa9 x')
+        self.assertEqual(u.query.get_all('a'), ['\xc3\xa9 x', '3'])
+        self.assertIsNone(u.query.get('c'))
+        self.assertTrue('b' in u.query)
+        self.assertEqual(str(u), 'http://example.com/?' + raw)
+
+        # only the new pairs are encoded
+        u.query.set('b', 'x y')
+        self.assertEqual(str(u), 'http://example.com/?b=x+y&a=%C3%A9+x&a=3')
+        u.query.add('c', '&')
+        self.assertEqual(u.query.get('c'), '&')
+        u.query.remove('a')
+        self.assertEqual(u.abs_path_query, '/?b=x+y&c=%26')
+        del u.query[0]
+        self.assertEqual(u.query.items(), [('c', '&')])
+        self.assertEqual(u.query.get('c'), '&')
+        u.query[0] = ('d', '1')
+        self.assertEqual(u.query.get_all('d'), ['1'])
+        self.assertFalse('c' in u.query)
+
+        # a copy doesn't change the original
+        v = Url('http://example.com/?' + raw)
+        w = Url(str(v))
+        w.query = v.query
+        w.query.add('e', '5')
+        self.assertEqual(str(v), 'http://example.com/?' + raw)
+        self.assertEqual(len(w.query), 4)
+        self.assertEqual(Url.Query([('a', 1)]), [('a', 1)])
+        self.assertEqual(str(Url.Query([('a', 1), ('b', 'c')])), 'a=1&b=c')